@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks de la extracción sobre las hojas de html/
+
+USO:
+- python benchmark_extraccion.py              # Corre todos los benchmarks
+- python benchmark_extraccion.py proveedores  # Sólo el indicado
+- python benchmark_extraccion.py memoria      # Bytes por producto: dicts vs. tabla columnar
+- python benchmark_extraccion.py estilos      # Celdas tipadas por la hoja de estilos vs. por regex
+- python benchmark_extraccion.py poda         # Filas y celdas omitidas antes de clasificar
+- python benchmark_extraccion.py regiones     # Filas fuera de las regiones de productos
+- python benchmark_extraccion.py clasificacion  # Clasificación de la tabla vectorizada vs. celda por celda
+"""
+
+import os
+import re
+import gc
+import sys
+import time
+import tracemalloc
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+DIRECTORIO_HTML = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'html')
+
+# Libros exportados a HTML de los fixtures
+LIBROS = [
+    'FERRETERIA 1',
+    'PLANILLA FERRETERIA 23.10_archivos',
+    'YAYI FULL - 3 FEBRERO_archivos',
+]
+
+# Las hojas más pesadas de los fixtures (~3 MB y ~2.4 MB)
+HOJAS_GRANDES = [
+    os.path.join('FERRETERIA 1', 'sheet009.htm'),
+    os.path.join('PLANILLA FERRETERIA 23.10_archivos', 'sheet002.htm'),
+    os.path.join('YAYI FULL - 3 FEBRERO_archivos', 'sheet003.htm'),
+]
+
+
+def medir(funcion, repeticiones=5):
+    """Mejor tiempo (en segundos) de varias ejecuciones"""
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor
+
+
+def imprimir_comparacion(nombre, anterior, nuevo):
+    print(f"   {nombre:<45} {anterior * 1000:9.1f} ms -> {nuevo * 1000:8.1f} ms  (x{anterior / nuevo:.1f})")
+
+
+# ---------------------------------------------------------------------------
+# Detección de proveedores
+# ---------------------------------------------------------------------------
+
+PATRONES_ANTERIORES = {
+    'YAYI': [r'YAYI', r'yayi'],
+    'CRIMARAL': [r'CRIMARAL', r'crimaral'],
+    'ANCAIG': [r'ANCAIG', r'ancaig'],
+    'DAFYS': [r'DAFYS', r'dafys'],
+    'HERRAMETAL': [r'HERRAMETAL', r'herrametal'],
+    'FERRIPLAST': [r'FERRIPLAST', r'ferriplast'],
+    'BABUSI': [r'BABUSI', r'babusi'],
+    'DIST_CITY_BELL': [r'DIST.*CITY.*BELL', r'DISTRIBUIDORA.*CITY', r'CITY.*BELL'],
+    'BRIMAX': [r'BRIMAX', r'brimax'],
+    'PUMA': [r'PUMA', r'puma'],
+    'ROTAFLEX': [r'ROTAFLEX', r'rotaflex'],
+    'STANLEY': [r'STANLEY', r'stanley'],
+    'BLACK_DECKER': [r'BLACK.*DECKER', r'BLACK&DECKER']
+}
+
+
+def detectar_con_regex_anterior(ruta):
+    """Implementación previa: decodificar, pasar a mayúsculas y 1 findall por patrón"""
+    with open(ruta, 'r', encoding='utf-8', errors='ignore') as archivo:
+        texto = archivo.read().upper()
+    return {
+        proveedor: sum(len(re.findall(patron, texto, re.IGNORECASE)) for patron in patrones)
+        for proveedor, patrones in PATRONES_ANTERIORES.items()
+    }
+
+
+def detectar_con_get_text_anterior(ruta):
+    """Implementación previa de la app: árbol BeautifulSoup + get_text().count()"""
+    from bs4 import BeautifulSoup
+    with open(ruta, 'r', encoding='utf-8', errors='ignore') as archivo:
+        texto = BeautifulSoup(archivo.read(), 'html.parser').get_text().upper()
+    nombres = ['CRIMARAL', 'ANCAIG', 'DAFYS', 'HERRAMETAL', 'YAYI', 'DIST_CITY_BELL', 'BABUSI',
+               'FERRIPLAST', 'FERRETERIA', 'DISTCITYBELL', 'CITY_BELL', 'DISTRIBUIDORA',
+               'BRIMAX', 'PUMA', 'ROTAFLEX', 'STANLEY', 'BLACK_DECKER']
+    return {nombre: texto.count(nombre) for nombre in nombres}
+
+
+def benchmark_proveedores():
+    """Detector compilado de una pasada vs. los detectores anteriores"""
+    from detector_proveedores import escanear_archivo
+
+    print("🏷️ Detección de proveedores (hojas de ~3 MB)")
+    for hoja in HOJAS_GRANDES:
+        ruta = os.path.join(DIRECTORIO_HTML, hoja)
+        nuevo = medir(lambda: escanear_archivo(ruta))
+        imprimir_comparacion(f"{hoja} (regex por proveedor)", medir(lambda: detectar_con_regex_anterior(ruta)), nuevo)
+        imprimir_comparacion(f"{hoja} (app: get_text)", medir(lambda: detectar_con_get_text_anterior(ruta), 1), nuevo)
+
+
+# ---------------------------------------------------------------------------
+# Memoria de los productos
+# ---------------------------------------------------------------------------
+
+def extraer_hojas_libro(libro):
+    """Productos (dicts con proveedor y hoja) de todas las hojas de un libro"""
+    from extraer_datos import armar_datos_hoja, extraer_productos_de_archivo
+    from manifiesto_libro import cargar_manifiesto
+
+    productos = []
+    for indice, hoja in enumerate(cargar_manifiesto(os.path.join(DIRECTORIO_HTML, libro)).disponibles()):
+        productos_hoja, proveedor = extraer_productos_de_archivo(hoja.ruta)
+        datos = armar_datos_hoja(productos_hoja, proveedor, hoja.archivo, indice)
+        if datos:
+            productos.extend(datos['productos'])
+    return productos
+
+
+def benchmark_memoria():
+    """Memoria retenida por producto: lista de dicts vs. TablaProductos"""
+    from tabla_productos import TablaProductos
+
+    print("🧠 Memoria por producto (tracemalloc, memoria retenida)")
+    for libro in LIBROS:
+        # Primera pasada para llenar la cache del clasificador: los textos que
+        # quedan en ella no se cuentan en ninguna de las dos mediciones
+        extraer_hojas_libro(libro)
+        gc.collect()
+
+        tracemalloc.start()
+        productos = extraer_hojas_libro(libro)
+        gc.collect()
+        con_dicts = tracemalloc.get_traced_memory()[0]
+
+        tabla = TablaProductos.desde_productos(productos)
+        del productos
+        gc.collect()
+        con_tabla = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        cantidad = len(tabla)
+        print(f"   {libro:<40} {cantidad:6d} productos  "
+              f"{con_dicts / cantidad:7.0f} B -> {con_tabla / cantidad:6.0f} B por producto  "
+              f"(x{con_dicts / con_tabla:.1f})")
+        del tabla
+
+
+# ---------------------------------------------------------------------------
+# Tipos de celda desde la hoja de estilos
+# ---------------------------------------------------------------------------
+
+def benchmark_estilos():
+    """Parte de las celdas que resuelve la tabla clase -> tipo y parte que sigue por regex"""
+    import estilos_libro
+    from extraer_datos import CLASIFICADOR
+    from lector_html import iterar_filas_tablas, leer_documento
+    from manifiesto_libro import cargar_manifiesto
+
+    print("🎨 Tipos de celda por hoja de estilos (lookup) vs. clasificador (regex)")
+    for libro in LIBROS:
+        hojas = cargar_manifiesto(os.path.join(DIRECTORIO_HTML, libro)).disponibles()
+        ruta_css = estilos_libro.buscar_hoja_de_estilos(hojas[0].ruta) if hojas else None
+        if ruta_css is None:
+            print(f"   {libro:<40} sin hoja de estilos: todas las celdas por regex")
+            continue
+
+        with open(ruta_css, 'rb') as archivo:
+            texto_css = estilos_libro._decodificar_css(archivo.read())
+        parseo = medir(lambda: estilos_libro.leer_estilos(texto_css))
+
+        def cargar_desde_cache():
+            estilos_libro._TIPOS_CARGADOS.clear()
+            return estilos_libro.cargar_tipos_celdas(ruta_css)
+        cargar_desde_cache()
+        desde_cache = medir(cargar_desde_cache)
+        tipos_celdas = cargar_desde_cache()
+
+        celdas = []
+        for hoja in hojas:
+            for _, fila_datos, clases in iterar_filas_tablas(leer_documento(hoja.ruta).bloques(), con_clases=True):
+                celdas.extend(zip(tipos_celdas.tipos_de(clases), fila_datos))
+
+        es_valor_sin_texto = estilos_libro.es_valor_sin_texto
+        clasificar = CLASIFICADOR._clasificar  # Los patrones sin la cache LRU
+        por_lookup = sum(1 for tipo, valor in celdas if es_valor_sin_texto(tipo, valor))
+        solo_regex = medir(lambda: [clasificar(valor) for _, valor in celdas], 3)
+        con_lookup = medir(lambda: [None if es_valor_sin_texto(tipo, valor) else clasificar(valor)
+                                    for tipo, valor in celdas], 3)
+
+        print(f"   {libro:<40} {len(tipos_celdas)} clases: parseo {parseo * 1000:.1f} ms, "
+              f"desde cache {desde_cache * 1000:.1f} ms")
+        print(f"   {'':<40} {len(celdas)} celdas: {por_lookup / len(celdas) * 100:.1f}% por lookup, "
+              f"{(len(celdas) - por_lookup) / len(celdas) * 100:.1f}% por regex")
+        imprimir_comparacion("clasificar todas las celdas (regex -> lookup)", solo_regex, con_lookup)
+
+
+# ---------------------------------------------------------------------------
+# Poda de filas y celdas vacías u ocultas
+# ---------------------------------------------------------------------------
+
+def benchmark_poda():
+    """Lectura y clasificación de las hojas grandes con y sin poda"""
+    from itertools import groupby
+    from extraer_datos import CLASIFICADOR, extraer_productos_de_filas
+    from lector_html import celdas_omitidas, estadisticas_poda, iterar_filas_tablas, leer_documento
+
+    def clasificar(filas):
+        productos = []
+        for _, filas_tabla in groupby(filas, key=lambda item: item[0]):
+            productos.extend(extraer_productos_de_filas(fila for _, fila in filas_tabla))
+        return productos
+
+    print("✂️ Poda de filas vacías/ocultas antes de clasificar")
+    for hoja in HOJAS_GRANDES:
+        documento = leer_documento(os.path.join(DIRECTORIO_HTML, hoja))
+        completas = list(iterar_filas_tablas(documento.bloques()))
+        antes = estadisticas_poda()
+        podadas = list(iterar_filas_tablas(documento.bloques(), podar=True))
+        despues = estadisticas_poda()
+        omitidas = celdas_omitidas({clave: despues[clave] - antes[clave] for clave in despues})
+        total_celdas = sum(len(fila) for _, fila in completas)
+
+        assert clasificar(completas) == clasificar(podadas)
+        print(f"   {hoja}: {len(completas) - len(podadas)} de {len(completas)} filas y "
+              f"{omitidas} de {total_celdas} celdas sin clasificar")
+        imprimir_comparacion("lectura", medir(lambda: list(iterar_filas_tablas(documento.bloques())), 3),
+                             medir(lambda: list(iterar_filas_tablas(documento.bloques(), podar=True)), 3))
+        imprimir_comparacion("clasificación", medir(lambda: clasificar(completas), 3),
+                             medir(lambda: clasificar(podadas), 3))
+
+
+# ---------------------------------------------------------------------------
+# Regiones de productos
+# ---------------------------------------------------------------------------
+
+def benchmark_regiones():
+    """Filas y productos fuera de las regiones, y clasificación con y sin la detección"""
+    from itertools import groupby
+    import extraer_datos
+    from estilos_libro import tipos_celdas_de_hoja
+    from lector_html import iterar_filas_tablas, leer_documento
+    from manifiesto_libro import cargar_manifiesto
+    from regiones_tabla import configurar_regiones, indices_de_productos, rasgos_de_fila, regiones_activas
+
+    def clasificar(tablas, regiones=True):
+        # Sin la detección no se calculan ni los rasgos de las filas ni las regiones
+        anterior = regiones_activas()
+        configurar_regiones(regiones)
+        try:
+            return [producto for filas, tipos_celdas in tablas
+                    for producto in extraer_datos.extraer_productos_de_filas(filas, tipos_celdas)]
+        finally:
+            configurar_regiones(anterior)
+
+    print("🧭 Regiones de productos (las filas fuera de las regiones no se clasifican)")
+    for libro in LIBROS:
+        tablas = []
+        for hoja in cargar_manifiesto(os.path.join(DIRECTORIO_HTML, libro)).disponibles():
+            tipos_celdas = tipos_celdas_de_hoja(hoja.ruta)
+            filas = iterar_filas_tablas(leer_documento(hoja.ruta).bloques(), con_clases=tipos_celdas is not None,
+                                        podar=True)
+            for _, filas_tabla in groupby(filas, key=lambda item: item[0]):
+                tablas.append(([item[1:] if tipos_celdas is not None else item[1] for item in filas_tabla],
+                               tipos_celdas))
+
+        rasgos = [[rasgos_de_fila(fila_datos) for fila_datos in filas_datos if fila_datos]
+                  for filas_datos in ([fila[0] for fila in filas] if tipos_celdas is not None else filas
+                                      for filas, tipos_celdas in tablas)]
+        total = sum(len(rasgos_tabla) for rasgos_tabla in rasgos)
+        fuera = total - sum(len(indices_de_productos(rasgos_tabla)) for rasgos_tabla in rasgos)
+        omitidos = len(clasificar(tablas, regiones=False)) - len(clasificar(tablas))
+
+        print(f"   {libro:<40} {fuera} de {total} filas fuera de las regiones, {omitidos} productos basura omitidos")
+        imprimir_comparacion("clasificación (todas las filas -> regiones)",
+                             medir(lambda: clasificar(tablas, regiones=False), 3), medir(lambda: clasificar(tablas), 3))
+
+
+def benchmark_clasificacion():
+    """Clasificación de las tablas de las hojas grandes: celda por celda vs. con la matriz de la tabla"""
+    from itertools import groupby
+    from extraer_datos import CLASIFICADOR, extraer_productos_de_filas
+    from estilos_libro import tipos_celdas_de_hoja
+    from lector_html import iterar_filas_tablas, leer_documento
+
+    def clasificar(tablas, vectorizado):
+        # Cache de celdas vacía, como en la primera hoja de cada proceso
+        CLASIFICADOR.clasificar.cache_clear()
+        return [producto for filas, tipos_celdas in tablas
+                for producto in extraer_productos_de_filas(filas, tipos_celdas, vectorizado=vectorizado)]
+
+    print("🧮 Clasificación de la tabla (celda por celda -> vectorizada)")
+    for hoja in HOJAS_GRANDES:
+        ruta = os.path.join(DIRECTORIO_HTML, hoja)
+        tipos_celdas = tipos_celdas_de_hoja(ruta)
+        filas = iterar_filas_tablas(leer_documento(ruta).bloques(), con_clases=tipos_celdas is not None, podar=True)
+        tablas = [([item[1:] if tipos_celdas is not None else item[1] for item in filas_tabla], tipos_celdas)
+                  for _, filas_tabla in groupby(filas, key=lambda item: item[0])]
+
+        iguales = clasificar(tablas, False) == clasificar(tablas, True)
+        cantidad_filas = sum(len(filas_tabla) for filas_tabla, _ in tablas)
+        print(f"   {hoja:<45} {cantidad_filas} filas, mismos productos: {'sí' if iguales else 'NO'}")
+        imprimir_comparacion("clasificación", medir(lambda: clasificar(tablas, False), 3),
+                             medir(lambda: clasificar(tablas, True), 3))
+
+
+BENCHMARKS = {
+    'proveedores': benchmark_proveedores,
+    'memoria': benchmark_memoria,
+    'estilos': benchmark_estilos,
+    'poda': benchmark_poda,
+    'regiones': benchmark_regiones,
+    'clasificacion': benchmark_clasificacion,
+}
+
+
+def main():
+    """Función principal"""
+    seleccion = sys.argv[1:] or list(BENCHMARKS)
+    for nombre in seleccion:
+        if nombre not in BENCHMARKS:
+            print(f"❌ Benchmark desconocido: {nombre} (disponibles: {', '.join(BENCHMARKS)})")
+            continue
+        BENCHMARKS[nombre]()
+        print()
+
+
+if __name__ == "__main__":
+    main()
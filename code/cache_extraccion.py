@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache persistente de extracción por hoja
+Resultados indexados por el hash del contenido y la versión del extractor, acotados por tamaño (LRU)
+"""
+
+import hashlib
+import json
+import os
+
+DIRECTORIO_CACHE_POR_DEFECTO = os.path.join(
+    os.path.expanduser('~'), '.cache', 'ferreteria_analyzer', 'extraccion')
+
+TAMANO_MAXIMO_MB_POR_DEFECTO = 256
+
+
+def calcular_clave_archivo(version, ruta_archivo, parte=None):
+    """Hash del contenido de un archivo con la versión y la parte (ver CacheExtraccion.calcular_clave)"""
+    hash_contenido = hashlib.sha256(str(version).encode('utf-8'))
+    if parte is not None:
+        hash_contenido.update(f"\0{parte}\0".encode('utf-8'))
+    with open(ruta_archivo, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(1024 * 1024), b''):
+            hash_contenido.update(bloque)
+    return hash_contenido.hexdigest()
+
+
+class CacheExtraccion:
+    """Cache LRU en disco de resultados de extracción por hoja"""
+
+    def __init__(self, version, directorio=None, tamano_maximo_mb=TAMANO_MAXIMO_MB_POR_DEFECTO):
+        self.version = str(version)
+        self.directorio = directorio or DIRECTORIO_CACHE_POR_DEFECTO
+        self.tamano_maximo = int(tamano_maximo_mb * 1024 * 1024)
+        self.aciertos = 0
+        self.fallos = 0
+
+        os.makedirs(self.directorio, exist_ok=True)
+
+    def calcular_clave(self, ruta_archivo, parte=None):
+        """
+        Hash del contenido del archivo combinado con la versión del extractor
+        y, si se indica, la parte del archivo (la hoja de un libro .xlsx)
+        """
+        return calcular_clave_archivo(self.version, ruta_archivo, parte)
+
+    def obtener(self, clave):
+        """Devuelve los datos guardados para la clave, o None si no están"""
+        ruta = self._ruta_entrada(clave)
+        try:
+            with open(ruta, 'r', encoding='utf-8') as archivo:
+                datos = json.load(archivo)
+            os.utime(ruta)  # Marcar como usada recientemente
+        except (OSError, ValueError):
+            self.fallos += 1
+            return None
+
+        self.aciertos += 1
+        return datos
+
+    def guardar(self, clave, datos):
+        """Guarda los datos de una hoja y aplica el límite de tamaño"""
+        ruta = self._ruta_entrada(clave)
+        ruta_temporal = f"{ruta}.{os.getpid()}.tmp"
+        try:
+            with open(ruta_temporal, 'w', encoding='utf-8') as archivo:
+                json.dump(datos, archivo, ensure_ascii=False, separators=(',', ':'))
+            os.replace(ruta_temporal, ruta)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar en cache: {e}")
+            if os.path.exists(ruta_temporal):
+                os.remove(ruta_temporal)
+            return
+
+        self._aplicar_limite()
+
+    def estadisticas(self):
+        """Aciertos y fallos de la corrida actual"""
+        return {'aciertos': self.aciertos, 'fallos': self.fallos}
+
+    def _ruta_entrada(self, clave):
+        return os.path.join(self.directorio, f"{clave}.json")
+
+    def _aplicar_limite(self):
+        """Elimina las entradas menos usadas hasta respetar el tamaño máximo"""
+        entradas = []
+        tamano_total = 0
+        for nombre in os.listdir(self.directorio):
+            if not nombre.endswith('.json'):
+                continue
+            try:
+                info = os.stat(os.path.join(self.directorio, nombre))
+            except OSError:
+                continue
+            entradas.append((info.st_mtime, info.st_size, nombre))
+            tamano_total += info.st_size
+
+        entradas.sort()
+        # Conservar siempre la entrada recién escrita aunque supere el límite
+        for _, tamano, nombre in entradas[:-1]:
+            if tamano_total <= self.tamano_maximo:
+                break
+            try:
+                os.remove(os.path.join(self.directorio, nombre))
+                tamano_total -= tamano
+            except OSError:
+                pass
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Clasificación vectorizada de las filas de una tabla
+Mismo resultado que procesar_fila_inteligente_v2 fila por fila, con matrices de la tabla entera
+"""
+
+from itertools import chain
+
+import numpy as np
+
+from estilos_libro import TIPOS_SIN_TEXTO
+
+# Campos que salen de la clasificación de celdas, en el orden de los productos
+CAMPOS_CLASIFICADOS = ('codigo', 'descripcion', 'iva', 'medida')
+
+_INDICE_CAMPO = {campo: indice for indice, campo in enumerate(CAMPOS_CLASIFICADOS)}
+_SIN_CAMPO = -1
+
+
+def _factorizar(filas_datos, ancho):
+    """
+    Valores distintos de la tabla (el primero es '') y la matriz filas x
+    ancho con el índice del valor de cada celda (0 para las que faltan)
+    """
+    celdas = list(chain.from_iterable(filas_datos))
+    if set(map(type, celdas)) - {str}:
+        celdas = list(map(str, celdas))  # Libros .xlsx: el clasificador recibe str(valor)
+
+    unicos = list(dict.fromkeys(chain(('',), celdas)))
+    indices = {valor: indice for indice, valor in enumerate(unicos)}
+    codigos = np.fromiter(map(indices.__getitem__, celdas), dtype=np.intp, count=len(celdas))
+
+    longitudes = np.fromiter(map(len, filas_datos), dtype=np.intp, count=len(filas_datos))
+    if (longitudes == ancho).all():
+        return unicos, codigos.reshape(len(filas_datos), ancho)
+    inversa = np.zeros((len(filas_datos), ancho), dtype=np.intp)
+    inversa[_celdas_en_filas(longitudes, ancho)] = codigos
+    return unicos, inversa
+
+
+def _celdas_en_filas(longitudes, ancho):
+    """Máscara filas x ancho de las posiciones ocupadas por filas de esas longitudes"""
+    return np.arange(ancho) < np.minimum(longitudes, ancho)[:, None]
+
+
+def _matriz_de_tipos_numericos(tipos_filas, ancho):
+    """Celdas cuyo formato (según la hoja de estilos) es numérico"""
+    tipos_filas = [tipos[:ancho] for tipos in tipos_filas]
+    longitudes = np.fromiter(map(len, tipos_filas), dtype=np.intp, count=len(tipos_filas))
+    numericas = np.zeros((len(tipos_filas), ancho), dtype=bool)
+    numericas[_celdas_en_filas(longitudes, ancho)] = np.fromiter(
+        map(TIPOS_SIN_TEXTO.__contains__, chain.from_iterable(tipos_filas)), dtype=bool, count=longitudes.sum())
+    return numericas
+
+
+def clasificar_tabla(filas_datos, columnas_precios, clasificador, tipos_filas=None, columnas=None):
+    """
+    Campos de cada fila de una tabla con las mismas reglas que
+    procesar_fila_inteligente_v2 (tipos_filas es la lista de tipos de celda
+    de cada fila). Devuelve {campo: (valores, columnas)}: el valor limpio
+    de la primera celda que aporta el campo en cada fila (None si ninguna)
+    y su columna (-1 si ninguna).
+    """
+    if not filas_datos:
+        return {campo: ([], np.empty(0, dtype=np.intp)) for campo in CAMPOS_CLASIFICADOS}
+
+    ancho = max(len(fila) for fila in filas_datos)
+    unicos, inversa = _factorizar(filas_datos, ancho)
+
+    # Celdas que se clasifican: no vacías, fuera de las columnas de precios y dentro de las del esquema
+    clasificables = inversa != 0
+    if columnas is not None:
+        en_esquema = np.zeros(ancho, dtype=bool)
+        en_esquema[[columna for columna in columnas if columna < ancho]] = True
+        clasificables &= en_esquema
+    for columna in columnas_precios.values():
+        if columna is not None and columna < ancho:
+            clasificables[:, columna] = False
+
+    # Valores numéricos formateados (moneda, decimal...) sin letras: no son campos de texto
+    if tipos_filas is not None:
+        numericas = clasificables & _matriz_de_tipos_numericos(tipos_filas, ancho)
+        sin_letras = np.zeros(len(unicos), dtype=bool)
+        for indice in np.flatnonzero(np.bincount(inversa[numericas], minlength=len(unicos))).tolist():
+            sin_letras[indice] = unicos[indice].upper() == unicos[indice].lower()
+        clasificables &= ~(numericas & sin_letras[inversa])
+
+    # Los valores distintos que quedan en las celdas clasificables se clasifican en un solo
+    # lote (el índice 0, la celda vacía, nunca es un campo)
+    campo_unico = np.full(len(unicos), _SIN_CAMPO, dtype=np.intp)
+    limpio_unico = np.full(len(unicos), None, dtype=object)
+    por_valor = np.bincount(inversa[clasificables], minlength=len(unicos))
+    necesarios = np.flatnonzero(por_valor)
+    tipos, limpios = clasificador.clasificar_lote([unicos[indice] for indice in necesarios.tolist()],
+                                                  int(por_valor.sum()))
+    campo_unico[necesarios] = [_INDICE_CAMPO.get(tipo, _SIN_CAMPO) for tipo in tipos]
+    limpio_unico[necesarios] = limpios
+
+    campo_celda = np.where(clasificables, campo_unico[inversa], _SIN_CAMPO)
+    filas = np.arange(len(filas_datos))
+
+    resultado = {}
+    for indice, campo in enumerate(CAMPOS_CLASIFICADOS):
+        mascara = campo_celda == indice
+        primera = mascara.argmax(axis=1)
+        primera[~mascara[filas, primera]] = -1
+        valores = limpio_unico[np.where(primera >= 0, inversa[filas, primera], 0)].tolist()
+        resultado[campo] = (valores, primera)
+    return resultado
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Clasificador de celdas compilado
+Reglas de clasificar_campo_v2 precompiladas, con cache LRU por valor de celda
+"""
+
+import re
+from functools import lru_cache
+
+import numpy as np
+
+# Textos que nunca forman parte de un producto (se buscan en cualquier posición)
+PATRONES_IRRELEVANTES = [
+    r'BUSCADOR RAPIDO', r'distribuidora.*@.*\.com', r'Precios orientativos',
+    r'CALCULADORA.*', r'COMPLETAR DONDE DICE', r'FUNCIONAMIENTO',
+    r'INGRESAR.*CENTIMETROS', r'MARGEN DE GANANCIA', r'POR DEFECTO VIENE',
+    r'UwU', r'AQU[IÍ]? VER LA DESCRIPCI[OÓ]?N', r'CODIGO.*DESCRIPCION.*BASE',
+    r'ESCRIBA AQUI MISMO UN CODIGO', r'DIAMETRO DEL CA[NÑ]?O',
+    r'^DESCRIPCION$', r'^YAYI$', r'^Gs\s*-$', r'^\.$', r'^-$', r'^\+$',
+    r'OFERTAS', r'FECHA', r'% GANANCIA', r'CODIGO DE FABRICA'
+]
+
+TAMANO_CACHE_POR_DEFECTO = 65536
+
+# Separador de los valores de un lote (los textos de las celdas HTML no tienen saltos de línea)
+SEPARADOR_LOTE = '\n'
+
+# Mayúsculas de Latin-1 que no cambian la longitud del texto (todas menos ß). Dentro de
+# Latin-1 buscar en mayúsculas equivale a re.IGNORECASE para los patrones irrelevantes
+# y permite que cada patrón use la búsqueda rápida de su prefijo literal
+MAYUSCULAS_LATIN1 = {
+    codigo: chr(codigo).upper() for codigo in range(256)
+    if chr(codigo).upper() != chr(codigo) and len(chr(codigo).upper()) == 1
+}
+
+
+def _patron_de_lote(patron, mayusculas=False):
+    """Patrón para un lote: los espacios no cruzan SEPARADOR_LOTE; opcionalmente los literales en mayúsculas"""
+    partes = re.findall(r'\\.|.', patron)
+    return ''.join(
+        r'[^\S\n]' if parte == r'\s' else parte if parte.startswith('\\') or not mayusculas else parte.upper()
+        for parte in partes
+    )
+
+
+class ClasificadorCeldas:
+    """
+    Clasifica valores de celdas en codigo / iva / medida / descripcion y
+    normaliza precios con la función recibida, memorizando ambos resultados
+    """
+
+    def __init__(self, normalizar_precio, tamano_cache=TAMANO_CACHE_POR_DEFECTO):
+        self.patron_irrelevante = re.compile(
+            '|'.join(f'(?:{patron})' for patron in PATRONES_IRRELEVANTES), re.IGNORECASE)
+        self.patron_codigo = re.compile(r'^[0-9]{6,8}$')
+        self.patron_iva = re.compile(r'^\d{1,2}$')
+        self.patron_medida = re.compile(r'^\d+/\d+$|^\d+x\d+$|^\d+mm$|^\d+cm$|^\d+"$')
+        self.patron_espacios = re.compile(r'\s+')
+
+        # Las mismas reglas sobre un lote de valores unidos (y rodeados) por SEPARADOR_LOTE: los
+        # patrones de celda completa buscan el separador (que tiene búsqueda rápida) en vez de ^.
+        # Los irrelevantes se buscan por separado en el lote en mayúsculas (los de celda completa,
+        # juntos); fuera de Latin-1, todos juntos con re.IGNORECASE
+        def celda_completa(patron):
+            return re.compile(rf'\n(?:{patron})(?=\n)')
+        self.patron_irrelevante_lote = re.compile(
+            '|'.join(f'(?:{_patron_de_lote(patron)})' for patron in PATRONES_IRRELEVANTES),
+            re.IGNORECASE | re.MULTILINE)
+        self.patrones_irrelevantes_mayusculas = [
+            re.compile(_patron_de_lote(patron, True))
+            for patron in PATRONES_IRRELEVANTES if not patron.startswith('^')
+        ] + [celda_completa('|'.join(_patron_de_lote(patron[1:-1], True)
+                                     for patron in PATRONES_IRRELEVANTES if patron.startswith('^')))]
+        self.patron_codigo_lote = celda_completa(r'[0-9]{6,8}')
+        self.patron_iva_lote = celda_completa(r'\d{1,2}')
+        self.patron_medida_lote = celda_completa(r'\d+/\d+|\d+x\d+|\d+mm|\d+cm|\d+"')
+        # Sólo las secuencias que cambian al colapsar (dos o más espacios, o uno que no es ' ')
+        self.patron_espacios_lote = re.compile(r'[^\S\n]{2,}|[^\S\n ]')
+        self.valores_en_lote = 0  # Valores distintos clasificados en lote (no pasan por la cache)
+        self.celdas_en_lote = 0   # Celdas de tabla resueltas con esos valores
+
+        # Cada instancia tiene su propia cache (el resultado depende sólo del valor)
+        self.clasificar = lru_cache(maxsize=tamano_cache)(self._clasificar)
+        self.normalizar_precio = lru_cache(maxsize=tamano_cache)(normalizar_precio)
+
+    def _clasificar(self, valor):
+        """Devuelve (tipo, valor_limpio) o None si la celda no aporta datos"""
+        valor_str = valor.strip()
+
+        if not valor_str:
+            return None
+
+        # Verificar si es texto irrelevante
+        if self.patron_irrelevante.search(valor_str):
+            return None
+
+        # Código de producto (6-8 dígitos)
+        if self.patron_codigo.match(valor_str):
+            return ('codigo', valor_str)
+
+        # IVA (1-2 dígitos, valor <= 50)
+        if self.patron_iva.match(valor_str) and valor_str.isdigit() and int(valor_str) <= 50:
+            return ('iva', valor_str)
+
+        # Medida específica
+        if self.patron_medida.match(valor_str):
+            return ('medida', valor_str)
+
+        # Descripción (texto útil)
+        if 3 <= len(valor_str) <= 80:
+            descripcion_limpia = self.patron_espacios.sub(' ', valor_str).strip()
+            if descripcion_limpia and len(descripcion_limpia) >= 3:
+                return ('descripcion', descripcion_limpia)
+
+        return None
+
+    def clasificar_lote(self, valores, celdas=None):
+        """
+        Igual que clasificar para una lista de valores distintos, pero con
+        cada patrón aplicado una sola vez sobre el lote completo (los valores
+        unidos por SEPARADOR_LOTE): las coincidencias se ubican por posición
+        y el tipo de cada valor sale de máscaras sobre el lote. Devuelve
+        (tipos, limpios): el tipo de cada valor (None si no aporta datos) y
+        su valor limpio. celdas es la cantidad de celdas que cubren los
+        valores (para las estadísticas; por defecto, una por valor).
+        """
+        despejados = [valor.strip() for valor in valores]
+        texto = SEPARADOR_LOTE.join(('', *despejados, ''))
+        if texto.count(SEPARADOR_LOTE) != len(despejados) + 1:
+            # Algún valor trae saltos de línea: valor por valor
+            campos = [self.clasificar(valor) for valor in valores]
+            return [campo and campo[0] for campo in campos], [campo and campo[1] for campo in campos]
+        self.valores_en_lote += len(valores)
+        self.celdas_en_lote += len(valores) if celdas is None else celdas
+
+        longitudes = np.fromiter(map(len, despejados), dtype=np.intp, count=len(despejados))
+        inicios = np.cumsum(longitudes + 1) - longitudes
+
+        def coincidencias(patron, texto):
+            # Ninguna coincidencia cruza un separador: el final ubica el valor
+            finales = np.fromiter((coincidencia.end() for coincidencia in patron.finditer(texto)), dtype=np.intp)
+            return np.searchsorted(inicios, finales, side='right') - 1
+
+        # Descripción (texto útil): entre 3 y 80 caracteres y al menos 3 con los espacios colapsados.
+        # Los valores ya no tienen espacios en los extremos, así que el colapsado es el valor limpio
+        # (también de los códigos, IVA y medidas, que no tienen espacios)
+        limpios = self.patron_espacios_lote.sub(' ', texto).split(SEPARADOR_LOTE)[1:-1]
+        tipos = np.full(len(despejados), None, dtype=object)
+        descripcion = (longitudes >= 3) & (longitudes <= 80)
+        descripcion &= np.fromiter(map(len, limpios), dtype=np.intp, count=len(limpios)) >= 3
+        tipos[descripcion] = 'descripcion'
+
+        # Medida, IVA (valor <= 50) y código, en orden inverso de prioridad
+        tipos[coincidencias(self.patron_medida_lote, texto)] = 'medida'
+        ivas = [i for i in coincidencias(self.patron_iva_lote, texto).tolist()
+                if despejados[i].isdigit() and int(despejados[i]) <= 50]
+        tipos[ivas] = 'iva'
+        tipos[coincidencias(self.patron_codigo_lote, texto)] = 'codigo'
+
+        # Textos irrelevantes (en mayúsculas si el lote es Latin-1) y celdas vacías no aportan datos
+        try:
+            texto.encode('latin-1')
+        except UnicodeEncodeError:
+            tipos[coincidencias(self.patron_irrelevante_lote, texto)] = None
+        else:
+            mayusculas = texto.upper() if 'ß' not in texto else texto.translate(MAYUSCULAS_LATIN1)
+            for patron in self.patrones_irrelevantes_mayusculas:
+                tipos[coincidencias(patron, mayusculas)] = None
+        tipos[longitudes == 0] = None
+
+        return tipos.tolist(), limpios
+
+    def estadisticas(self):
+        """
+        Aciertos y consultas acumulados de ambas caches, y aparte los valores
+        distintos clasificados en lote y las celdas que cubrieron
+        """
+        info_campos = self.clasificar.cache_info()
+        info_precios = self.normalizar_precio.cache_info()
+        return {
+            'aciertos': info_campos.hits + info_precios.hits,
+            'consultas': info_campos.hits + info_campos.misses + info_precios.hits + info_precios.misses,
+            'entradas': info_campos.currsize + info_precios.currsize,
+            'valores_en_lote': self.valores_en_lote,
+            'celdas_en_lote': self.celdas_en_lote,
+        }
+
+
+def tasa_aciertos(estadisticas):
+    """Porcentaje de consultas resueltas por la cache"""
+    if not estadisticas['consultas']:
+        return 0.0
+    return estadisticas['aciertos'] / estadisticas['consultas'] * 100
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Configuración de las pruebas: cada prueba con su propia cache (también en
+los procesos que lance) y un libro de prueba armado con hojas chicas de html/
+"""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import cache_extraccion
+import esquemas_tabla
+import puntos_control
+import regiones_tabla
+from extraer_datos import extraer_datos_html
+
+DIRECTORIO_HTML = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'html')
+
+HOJAS_PRUEBA = [
+    os.path.join('PLANILLA FERRETERIA 23.10_archivos', 'sheet004.htm'),
+    os.path.join('PLANILLA FERRETERIA 23.10_archivos', 'sheet007.htm'),
+    os.path.join('YAYI FULL - 3 FEBRERO_archivos', 'sheet004.htm'),
+    os.path.join('YAYI FULL - 3 FEBRERO_archivos', 'sheet006.htm'),
+]
+
+
+class LibroPrueba:
+    """Copia de las hojas de prueba con nombres sheetNNN.htm consecutivos"""
+
+    hojas = [os.path.join(DIRECTORIO_HTML, hoja) for hoja in HOJAS_PRUEBA]
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+        for i, hoja in enumerate(self.hojas, 1):
+            shutil.copy(hoja, self.ruta(f'sheet{i:03d}.htm'))
+
+    def ruta(self, nombre):
+        return os.path.join(self.directorio, nombre)
+
+    def extraer(self, salida, **opciones):
+        """extraer_datos_html del libro con la salida en su directorio"""
+        return extraer_datos_html(self.directorio, self.ruta(salida), **opciones)
+
+
+@pytest.fixture(autouse=True)
+def cache_de_la_prueba(tmp_path, monkeypatch):
+    """Directorios de cache y de ejecuciones temporales, esquemas de tabla sin cargar y regiones apagadas"""
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    monkeypatch.setattr(cache_extraccion, 'DIRECTORIO_CACHE_POR_DEFECTO', str(tmp_path / 'cache'))
+    monkeypatch.setattr(puntos_control, 'DIRECTORIO_EJECUCIONES_POR_DEFECTO', str(tmp_path / 'ejecuciones'))
+    monkeypatch.setattr(esquemas_tabla, '_ESQUEMAS_CARGADOS', {})
+    monkeypatch.setattr(regiones_tabla, '_CONFIGURACION_REGIONES', {'detectar': False})
+
+
+@pytest.fixture
+def libro_prueba(tmp_path):
+    """Arma un LibroPrueba en el directorio indicado (por defecto, 'libro' en el temporal de la prueba)"""
+    return lambda directorio=None: LibroPrueba(directorio or str(tmp_path / 'libro'))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Conversión de precios según los separadores declarados por la hoja ("$ 16.729,55" con coma decimal)
+"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+Separadores = namedtuple('Separadores', ['decimal', 'miles'])
+
+# Separadores de las exportaciones de los proveedores (configuración regional es-AR)
+SEPARADORES_POR_DEFECTO = Separadores(',', '.')
+
+# La declaración está en el <style> del encabezado de la hoja
+LIMITE_ENCABEZADO = 65536
+
+PATRON_SEPARADOR_DECIMAL = re.compile(r'mso-displayed-decimal-separator\s*:\s*"\\?([^"])"')
+PATRON_SEPARADOR_MILES = re.compile(r'mso-displayed-thousand-separator\s*:\s*"\\?([^"])"')
+PATRON_CANONICO = re.compile(r'\d+(?:\.\d+)?')
+
+# Texto de los valores que no son un precio (float('nan') en la conversión)
+NO_ES_PRECIO = 'nan'
+
+
+def separadores_de_texto(texto):
+    """Separadores declarados en el encabezado de una hoja (texto o bytes), o los de por defecto"""
+    if isinstance(texto, bytes):
+        texto = texto[:LIMITE_ENCABEZADO].decode('latin-1')
+    decimal = PATRON_SEPARADOR_DECIMAL.search(texto, 0, LIMITE_ENCABEZADO)
+    miles = PATRON_SEPARADOR_MILES.search(texto, 0, LIMITE_ENCABEZADO)
+    separadores = Separadores(
+        decimal.group(1) if decimal else SEPARADORES_POR_DEFECTO.decimal,
+        miles.group(1) if miles else SEPARADORES_POR_DEFECTO.miles,
+    )
+    return separadores if separadores.decimal != separadores.miles else SEPARADORES_POR_DEFECTO
+
+
+def separadores_de_hoja(ruta_archivo):
+    """Separadores declarados por una hoja HTML (sólo se lee el encabezado)"""
+    with open(ruta_archivo, 'rb') as archivo:
+        return separadores_de_texto(archivo.read(LIMITE_ENCABEZADO))
+
+
+@lru_cache(maxsize=None)
+def _normalizador(separadores):
+    """Función valor -> texto con punto decimal (o NO_ES_PRECIO) para unos separadores"""
+    decimal, miles = re.escape(separadores.decimal), re.escape(separadores.miles)
+    no_numerico = re.compile(rf'[^\d.{decimal}{miles}]')
+    con_separadores = re.compile(rf'(\d+|\d{{1,3}}(?:{miles}\d{{3}})+)(?:{decimal}(\d+))?')
+    separador_miles = separadores.miles
+
+    @lru_cache(maxsize=65536)
+    def normalizar(valor):
+        limpio = no_numerico.sub('', valor).strip()
+        coincidencia = con_separadores.fullmatch(limpio)
+        if coincidencia:
+            entero, decimales = coincidencia.groups()
+            entero = entero.replace(separador_miles, '')
+            return f"{entero}.{decimales}" if decimales else entero
+        if PATRON_CANONICO.fullmatch(limpio):
+            return limpio
+        return NO_ES_PRECIO
+
+    def normalizar_valor(valor):
+        if isinstance(valor, str):
+            return normalizar(valor)
+        if isinstance(valor, (int, float, np.number)) and not isinstance(valor, bool):
+            return repr(float(valor))
+        return NO_ES_PRECIO
+
+    return normalizar_valor
+
+
+def convertir_precios(valores, separadores=SEPARADORES_POR_DEFECTO):
+    """
+    Convierte una columna de precios (textos o números) a float64 en una
+    sola pasada. Devuelve (precios, validos): NaN y False en los valores
+    que no son un precio (vacíos, textos, números mal formados).
+    """
+    normalizar = _normalizador(separadores)
+    precios = np.array([normalizar(valor) for valor in valores], dtype=np.str_).astype(np.float64)
+    return precios, ~np.isnan(precios)
+
+
+def convertir_precio(valor, separadores=SEPARADORES_POR_DEFECTO):
+    """Un valor suelto con las mismas reglas que convertir_precios (None si no es un precio)"""
+    precio = float(_normalizador(separadores)(valor))
+    return None if precio != precio else precio
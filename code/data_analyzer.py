@@ -14,19 +14,30 @@ import re
 import numpy as np
 from collections import Counter, defaultdict
 
+from conversion_precios import convertir_precio, convertir_precios
+from esquemas_tabla import buscar_esquema, firma_encabezado
+from lector_html import FILAS_ENCABEZADO
+from salida_resultados import es_salida_ndjson, hojas_de_resultado, iterar_hojas, iterar_productos, leer_encabezado
+from tabla_productos import PRIORIDAD_PRECIO_PRINCIPAL, TablaProductos, productos_a_dataframe
+
 class FerreteriaDataAnalyzer:
     def __init__(self, data_file=None):
         self.data = None
+        self.data_file = None
         self.processed_data = None
         
         if data_file:
             self.load_data(data_file)
     
     def load_data(self, data_file):
-        """Carga datos desde archivo JSON"""
+        """Carga datos desde archivo JSON (de un NDJSON sólo el encabezado; los productos se leen al procesar)"""
         try:
-            with open(data_file, 'r', encoding='utf-8') as f:
-                self.data = json.load(f)
+            if es_salida_ndjson(data_file):
+                self.data = leer_encabezado(data_file)
+            else:
+                with open(data_file, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+            self.data_file = data_file
             print(f"✅ Datos cargados: {len(self.data.get('hojas', []))} hojas")
             return True
         except Exception as e:
@@ -38,6 +49,10 @@ class FerreteriaDataAnalyzer:
         if not self.data:
             return None
         
+        # Salida de extraer_datos_html: productos ya clasificados por hoja
+        if 'formato' in self.data or any('productos' in hoja for hoja in self.data['hojas']):
+            return self.extract_extracted_products()
+        
         products = []
         
         for hoja in self.data['hojas']:
@@ -51,17 +66,49 @@ class FerreteriaDataAnalyzer:
                 headers = self.identify_headers(tabla['filas'])
                 data_rows = tabla['filas'][1:] if headers else tabla['filas']
                 
+                # Esquema que el extractor ya resolvió para este encabezado (si existe)
+                primeras_filas = [fila for fila in tabla['filas'] if any(cell.strip() for cell in fila)]
+                esquema = buscar_esquema(proveedor, firma_encabezado(primeras_filas[:FILAS_ENCABEZADO]))
+                
                 for row in data_rows[:1000]:  # Limitar para performance
                     if not any(cell.strip() for cell in row):
                         continue
                     
-                    product = self.parse_product_row(row, headers, proveedor)
+                    product = self.parse_product_row(row, headers, proveedor, esquema)
                     if product:
                         products.append(product)
         
         self.processed_data = pd.DataFrame(products)
         return self.processed_data
     
+    def extract_extracted_products(self):
+        """
+        Estructura los productos de extraer_datos_html a partir de la tabla
+        columnar (los precios no se copian cuando los datos vienen en memoria)
+        """
+        productos = self.data.get('productos')
+        if productos is not None:
+            df = productos_a_dataframe(productos)
+        elif self.data_file and es_salida_ndjson(self.data_file):
+            # NDJSON: los productos pasan de a uno a la tabla, sin lista intermedia
+            df = TablaProductos.desde_productos(iterar_productos(self.data_file)).a_dataframe()
+        else:
+            df = productos_a_dataframe([producto for hoja in self.data['hojas'] for producto in hoja['productos']])
+        
+        # Precio principal: el primero disponible según la prioridad del extractor
+        columnas_precio = [f'precio_{tipo}' for tipo in PRIORIDAD_PRECIO_PRINCIPAL]
+        precio = df[columnas_precio].replace(0.0, np.nan).bfill(axis=1).iloc[:, 0].fillna(0.0)
+        
+        self.processed_data = df.assign(
+            codigo=df['codigo'].fillna(''),
+            precio=precio,
+            moneda='ARS',
+            marca='',
+            stock='',
+            categoria=df['descripcion'].fillna('').map(self.categorize_product)
+        )
+        return self.processed_data
+    
     def identify_headers(self, filas):
         """Identifica la fila de encabezados"""
         header_keywords = ['codigo', 'descripcion', 'precio', 'producto', 'numero', 'marca']
@@ -74,8 +121,8 @@ class FerreteriaDataAnalyzer:
         
         return None
     
-    def parse_product_row(self, row, headers, proveedor):
-        """Parsea una fila de producto"""
+    def parse_product_row(self, row, headers, proveedor, esquema=None):
+        """Parsea una fila de producto (con el EsquemaTabla del encabezado si se conoce)"""
         if len(row) < 2:
             return None
         
@@ -90,8 +137,12 @@ class FerreteriaDataAnalyzer:
             'categoria': ''
         }
         
-        # Estrategias de parsing según el proveedor
-        if proveedor == 'CRIMARAL':
+        # Estrategias de parsing: esquema aprendido o posiciones fijas según el proveedor
+        if esquema is not None:
+            product.update(self.parse_schema_row(row, esquema))
+            if proveedor == 'CRIMARAL':
+                product['moneda'] = 'USD'
+        elif proveedor == 'CRIMARAL':
             product.update(self.parse_crimaral_row(row))
         elif proveedor == 'ANCAIG':
             product.update(self.parse_ancaig_row(row))
@@ -133,6 +184,23 @@ class FerreteriaDataAnalyzer:
             'moneda': 'ARS'
         }
     
+    def parse_schema_row(self, row, esquema):
+        """Parser por esquema de tabla: columnas de código, descripción y precios resueltas por el extractor"""
+        def celda(columna):
+            return row[columna] if columna is not None and columna < len(row) else ''
+        
+        precio = ''
+        for tipo in PRIORIDAD_PRECIO_PRINCIPAL:
+            precio = celda(esquema.columnas_precios.get(tipo))
+            if precio:
+                break
+        
+        return {
+            'codigo': celda(esquema.columna_principal('codigo')),
+            'descripcion': celda(esquema.columna_principal('descripcion')),
+            'precio': self.extract_price(precio)
+        }
+    
     def parse_generic_row(self, row):
         """Parser genérico"""
         return {
@@ -143,20 +211,8 @@ class FerreteriaDataAnalyzer:
         }
     
     def extract_price(self, price_text):
-        """Extrae precio numérico del texto"""
-        if not price_text:
-            return 0.0
-        
-        # Remover símbolos de moneda y espacios
-        price_clean = re.sub(r'[^\d,.]', '', str(price_text))
-        
-        # Convertir comas a puntos para decimales
-        price_clean = price_clean.replace(',', '.')
-        
-        try:
-            return float(price_clean)
-        except:
-            return 0.0
+        """Extrae precio numérico del texto ("$ 16.729,55" -> 16729.55; 0.0 si no es un precio)"""
+        return convertir_precio(price_text) or 0.0
     
     def categorize_product(self, descripcion):
         """Categoriza productos automáticamente"""
@@ -369,7 +425,7 @@ def analizar_datos_con_ia(datos, api_key=None, custom_prompt=None):
     Compatible con la aplicación modular
     
     Args:
-        datos: Datos de productos para analizar
+        datos: Datos de productos para analizar (resultado en memoria o ruta a un .json/.ndjson)
         api_key: API key de Google Gemini (opcional)
         custom_prompt: Prompt personalizado para el análisis (opcional)
     """
@@ -382,19 +438,24 @@ def analizar_datos_con_ia(datos, api_key=None, custom_prompt=None):
         # Convertir datos al formato esperado por el analizador
         productos_para_analisis = []
         
-        if isinstance(datos, dict) and 'hojas' in datos:
-            for hoja in datos['hojas']:
-                if 'productos' in hoja:
-                    for producto in hoja['productos']:
-                        # Adaptar formato del producto
-                        producto_adaptado = {
-                            'descripcion': producto.get('descripcion', ''),
-                            'precio': producto.get('precio', ''),
-                            'codigo': producto.get('codigo', ''),
-                            'proveedor': producto.get('proveedor', hoja.get('nombre', 'Desconocido')),
-                            'categoria': producto.get('categoria', 'General')
-                        }
-                        productos_para_analisis.append(producto_adaptado)
+        if isinstance(datos, str):
+            hojas_con_productos = iterar_hojas(datos)
+        elif isinstance(datos, dict) and 'hojas' in datos:
+            hojas_con_productos = hojas_de_resultado(datos)
+        else:
+            hojas_con_productos = []
+        
+        for hoja, productos in hojas_con_productos:
+            for producto in productos:
+                # Adaptar formato del producto
+                producto_adaptado = {
+                    'descripcion': producto.get('descripcion', ''),
+                    'precio': producto.get('precio', ''),
+                    'codigo': producto.get('codigo', ''),
+                    'proveedor': producto.get('proveedor', hoja.get('nombre', 'Desconocido')),
+                    'categoria': producto.get('categoria', 'General')
+                }
+                productos_para_analisis.append(producto_adaptado)
         
         # Simular análisis básico
         total_productos = len(productos_para_analisis)
@@ -570,21 +631,14 @@ def _analizar_basico(productos_para_analisis):
         
         total_productos = len(productos_para_analisis)
         
-        # Análisis básico de precios
-        precios_validos = []
-        for producto in productos_para_analisis:
-            try:
-                precio_str = str(producto.get('precio', '0')).replace(',', '.')
-                precio_num = float(precio_str)
-                if precio_num > 0:
-                    precios_validos.append(precio_num)
-            except:
-                continue
-        
-        if precios_validos:
-            precio_min = min(precios_validos)
-            precio_max = max(precios_validos)
-            precio_promedio = sum(precios_validos) / len(precios_validos)
+        # Análisis básico de precios: todos los precios se convierten de una vez
+        precios, validos = convertir_precios([producto.get('precio', '0') for producto in productos_para_analisis])
+        precios_validos = precios[validos & (precios > 0)]
+        
+        if len(precios_validos):
+            precio_min = float(precios_validos.min())
+            precio_max = float(precios_validos.max())
+            precio_promedio = float(precios_validos.mean())
         else:
             precio_min = precio_max = precio_promedio = 0
         
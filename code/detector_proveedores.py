@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Detector de proveedores en una sola pasada
+Registro único de proveedores compilado en un solo patrón, para bytes o texto
+"""
+
+import re
+
+# Proveedor -> alias. Los espacios de un alias aceptan cualquier separador
+# (espacio, &nbsp;, guion bajo, punto, guion, &, ;) o ninguno.
+REGISTRO_PROVEEDORES = {
+    'YAYI': ['YAYI'],
+    'CRIMARAL': ['CRIMARAL'],
+    'ANCAIG': ['ANCAIG'],
+    'DAFYS': ['DAFYS'],
+    'HERRAMETAL': ['HERRAMETAL'],
+    'FERRIPLAST': ['FERRIPLAST'],
+    'BABUSI': ['BABUSI'],
+    'DIST_CITY_BELL': ['DISTRIBUIDORA CITY BELL', 'DIST CITY BELL', 'CITY BELL'],
+    'BRIMAX': ['BRIMAX'],
+    'PUMA': ['PUMA'],
+    'ROTAFLEX': ['ROTAFLEX'],
+    'STANLEY': ['STANLEY'],
+    'BLACK_DECKER': ['BLACK AMP DECKER', 'BLACK DECKER'],
+    # Genéricos: sirven para nombrar hojas pero no identifican al proveedor
+    'FERRETERIA': ['FERRETERIA'],
+    'DISTRIBUIDORA': ['DISTRIBUIDORA'],
+}
+
+PROVEEDORES_GENERICOS = {'FERRETERIA', 'DISTRIBUIDORA'}
+
+UBICACIONES = ('titulo', 'pestanas', 'celdas', 'otros')
+
+# Distancia máxima hacia atrás para decidir si una aparición está en una celda
+VENTANA_CELDA = 64 * 1024
+
+SEPARADOR_ALIAS = r'[\s_.&;\xa0-]*'
+
+
+class DetectorProveedores:
+    """Patrón compilado a partir del registro de proveedores"""
+
+    def __init__(self, registro=None):
+        self.registro = registro or REGISTRO_PROVEEDORES
+        self.grupos = {}
+        alternativas = []
+
+        for i, (proveedor, alias) in enumerate(self.registro.items()):
+            grupo = f'p{i}'
+            self.grupos[grupo] = proveedor
+            # Alias más largos primero para que no los tape uno más corto
+            fragmentos = [
+                SEPARADOR_ALIAS.join(re.escape(palabra) for palabra in nombre.split())
+                for nombre in sorted(alias, key=len, reverse=True)
+            ]
+            alternativas.append(f"(?P<{grupo}>{'|'.join(fragmentos)})")
+
+        # Prefiltro con las dos primeras letras de los alias: descarta casi todas
+        # las posiciones sin probar cada alternativa (el motor de re no lo hace solo)
+        alias_todos = [nombre for alias in self.registro.values() for nombre in alias]
+        primeras = ''.join(sorted({nombre[0] for nombre in alias_todos}))
+        segundas = ''.join(sorted({nombre[1] for nombre in alias_todos}))
+        expresion = f"(?=[{re.escape(primeras)}][{re.escape(segundas)}])(?:{'|'.join(alternativas)})"
+        self.patron_texto = re.compile(expresion, re.IGNORECASE)
+        self.patron_bytes = re.compile(expresion.encode('latin-1'), re.IGNORECASE)
+
+        self.patron_titulo_texto = re.compile(r'<title[^>]*>(.*?)</title', re.IGNORECASE | re.DOTALL)
+        self.patron_titulo_bytes = re.compile(rb'<title[^>]*>(.*?)</title', re.IGNORECASE | re.DOTALL)
+        self.patron_pestanas_texto = re.compile(r'c_rgszSh\[\d+\]\s*=\s*"([^"]*)"')
+        self.patron_pestanas_bytes = re.compile(rb'c_rgszSh\[\d+\]\s*=\s*"([^"]*)"')
+
+    def contar(self, contenido):
+        """Apariciones por proveedor (sin distinguir ubicación)"""
+        conteo = {}
+        for coincidencia in self._patron(contenido).finditer(contenido):
+            proveedor = self.grupos[coincidencia.lastgroup]
+            conteo[proveedor] = conteo.get(proveedor, 0) + 1
+        return self._ordenar(conteo)
+
+    def escanear(self, contenido):
+        """
+        Recorre el contenido una vez y devuelve
+        {'total': {proveedor: n}, 'por_ubicacion': {ubicacion: {proveedor: n}}}
+        """
+        es_texto = isinstance(contenido, str)
+        marca = (lambda s: s) if es_texto else (lambda s: s.encode('ascii'))
+        apertura_celda, cierre_celda = marca('<td'), marca('</td')
+        apertura_tag, cierre_tag = marca('<'), marca('>')
+
+        rangos = []
+        patron_titulo = self.patron_titulo_texto if es_texto else self.patron_titulo_bytes
+        patron_pestanas = self.patron_pestanas_texto if es_texto else self.patron_pestanas_bytes
+        titulo = patron_titulo.search(contenido)
+        if titulo:
+            rangos.append((titulo.start(1), titulo.end(1), 'titulo'))
+        for pestana in patron_pestanas.finditer(contenido):
+            rangos.append((pestana.start(1), pestana.end(1), 'pestanas'))
+
+        total = {}
+        por_ubicacion = {ubicacion: {} for ubicacion in UBICACIONES}
+
+        for coincidencia in self._patron(contenido).finditer(contenido):
+            proveedor = self.grupos[coincidencia.lastgroup]
+            posicion = coincidencia.start()
+
+            ubicacion = None
+            for inicio, fin, nombre in rangos:
+                if inicio <= posicion < fin:
+                    ubicacion = nombre
+                    break
+
+            if ubicacion is None:
+                desde = max(0, posicion - VENTANA_CELDA)
+                en_celda = contenido.rfind(apertura_celda, desde, posicion) > contenido.rfind(cierre_celda, desde, posicion)
+                en_texto = contenido.rfind(cierre_tag, desde, posicion) >= contenido.rfind(apertura_tag, desde, posicion)
+                ubicacion = 'celdas' if en_celda and en_texto else 'otros'
+
+            total[proveedor] = total.get(proveedor, 0) + 1
+            por_ubicacion[ubicacion][proveedor] = por_ubicacion[ubicacion].get(proveedor, 0) + 1
+
+        return {
+            'total': self._ordenar(total),
+            'por_ubicacion': {ubicacion: self._ordenar(conteo) for ubicacion, conteo in por_ubicacion.items()}
+        }
+
+    def _patron(self, contenido):
+        return self.patron_texto if isinstance(contenido, str) else self.patron_bytes
+
+    def _ordenar(self, conteo):
+        """Devuelve el conteo en el orden del registro (define los desempates)"""
+        return {proveedor: conteo[proveedor] for proveedor in self.registro if proveedor in conteo}
+
+
+# Instancia compartida: el patrón se compila una sola vez por proceso
+DETECTOR = DetectorProveedores()
+
+
+def escanear_proveedores(contenido):
+    """Escanea bytes o texto con el detector compartido"""
+    return DETECTOR.escanear(contenido)
+
+
+def escanear_archivo(ruta_archivo):
+    """Escanea los bytes crudos de un archivo con el detector compartido"""
+    with open(ruta_archivo, 'rb') as archivo:
+        return DETECTOR.escanear(archivo.read())
+
+
+def elegir_proveedor(conteo, incluir_genericos=False):
+    """Proveedor con más apariciones (desempata el orden del registro), o None"""
+    candidatos = {
+        proveedor: cantidad for proveedor, cantidad in conteo.items()
+        if cantidad > 0 and (incluir_genericos or proveedor not in PROVEEDORES_GENERICOS)
+    }
+    if not candidatos:
+        return None
+    return max(candidatos.items(), key=lambda x: x[1])[0]
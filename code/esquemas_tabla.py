@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Esquemas de tabla por proveedor
+Mapa de columnas aprendido por firma de encabezado, para no volver a resolverlo en cada lista
+"""
+
+import hashlib
+import re
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+from cache_extraccion import CacheExtraccion
+from clasificacion_tabla import CAMPOS_CLASIFICADOS, clasificar_tabla
+
+# 2: columnas ubicadas en la grilla de celdas combinadas (grilla_tabla)
+VERSION_ESQUEMAS = '2'
+
+CAMPOS_ESQUEMA = ('codigo', 'descripcion', 'iva', 'medida')
+
+PATRON_LETRA = re.compile(r'[^\W\d_]')
+PATRON_DIGITOS = re.compile(r'\d+')
+PATRON_ESPACIOS = re.compile(r'\s+')
+
+# Esquemas ya leídos o aprendidos en este proceso: (directorio de la cache, clave) -> EsquemaTabla
+_ESQUEMAS_CARGADOS = {}
+
+# Cache de los esquemas: sin usar_cache no se buscan ni se guardan (directorio None: el de CacheExtraccion)
+_CONFIGURACION_CACHE = {'usar_cache': True, 'directorio': None}
+
+# Tablas resueltas con un esquema conocido, esquemas nuevos y esquemas que no sirvieron para su tabla
+# (acumulado del proceso)
+ESTADISTICAS_ESQUEMAS = {
+    'esquemas_conocidos': 0,
+    'esquemas_aprendidos': 0,
+    'esquemas_descartados': 0,
+}
+
+
+class EsquemaTabla:
+    """Mapa de columnas de una tabla: precios por tipo y columnas de origen de cada campo"""
+
+    def __init__(self, firma, columnas_precios, columnas_campos):
+        self.firma = firma
+        self.columnas_precios = columnas_precios
+        self.columnas_campos = columnas_campos  # campo -> columnas, de la más a la menos frecuente
+
+    def columnas_a_clasificar(self):
+        """Columnas que hay que clasificar en cada fila (en orden, sin las de precios)"""
+        de_precio = set(self.columnas_precios.values())
+        return tuple(sorted({
+            columna for columnas in self.columnas_campos.values() for columna in columnas
+            if columna not in de_precio
+        }))
+
+    def sirve_para(self, filas_datos, tipos_filas, fuentes_filas, clasificador):
+        """
+        Indica si las filas ya clasificadas con columnas_a_clasificar (sus
+        fuentes: campo -> columna de cada fila) tienen los mismos campos que
+        clasificándolas completas. Se clasifican sólo las otras columnas: una
+        fila cambiaría si alguna aporta un campo que no tiene o a la
+        izquierda de la columna de la que salió.
+        """
+        if not filas_datos:
+            return True
+        propias = set(self.columnas_a_clasificar())
+        otras = tuple(columna for columna in range(max(len(fila) for fila in filas_datos)) if columna not in propias)
+        if not otras:
+            return True
+
+        fuera = clasificar_tabla(filas_datos, self.columnas_precios, clasificador, tipos_filas, otras)
+        for campo in CAMPOS_CLASIFICADOS:
+            columnas = fuera[campo][1]
+            if not (columnas >= 0).any():
+                continue
+            propia = np.fromiter((fuentes.get(campo, -1) for fuentes in fuentes_filas), dtype=np.intp,
+                                 count=len(fuentes_filas))
+            if ((columnas >= 0) & ((propia < 0) | (propia > columnas))).any():
+                return False
+        return True
+
+    def columna_principal(self, campo):
+        """Columna de la que sale el campo en la mayoría de las filas (None si nunca apareció)"""
+        columnas = self.columnas_campos.get(campo)
+        return columnas[0] if columnas else None
+
+    def a_dict(self):
+        return {'firma': self.firma, 'columnas_precios': self.columnas_precios,
+                'columnas_campos': self.columnas_campos}
+
+    @classmethod
+    def desde_dict(cls, datos):
+        return cls(datos['firma'], datos['columnas_precios'],
+                   {campo: list(columnas) for campo, columnas in datos['columnas_campos'].items()})
+
+    @classmethod
+    def aprender(cls, firma, columnas_precios, fuentes, anterior=None):
+        """
+        Esquema a partir del conteo (campo, columna) -> productos de la
+        heurística. Con anterior (el esquema que no sirvió para esta tabla)
+        se conservan también sus columnas, después de las de esta tabla.
+        """
+        por_campo = {campo: Counter() for campo in CAMPOS_ESQUEMA}
+        for (campo, columna), cantidad in fuentes.items():
+            por_campo[campo][columna] += cantidad
+        columnas_campos = {
+            campo: [columna for columna, _ in sorted(conteo.items(), key=lambda item: (-item[1], item[0]))]
+            for campo, conteo in por_campo.items()
+        }
+        if anterior is not None:
+            for campo, columnas in anterior.columnas_campos.items():
+                nuevas = columnas_campos.setdefault(campo, [])
+                nuevas.extend(columna for columna in columnas if columna not in nuevas)
+        return cls(firma, dict(columnas_precios), columnas_campos)
+
+
+def _normalizar_texto(texto):
+    """Mayúsculas sin acentos, espacios colapsados y dígitos enmascarados (las fechas cambian en cada lista)"""
+    texto = unicodedata.normalize('NFKD', texto.upper())
+    texto = ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+    return PATRON_DIGITOS.sub('#', PATRON_ESPACIOS.sub(' ', texto).strip())
+
+
+def firma_encabezado(filas_encabezado):
+    """Firma de las primeras filas de una tabla: cantidad de columnas y textos normalizados por posición"""
+    columnas = max((len(fila) for fila in filas_encabezado), default=0)
+    textos = [
+        f"{j}:{_normalizar_texto(valor)}"
+        for fila in filas_encabezado for j, valor in enumerate(fila)
+        if type(valor) is str and PATRON_LETRA.search(valor)
+    ]
+    return hashlib.sha256(f"{columnas}\0{chr(1).join(textos)}".encode('utf-8')).hexdigest()
+
+
+def estadisticas_esquemas():
+    """Copia de los contadores de esquemas (para calcular diferencias antes/después)"""
+    return dict(ESTADISTICAS_ESQUEMAS)
+
+
+def configurar_cache_esquemas(usar_cache=True, directorio=None):
+    """
+    Cache de los esquemas en este proceso: la de extracción en directorio
+    (None: el directorio por defecto de CacheExtraccion); sin usar_cache
+    los esquemas no se buscan ni se guardan
+    """
+    _CONFIGURACION_CACHE['usar_cache'] = usar_cache
+    _CONFIGURACION_CACHE['directorio'] = directorio
+
+
+def configuracion_cache_esquemas():
+    """Argumentos vigentes de configurar_cache_esquemas (para repetirlos en los procesos worker)"""
+    return _CONFIGURACION_CACHE['usar_cache'], _CONFIGURACION_CACHE['directorio']
+
+
+def _cache_esquemas(cache):
+    if cache is not None:
+        return cache
+    if not _CONFIGURACION_CACHE['usar_cache']:
+        return None
+    try:
+        return CacheExtraccion(f"esquemas-{VERSION_ESQUEMAS}", _CONFIGURACION_CACHE['directorio'])
+    except OSError:
+        return None
+
+
+def _clave(cache, proveedor, firma, estilos, version_extractor):
+    return hashlib.sha256(
+        f"{cache.version}\0{version_extractor}\0{proveedor}\0{estilos}\0{firma}".encode('utf-8')).hexdigest()
+
+
+def buscar_esquema(proveedor, firma, estilos=None, version_extractor=None, cache=None):
+    """
+    EsquemaTabla del proveedor para la firma de encabezado, la hoja de
+    estilos (su firma; None si la hoja no tiene) y la versión del
+    extractor, o None si todavía no se aprendió
+    """
+    cache = _cache_esquemas(cache)
+    if cache is None:
+        return None
+    clave = _clave(cache, proveedor, firma, estilos, version_extractor)
+    memoria = (cache.directorio, clave)
+    if memoria in _ESQUEMAS_CARGADOS:
+        ESTADISTICAS_ESQUEMAS['esquemas_conocidos'] += 1
+        return _ESQUEMAS_CARGADOS[memoria]
+
+    datos = cache.obtener(clave)
+    if datos is None:
+        return None
+
+    ESTADISTICAS_ESQUEMAS['esquemas_conocidos'] += 1
+    _ESQUEMAS_CARGADOS[memoria] = EsquemaTabla.desde_dict(datos)
+    return _ESQUEMAS_CARGADOS[memoria]
+
+
+def esquema_para_filas(esquema, filas_datos, tipos_filas, fuentes_filas, clasificador):
+    """
+    El esquema si sirve para las filas ya clasificadas con él
+    (EsquemaTabla.sirve_para); si no, None y se cuenta como descartado
+    """
+    if esquema is None or esquema.sirve_para(filas_datos, tipos_filas, fuentes_filas, clasificador):
+        return esquema
+    ESTADISTICAS_ESQUEMAS['esquemas_descartados'] += 1
+    return None
+
+
+def registrar_esquema(proveedor, esquema, estilos=None, version_extractor=None, cache=None):
+    """Guarda el esquema aprendido en este proceso y en la cache en disco (si la cache está activa)"""
+    ESTADISTICAS_ESQUEMAS['esquemas_aprendidos'] += 1
+    cache = _cache_esquemas(cache)
+    if cache is None:
+        return
+    clave = _clave(cache, proveedor, esquema.firma, estilos, version_extractor)
+    _ESQUEMAS_CARGADOS[(cache.directorio, clave)] = esquema
+    cache.guardar(clave, esquema.a_dict())
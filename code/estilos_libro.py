@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tipos de celda a partir de la hoja de estilos de la exportación (mso-number-format de cada clase)
+"""
+
+import hashlib
+import os
+import re
+
+from cache_extraccion import CacheExtraccion
+
+VERSION_ESTILOS = '1'
+
+NOMBRE_HOJA_ESTILOS = 'stylesheet.css'
+
+# Bytes iniciales de la hoja donde se busca el <link rel=Stylesheet>
+TAMANO_ENCABEZADO = 8192
+
+# Formatos cuyos valores numéricos no pueden ser un campo de texto del producto
+TIPOS_SIN_TEXTO = frozenset({'moneda', 'porcentaje', 'decimal', 'fecha'})
+
+FORMATOS_CON_NOMBRE = {
+    'general': 'general',
+    'fixed': 'decimal',
+    'standard': 'decimal',
+    'percent': 'porcentaje',
+    'currency': 'moneda',
+    'short date': 'fecha',
+    'medium date': 'fecha',
+    'long date': 'fecha',
+    'short time': 'fecha',
+    'medium time': 'fecha',
+    'long time': 'fecha',
+}
+
+PATRON_REGLA = re.compile(r'\.([\w-]+)\s*\{([^}]*)\}')
+PATRON_FORMATO = re.compile(r'mso-number-format\s*:\s*("(?:[^"\\]|\\.)*"|[^;]*)')
+PATRON_PADRE = re.compile(r'mso-style-parent\s*:\s*([\w-]+)')
+PATRON_ENLACE_ESTILOS = re.compile(r'<link\s+rel="?Stylesheet"?\s+href="?([^">\s]+)', re.IGNORECASE)
+PATRON_ESCAPE_CSS = re.compile(r'\\([0-9a-fA-F]{4}|.)')
+PATRON_MONEDA_BLOQUE = re.compile(r'\[\$([^\]-]*)')
+PATRON_BLOQUE = re.compile(r'\[[^\]]*\]')
+PATRON_LITERAL = re.compile(r'"[^"]*"')
+PATRON_FECHA = re.compile(r'[dmyhs]', re.IGNORECASE)
+
+# Tablas ya leídas en este proceso: (ruta, mtime, tamaño) -> TiposCeldas
+_TIPOS_CARGADOS = {}
+
+
+class TiposCeldas:
+    """Tabla clase CSS -> tipo de celda de un libro"""
+
+    def __init__(self, tipos, firma):
+        self.tipos = tipos
+        self.firma = firma  # Hash del contenido del .css
+
+    def __len__(self):
+        return len(self.tipos)
+
+    def tipos_de(self, clases):
+        """Tipo de cada celda de una fila a partir de sus clases (None si no se conoce)"""
+        tipos = self.tipos
+        return [tipos.get(clase) for clase in clases]
+
+
+def es_valor_sin_texto(tipo, valor):
+    """
+    Indica si la celda es un valor numérico formateado (no un campo de texto).
+    upper() == lower() descarta las celdas con letras sin usar patrones.
+    """
+    return tipo in TIPOS_SIN_TEXTO and valor.upper() == valor.lower()
+
+
+def _desescapar(valor):
+    """Quita los escapes CSS (\\0022 -> ", \\# -> #)"""
+    def reemplazar(coincidencia):
+        escape = coincidencia.group(1)
+        return chr(int(escape, 16)) if len(escape) == 4 else escape
+    return PATRON_ESCAPE_CSS.sub(reemplazar, valor)
+
+
+def tipo_de_formato(formato):
+    """Tipo de celda que corresponde a un mso-number-format"""
+    formato = formato.strip()
+    if formato.startswith('"') and formato.endswith('"') and len(formato) >= 2:
+        formato = formato[1:-1]
+    formato = _desescapar(formato)
+
+    if formato == '@':
+        return 'texto'
+    if not formato or formato.lower() in FORMATOS_CON_NOMBRE:
+        return FORMATOS_CON_NOMBRE.get(formato.lower(), 'general')
+
+    # Sólo la primera sección (valores positivos) define el tipo
+    seccion = formato.split(';')[0]
+    if any(simbolo for simbolo in PATRON_MONEDA_BLOQUE.findall(seccion)):
+        return 'moneda'
+    literales = ''.join(PATRON_LITERAL.findall(seccion))
+    seccion = PATRON_LITERAL.sub('', PATRON_BLOQUE.sub('', seccion))
+
+    if '%' in seccion:
+        return 'porcentaje'
+    if any(simbolo in literales + seccion for simbolo in ('$', '€')):
+        return 'moneda'
+    if '/' in seccion and ('?' in seccion or '#' in seccion):
+        return 'fraccion'
+    if PATRON_FECHA.search(seccion):
+        return 'fecha'
+    if '0' in seccion or '#' in seccion:
+        return 'decimal' if '.' in seccion else 'entero'
+    return 'general'
+
+
+def leer_estilos(texto_css):
+    """Tabla clase -> tipo a partir del texto de la hoja de estilos"""
+    formatos = {}
+    padres = {}
+    for clase, cuerpo in PATRON_REGLA.findall(texto_css):
+        formato = PATRON_FORMATO.search(cuerpo)
+        if formato:
+            formatos[clase] = formato.group(1)
+        padre = PATRON_PADRE.search(cuerpo)
+        if padre:
+            padres[clase] = padre.group(1)
+
+    tipos = {}
+    for clase in set(formatos) | set(padres):
+        # Sin formato propio se hereda el del estilo padre (style0 = Normal)
+        actual = clase
+        while actual not in formatos and actual in padres and padres[actual] != actual:
+            actual = padres[actual]
+        tipos[clase] = tipo_de_formato(formatos[actual]) if actual in formatos else 'general'
+    return tipos
+
+
+def _decodificar_css(contenido):
+    """Las exportaciones usan el charset del libro (windows-1252) también en el .css"""
+    try:
+        return contenido.decode('utf-8')
+    except UnicodeDecodeError:
+        return contenido.decode('cp1252', 'ignore')
+
+
+def cargar_tipos_celdas(ruta_css, cache=None):
+    """
+    TiposCeldas de una hoja de estilos. Se lee una vez por proceso y el
+    resultado queda en la cache en disco (CacheExtraccion) para las
+    corridas y los workers siguientes.
+    """
+    estado = os.stat(ruta_css)
+    memoria = (os.path.abspath(ruta_css), estado.st_mtime_ns, estado.st_size)
+    if memoria in _TIPOS_CARGADOS:
+        return _TIPOS_CARGADOS[memoria]
+
+    with open(ruta_css, 'rb') as archivo:
+        contenido = archivo.read()
+    firma = hashlib.sha256(contenido).hexdigest()
+
+    try:
+        cache = cache or CacheExtraccion(f"estilos-{VERSION_ESTILOS}")
+        clave = hashlib.sha256(f"{cache.version}\0{firma}".encode('utf-8')).hexdigest()
+        tipos = cache.obtener(clave)
+    except OSError:
+        cache = tipos = None
+
+    if tipos is None:
+        tipos = leer_estilos(_decodificar_css(contenido))
+        if cache is not None:
+            cache.guardar(clave, tipos)
+
+    _TIPOS_CARGADOS[memoria] = TiposCeldas(tipos, firma)
+    return _TIPOS_CARGADOS[memoria]
+
+
+def buscar_hoja_de_estilos(ruta_hoja, texto_hoja=None):
+    """Ruta del .css que enlaza la hoja (o stylesheet.css de su directorio); None si no existe"""
+    directorio = os.path.dirname(os.path.abspath(ruta_hoja))
+    if texto_hoja is None:
+        try:
+            with open(ruta_hoja, 'rb') as archivo:
+                texto_hoja = archivo.read(TAMANO_ENCABEZADO).decode('latin-1')
+        except OSError:
+            texto_hoja = ''
+
+    candidatos = []
+    if texto_hoja:
+        enlace = PATRON_ENLACE_ESTILOS.search(texto_hoja[:TAMANO_ENCABEZADO])
+        if enlace:
+            candidatos.append(os.path.normpath(os.path.join(directorio, enlace.group(1))))
+    candidatos.append(os.path.join(directorio, NOMBRE_HOJA_ESTILOS))
+
+    for candidato in candidatos:
+        if os.path.isfile(candidato):
+            return candidato
+    return None
+
+
+def tipos_celdas_de_hoja(ruta_hoja, texto_hoja=None):
+    """TiposCeldas del libro al que pertenece la hoja (None si no tiene hoja de estilos)"""
+    ruta_css = buscar_hoja_de_estilos(ruta_hoja, texto_hoja)
+    if ruta_css is None:
+        return None
+    try:
+        return cargar_tipos_celdas(ruta_css)
+    except OSError:
+        return None
+
+
+def firma_estilos_de_hoja(ruta_hoja):
+    """Hash de la hoja de estilos del libro (para la clave de cache de la hoja); None si no tiene"""
+    tipos = tipos_celdas_de_hoja(ruta_hoja)
+    return tipos.firma if tipos is not None else None
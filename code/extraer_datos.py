@@ -5,6 +5,7 @@ Script para extraer datos estructurados de las hojas de Excel convertidas a HTML
 
 CARACTERÍSTICAS:
 - Detección automática de archivos HTML en el directorio
+- Lectura directa de libros .xlsx por streaming (valores numéricos nativos)
 - Mapeo inteligente de nombres de proveedores
 - Soporte para directorios personalizados
 - Generación dinámica de nombres de planilla
@@ -12,25 +13,47 @@ CARACTERÍSTICAS:
 USO:
 - python extraer_datos.py                    # Usa directorio actual
 - python extraer_datos.py "ruta/directorio"  # Usa directorio específico
+- python extraer_datos.py "ruta" -w 4         # Procesa hojas con 4 procesos
+- python extraer_datos.py "ruta" -o out.json  # Archivo de salida personalizado
+- python extraer_datos.py "ruta" --no-cache   # Reprocesa hojas aunque no hayan cambiado
+- python extraer_datos.py "ruta" --listar-hojas        # Muestra las pestañas del libro sin extraer
+- python extraer_datos.py "ruta" --hojas BASE DAFYS    # Extrae sólo esas pestañas
+- python extraer_datos.py "ruta/libro.xlsx"           # Lee el libro original (sin exportar a HTML)
 """
 
 import os
 import json
 import re
 from bs4 import BeautifulSoup
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
 from datetime import datetime
+from itertools import groupby, islice
 
-def limpiar_texto(texto):
-    """Limpia y normaliza el texto"""
-    if not texto:
-        return ""
-    
-    # Remover espacios extra y caracteres especiales
-    texto = re.sub(r'\s+', ' ', texto.strip())
-    texto = texto.replace('\xa0', ' ')  # Non-breaking space
-    texto = texto.replace('\u00a0', ' ')  # Non-breaking space
-    
-    return texto
+from cache_extraccion import CacheExtraccion, calcular_clave_archivo
+from clasificacion_tabla import CAMPOS_CLASIFICADOS, clasificar_tabla
+from clasificador_celdas import ClasificadorCeldas, tasa_aciertos
+from conversion_precios import SEPARADORES_POR_DEFECTO, convertir_precio, convertir_precios, separadores_de_texto
+from detector_proveedores import DETECTOR, elegir_proveedor
+from esquemas_tabla import (EsquemaTabla, buscar_esquema, configuracion_cache_esquemas, configurar_cache_esquemas,
+                            esquema_para_filas, estadisticas_esquemas, firma_encabezado, registrar_esquema)
+from estilos_libro import TIPOS_SIN_TEXTO, firma_estilos_de_hoja, tipos_celdas_de_hoja
+from grilla_tabla import filas_en_grilla
+from lector_html import (FILAS_ENCABEZADO, celdas_omitidas, dividir_en_rangos_de_filas, estadisticas_poda,
+                         filas_encabezado_de_rango, iterar_filas_tablas, leer_bloques, leer_documento, leer_rango,
+                         limpiar_texto)
+from lector_xlsx import es_libro_xlsx, iterar_filas_xlsx, listar_hojas_xlsx
+from manifiesto_libro import cargar_manifiesto
+from memoria_acotada import ProductosEnDisco, filas_por_lote_para, leer_max_memory_mb, rss_pico_mb
+from progreso_extraccion import ProgresoExtraccion, formatear_progreso, preescanear_hojas
+from puntos_control import PuntosControl, directorio_ejecucion_por_defecto
+from regiones_tabla import (configurar_regiones, estadisticas_regiones, filas_a_clasificar, rasgos_de_filas,
+                            regiones_activas)
+from salida_resultados import EXTENSION_NDJSON, EscritorNDJSON, es_salida_ndjson, escribir_json
+from tabla_productos import TablaProductos
+
+# Versión del algoritmo de extracción: cambiarla invalida la cache de hojas
+VERSION_EXTRACTOR = '2.8'
 
 def identificar_columnas_precios(tabla):
     """
@@ -64,16 +87,17 @@ def identificar_columnas_precios(tabla):
     
     return columnas_precios
 
-def extraer_precios_estructurados(fila_datos, columnas_precios):
+def extraer_precios_estructurados(fila_datos, columnas_precios, normalizar_precio=None):
     """
     Extrae precios estructurados según las columnas identificadas
     """
+    normalizar_precio = normalizar_precio or normalizar_precio_avanzado
     precios = {}
     
     for tipo_precio, columna_idx in columnas_precios.items():
         if columna_idx is not None and columna_idx < len(fila_datos):
             celda = fila_datos[columna_idx]
-            precio_normalizado = normalizar_precio_avanzado(celda)
+            precio_normalizado = normalizar_precio(celda)
             if precio_normalizado:
                 precios[tipo_precio] = precio_normalizado
     
@@ -88,23 +112,31 @@ def es_numero_precio(texto):
     patron_precio = re.compile(r'^[\$\s]*[\d\.,]+$')
     return bool(patron_precio.match(str(texto).strip()))
 
-def normalizar_precio_avanzado(precio_str):
-    """Normaliza un string de precio a formato numérico"""
-    if not precio_str:
-        return None
-    
-    # Limpiar caracteres no numéricos excepto puntos y comas
-    precio_limpio = re.sub(r'[^\d,.]', '', str(precio_str))
-    
-    if precio_limpio and precio_limpio not in ['0', '0,00', '0.00']:
-        # Convertir comas a puntos para formato decimal
-        precio_limpio = precio_limpio.replace(',', '.')
-        try:
-            return float(precio_limpio)
-        except ValueError:
-            return precio_limpio  # Retornar como string si no se puede convertir
-    
-    return None
+def normalizar_precio_avanzado(precio_str, separadores=SEPARADORES_POR_DEFECTO):
+    """Normaliza un precio (texto con los separadores de la hoja o número) a float; None si no es un precio"""
+    # Los valores en cero tampoco son un precio
+    return convertir_precio(precio_str, separadores) or None
+
+def precios_estructurados_de_filas(filas_datos, columnas_precios, separadores=SEPARADORES_POR_DEFECTO):
+    """
+    Igual que extraer_precios_estructurados para todas las filas de una
+    tabla: cada columna de precios se convierte de una sola vez
+    (conversion_precios) con los separadores declarados por la hoja
+    """
+    precios = [{} for _ in filas_datos]
+    for tipo_precio, columna_idx in columnas_precios.items():
+        if columna_idx is None:
+            continue
+        valores = [fila[columna_idx] if columna_idx < len(fila) else '' for fila in filas_datos]
+        numeros, validos = convertir_precios(valores, separadores)
+        for precios_fila, numero, valido in zip(precios, numeros.tolist(), validos.tolist()):
+            if valido and numero:
+                precios_fila[tipo_precio] = numero
+    return precios
+
+# Clasificador compartido: patrones compilados y cache por valor de celda
+# que se conservan entre las hojas procesadas por el mismo proceso
+CLASIFICADOR = ClasificadorCeldas(normalizar_precio_avanzado)
 
 def extraer_datos_tabla(soup):
     """Extrae datos de las tablas en el HTML con procesamiento inteligente de productos"""
@@ -195,10 +227,8 @@ def procesar_hoja(ruta_archivo, nombre_hoja):
     try:
         print(f"Procesando {nombre_hoja}...")
         
-        with open(ruta_archivo, 'r', encoding='utf-8', errors='ignore') as archivo:
-            contenido = archivo.read()
-        
-        soup = BeautifulSoup(contenido, 'html.parser')
+        documento = leer_documento(ruta_archivo)
+        soup = BeautifulSoup(documento.texto, 'html.parser')
         
         # Extraer datos de las tablas con el nuevo algoritmo mejorado
         datos_tablas, productos_encontrados = extraer_datos_tabla(soup)
@@ -217,7 +247,7 @@ def procesar_hoja(ruta_archivo, nombre_hoja):
         
         # Extraer información adicional del HTML
         metadata = {
-            'encoding': 'utf-8',
+            'encoding': documento.codificacion,
             'generator': None,
             'title': None
         }
@@ -279,44 +309,46 @@ def procesar_hoja(ruta_archivo, nombre_hoja):
         print(f"Error procesando {nombre_hoja}: {str(e)}")
         return None
 
+# Dónde se busca el nombre de la hoja: encabezados h1-h6 y las primeras celdas de las primeras tablas
+PATRON_ENCABEZADO_HTML = re.compile(r'<h([1-6])\b[^>]*>(.*?)</h\1', re.IGNORECASE | re.DOTALL)
+PATRON_TABLA_HTML = re.compile(r'<table\b', re.IGNORECASE)
+PATRON_FIN_TABLA_HTML = re.compile(r'</table', re.IGNORECASE)
+PATRON_FILA_HTML = re.compile(r'<tr\b', re.IGNORECASE)
+PATRON_CELDA_HTML = re.compile(r'<t[dh]\b[^>]*>(.*?)(?=<t[dh]\b|</?tr\b|$)', re.IGNORECASE | re.DOTALL)
+TABLAS_NOMBRE, FILAS_NOMBRE, CELDAS_NOMBRE = 2, 3, 3
+
+def _primeras_celdas(texto):
+    """Texto de las primeras celdas de las primeras filas de las primeras tablas (sin parsear el HTML)"""
+    celdas = []
+    for tabla in islice(PATRON_TABLA_HTML.finditer(texto), TABLAS_NOMBRE):
+        cierre = PATRON_FIN_TABLA_HTML.search(texto, tabla.end())
+        fin_tabla = cierre.start() if cierre else len(texto)
+        filas = [fila.end() for fila in islice(PATRON_FILA_HTML.finditer(texto, tabla.end(), fin_tabla), FILAS_NOMBRE)]
+        for inicio, fin in zip(filas, filas[1:] + [fin_tabla]):
+            celdas.extend(celda.group(1) for celda in islice(PATRON_CELDA_HTML.finditer(texto, inicio, fin),
+                                                              CELDAS_NOMBRE))
+    return celdas
+
 def detectar_nombre_desde_contenido(ruta_archivo):
-    """Intenta detectar el nombre del proveedor desde el contenido del HTML"""
+    """
+    Intenta detectar el nombre del proveedor desde el contenido del HTML:
+    el título, luego los encabezados h1-h6 y por último las primeras celdas
+    de las primeras tablas (sólo esos textos pasan por el detector)
+    """
     try:
-        with open(ruta_archivo, 'r', encoding='utf-8', errors='ignore') as archivo:
-            contenido = archivo.read()
-        
-        soup = BeautifulSoup(contenido, 'html.parser')
-        
-        # Buscar en el título de la página
-        titulo = soup.find('title')
-        if titulo:
-            texto_titulo = limpiar_texto(titulo.get_text()).upper()
-            # Buscar nombres de proveedores conocidos en el título
-            proveedores_conocidos = ['CRIMARAL', 'ANCAIG', 'DAFYS', 'HERRAMETAL', 'YAYI', 
-                                   'DIST_CITY_BELL', 'BABUSI', 'FERRIPLAST', 'FERRETERIA']
-            for proveedor in proveedores_conocidos:
-                if proveedor in texto_titulo:
-                    return proveedor
-        
-        # Buscar en encabezados de tabla
-        encabezados = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-        for encabezado in encabezados:
-            texto = limpiar_texto(encabezado.get_text()).upper()
-            for proveedor in proveedores_conocidos:
-                if proveedor in texto:
-                    return proveedor
-        
-        # Buscar en las primeras celdas de las tablas
-        tablas = soup.find_all('table')
-        for tabla in tablas[:2]:  # Solo revisar las primeras 2 tablas
-            filas = tabla.find_all('tr')[:3]  # Solo las primeras 3 filas
-            for fila in filas:
-                celdas = fila.find_all(['td', 'th'])
-                for celda in celdas[:3]:  # Solo las primeras 3 celdas
-                    texto = limpiar_texto(celda.get_text()).upper()
-                    for proveedor in proveedores_conocidos:
-                        if proveedor in texto:
-                            return proveedor
+        texto = leer_documento(ruta_archivo).texto
+        titulo = DETECTOR.patron_titulo_texto.search(texto)
+        ubicaciones = (
+            [titulo.group(1)] if titulo else [],
+            [encabezado.group(2) for encabezado in PATRON_ENCABEZADO_HTML.finditer(texto)],
+            _primeras_celdas(texto),
+        )
+        
+        for textos in ubicaciones:
+            # '<' no es separador de alias: un nombre no se arma con el final de un texto y el principio del otro
+            proveedor = elegir_proveedor(DETECTOR.contar('<'.join(textos)), incluir_genericos=True)
+            if proveedor:
+                return proveedor
         
         return None
         
@@ -383,7 +415,374 @@ def detectar_archivos_html(directorio):
         print(f"❌ Error listando archivos: {str(e)}")
         return []
 
-def extraer_datos_html(directorio, archivo_salida_personalizado=None):
+def detectar_libro_xlsx(ruta):
+    """
+    Libro .xlsx a procesar: la ruta misma si es un libro, o el único libro
+    de un directorio que no tiene hojas HTML. None si corresponde el HTML.
+    """
+    if os.path.isfile(ruta):
+        return ruta if es_libro_xlsx(ruta) else None
+    
+    if detectar_archivos_html(ruta):
+        return None
+    
+    try:
+        libros = sorted(archivo for archivo in os.listdir(ruta) if es_libro_xlsx(archivo))
+    except OSError:
+        return None
+    if len(libros) > 1:
+        print(f"⚠️ Varios libros .xlsx en el directorio, indicar cuál procesar: {', '.join(libros)}")
+        return None
+    return os.path.join(ruta, libros[0]) if libros else None
+
+# Con workers > 1, las hojas HTML de este tamaño o más se parten en rangos de filas
+UMBRAL_DIVISION_HOJA = 1024 * 1024
+
+def procesar_archivos_en_paralelo(directorio, archivos_html, workers=1, cache=None, seleccion=None,
+                                  libro_xlsx=None, puntos_control=None, filas_por_lote=None, regiones=False):
+    """
+    Procesa las hojas de un directorio y devuelve sus resultados en el mismo
+    orden que archivos_html, sin importar el orden en que terminen. Con
+    seleccion (conjunto de nombres de archivo) sólo se procesan esas hojas,
+    conservando su posición en archivos_html para nombrarlas. Con libro_xlsx
+    (ruta de un .xlsx), archivos_html son los nombres de sus hojas.
+    
+    Cada elemento es {'archivo', 'datos', 'error', 'clasificador', 'poda'}:
+    los errores de una hoja quedan registrados en vez de interrumpir el resto,
+    'clasificador' trae los aciertos/consultas de la cache de celdas y los
+    valores/celdas clasificados en lote, y 'poda' las filas y celdas
+    omitidas antes de clasificar, incluidas las filas fuera de las regiones
+    de productos (ambos None si la hoja no se parseó). Si se pasa una
+    CacheExtraccion, las hojas sin cambios se toman de ella sin parsearlas
+    (la clave de una hoja HTML incluye la hoja de estilos del libro, que
+    define el tipo de sus celdas).
+    Con workers > 1 las hojas de UMBRAL_DIVISION_HOJA o más se reparten en
+    rangos de filas (HojaPorRangos). Con puntos_control (PuntosControl)
+    cada hoja terminada se guarda en la ejecución y las que ya estaban
+    guardadas con la misma clave se toman de ahí (reanudar una corrida).
+    Con filas_por_lote (memoria acotada) las hojas se procesan en este
+    proceso, de a una y con sus tablas clasificadas en lotes de filas. Con
+    regiones sólo se clasifican las filas de las regiones de productos
+    (regiones_tabla), también en los workers.
+    """
+    tareas = [
+        (libro_xlsx or os.path.join(directorio, archivo_nombre), archivo_nombre, i,
+         archivo_nombre if libro_xlsx else None)
+        for i, archivo_nombre in enumerate(archivos_html)
+        if seleccion is None or archivo_nombre in seleccion
+    ]
+    
+    # Resolver desde los puntos de control o la cache las hojas cuyo contenido no cambió
+    claves = {}
+    en_cache = {}
+    guardadas = set()
+    if cache is not None or puntos_control is not None:
+        for ruta_completa, archivo_nombre, _, hoja_xlsx in tareas:
+            try:
+                parte = hoja_xlsx if libro_xlsx else firma_estilos_de_hoja(ruta_completa)
+                claves[archivo_nombre] = (cache.calcular_clave(ruta_completa, parte) if cache is not None else
+                                          calcular_clave_archivo(version_extraccion(regiones), ruta_completa, parte))
+            except OSError:
+                continue  # El error se informa al procesar la hoja
+            contenido = None
+            if puntos_control is not None:
+                contenido = puntos_control.obtener(archivo_nombre, claves[archivo_nombre])
+                if contenido is not None:
+                    guardadas.add(archivo_nombre)
+            if contenido is None and cache is not None:
+                contenido = cache.obtener(claves[archivo_nombre])
+            if contenido is not None:
+                en_cache[archivo_nombre] = contenido
+    
+    pendientes = [tarea for tarea in tareas if tarea[1] not in en_cache]
+    executor = None
+    
+    # Los esquemas de tabla usan la misma cache que las hojas y la detección de regiones sigue a regiones
+    # (también en los procesos worker)
+    configuracion_anterior = configuracion_cache_esquemas()
+    regiones_anteriores = regiones_activas()
+    configurar_cache_esquemas(cache is not None, cache.directorio if cache is not None else None)
+    configurar_regiones(regiones)
+    try:
+        # Las hojas HTML muy grandes se reparten en rangos de filas entre los workers
+        divisibles = [
+            tarea for tarea in pendientes
+            if tarea[3] is None and _tamano_archivo(tarea[0]) >= UMBRAL_DIVISION_HOJA
+        ] if workers > 1 else []
+        
+        if workers <= 1 or filas_por_lote is not None or (len(pendientes) <= 1 and not divisibles):
+            resultados = (_procesar_tarea_hoja(tarea, filas_por_lote) for tarea in pendientes)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers if divisibles else min(workers, len(pendientes)),
+                                           initializer=_configurar_worker,
+                                           initargs=(configuracion_cache_esquemas(), regiones))
+            # Enviar primero las hojas más grandes para repartir mejor la carga
+            orden_envio = sorted(pendientes, key=lambda tarea: _tamano_archivo(tarea[0]), reverse=True)
+            futuros = {}
+            for tarea in orden_envio:
+                futuro = HojaPorRangos.enviar(executor, tarea, workers) if tarea in divisibles else None
+                futuros[tarea[1]] = futuro or executor.submit(_procesar_tarea_hoja, tarea)
+            resultados = (futuros[tarea[1]].result() for tarea in pendientes)
+        
+        for _, archivo_nombre, indice, _ in tareas:
+            if archivo_nombre in en_cache:
+                resultado = {'archivo': archivo_nombre, 'contenido': en_cache[archivo_nombre], 'error': None,
+                             'clasificador': None, 'poda': None}
+            else:
+                resultado = next(resultados)
+                if cache is not None and not resultado['error'] and archivo_nombre in claves:
+                    cache.guardar(claves[archivo_nombre], resultado['contenido'])
+            if (puntos_control is not None and not resultado['error'] and archivo_nombre in claves
+                    and archivo_nombre not in guardadas):
+                puntos_control.guardar(archivo_nombre, claves[archivo_nombre], resultado['contenido'])
+            
+            datos = None
+            if not resultado['error']:
+                contenido = resultado['contenido']
+                datos = armar_datos_hoja(contenido['productos'], contenido['proveedor'], archivo_nombre, indice)
+            yield {'archivo': archivo_nombre, 'datos': datos, 'error': resultado['error'],
+                   'clasificador': resultado['clasificador'], 'poda': resultado.get('poda')}
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        configurar_cache_esquemas(*configuracion_anterior)
+        configurar_regiones(regiones_anteriores)
+
+def _configurar_worker(configuracion_esquemas, regiones):
+    """Repite en el proceso worker la cache de esquemas y la detección de regiones del proceso principal"""
+    configurar_cache_esquemas(*configuracion_esquemas)
+    configurar_regiones(regiones)
+
+def version_extraccion(regiones=None):
+    """
+    VERSION_EXTRACTOR con la detección de regiones (None: la vigente en el
+    proceso): las claves de la cache y de los esquemas no mezclan
+    resultados con y sin regiones
+    """
+    if regiones is None:
+        regiones = regiones_activas()
+    return f"{VERSION_EXTRACTOR}+regiones" if regiones else VERSION_EXTRACTOR
+
+def _estadisticas_omision():
+    """Filas y celdas omitidas antes de clasificar: poda del lector y filas fuera de regiones"""
+    return {**estadisticas_poda(), **estadisticas_regiones()}
+
+def _diferencia_omision(antes):
+    despues = _estadisticas_omision()
+    return {clave: despues[clave] - antes[clave] for clave in despues}
+
+def _estadisticas_clasificacion():
+    """
+    Aciertos/consultas de la cache de celdas, valores distintos y celdas
+    clasificados en lote, y tablas resueltas con esquemas conocidos o nuevos
+    """
+    estadisticas = CLASIFICADOR.estadisticas()
+    return {'aciertos': estadisticas['aciertos'], 'consultas': estadisticas['consultas'],
+            'valores_en_lote': estadisticas['valores_en_lote'], 'celdas_en_lote': estadisticas['celdas_en_lote'],
+            **estadisticas_esquemas()}
+
+def _diferencia_clasificacion(antes):
+    despues = _estadisticas_clasificacion()
+    return {clave: despues[clave] - antes[clave] for clave in despues}
+
+def _procesar_tarea_hoja(tarea, filas_por_lote=None):
+    """Extrae los productos de una hoja capturando el error (se ejecuta en el proceso worker)"""
+    ruta_completa, archivo_nombre, _, hoja_xlsx = tarea
+    antes = _estadisticas_clasificacion()
+    antes_poda = _estadisticas_omision()
+    try:
+        if hoja_xlsx is not None:
+            productos, proveedor = extraer_productos_de_hoja_xlsx(ruta_completa, hoja_xlsx, filas_por_lote)
+        else:
+            productos, proveedor = extraer_productos_de_archivo(ruta_completa, filas_por_lote)
+        contenido = {'productos': productos, 'proveedor': proveedor}
+        resultado = {'archivo': archivo_nombre, 'contenido': contenido, 'error': None}
+    except Exception as e:
+        resultado = {'archivo': archivo_nombre, 'contenido': None, 'error': f"{type(e).__name__}: {e}"}
+    
+    resultado['clasificador'] = _diferencia_clasificacion(antes)
+    resultado['poda'] = _diferencia_omision(antes_poda)
+    return resultado
+
+class HojaPorRangos:
+    """
+    Hoja HTML repartida en rangos de bytes alineados con sus filas, que se
+    parsean y clasifican en paralelo. result() junta los productos en el
+    orden de la hoja, igual que extraer_productos_de_archivo.
+    
+    El estado que cruza filas en la extracción se resuelve fuera de los
+    rangos. Las columnas de precios (y el esquema de la tabla, si ya es
+    conocido) salen de las primeras filas: se calculan una vez acá y se
+    pasan a todos los rangos. Las regiones de productos (regiones_tabla, si
+    están activas) y el esquema nuevo dependen de la tabla completa: cada
+    rango devuelve los
+    rasgos de sus filas, la fila de cada producto y sus columnas de origen,
+    y result() detecta las regiones sobre la tabla entera, descarta los
+    productos de las filas de afuera y aprende el esquema de los demás.
+    """
+    
+    def __init__(self, tarea, futuros, proveedor, firma, estilos, columnas_precios, esquema):
+        self.tarea = tarea
+        self.futuros = futuros
+        self.proveedor = proveedor
+        self.firma = firma
+        self.estilos = estilos
+        self.columnas_precios = columnas_precios
+        self.esquema = esquema
+    
+    @classmethod
+    def enviar(cls, executor, tarea, partes):
+        """Envía los rangos de la hoja al executor (None si la hoja no se puede dividir)"""
+        ruta_completa = tarea[0]
+        try:
+            division = dividir_en_rangos_de_filas(ruta_completa, partes)
+            if division is None:
+                return None
+            codificacion, rangos = division
+            
+            documento = leer_documento(ruta_completa)
+            proveedor = elegir_proveedor_principal(contar_proveedores_en_contenido(documento.texto))
+            separadores = separadores_de_texto(documento.texto)
+            
+            # Las mismas primeras filas que usa extraer_productos_de_filas para la tabla principal
+            primeras_filas = []
+            for indice_tabla, fila_datos in iterar_filas_tablas(documento.bloques(), podar=True):
+                if indice_tabla == 0 and fila_datos:
+                    primeras_filas.append(fila_datos)
+                    if len(primeras_filas) == FILAS_ENCABEZADO:
+                        break
+            firma = firma_encabezado(primeras_filas)
+            estilos = firma_estilos_de_hoja(ruta_completa)
+            esquema = buscar_esquema(proveedor, firma, estilos, version_extraccion())
+            columnas_precios = esquema.columnas_precios if esquema is not None else \
+                identificar_columnas_precios(primeras_filas)
+        except OSError:
+            return None  # El error se informa al procesar la hoja completa
+        
+        futuros = [
+            executor.submit(_procesar_rango_hoja,
+                            (ruta_completa, inicio, fin, codificacion, columnas_precios, esquema, proveedor,
+                             separadores))
+            for inicio, fin in rangos
+        ]
+        return cls(tarea, futuros, proveedor, firma, estilos, columnas_precios, esquema)
+    
+    def result(self):
+        _, archivo_nombre, _, _ = self.tarea
+        partes = [futuro.result() for futuro in self.futuros]
+        clasificador = {clave: sum(parte['clasificador'][clave] for parte in partes)
+                        for clave in partes[0]['clasificador']}
+        clasificador['esquemas_conocidos'] += self.esquema is not None
+        # Si el esquema no sirvió para algún rango se vuelve a aprender con las fuentes de toda la tabla
+        descartado = any(parte['esquema_descartado'] for parte in partes)
+        clasificador['esquemas_descartados'] += descartado
+        poda = {clave: sum(parte['poda'][clave] for parte in partes) for clave in partes[0]['poda']}
+        
+        errores = [parte['error'] for parte in partes if parte['error']]
+        if errores:
+            return {'archivo': archivo_nombre, 'contenido': None, 'error': errores[0], 'clasificador': clasificador,
+                    'poda': poda}
+        
+        # Regiones de productos de la tabla principal completa (filas numeradas en orden de rangos)
+        antes_poda = _estadisticas_omision()
+        rasgos = [rasgos_fila for parte in partes for rasgos_fila in parte['rasgos']]
+        seleccion = set(filas_a_clasificar(rasgos))
+        for clave, cantidad in _diferencia_omision(antes_poda).items():
+            poda[clave] += cantidad
+        
+        # Primero la tabla principal en orden de rangos, después las tablas anidadas (primer rango)
+        productos = []
+        fuentes = Counter()
+        desplazamiento = 0
+        for parte in partes:
+            for indice, producto, fuentes_producto in zip(parte['indices'], parte['productos'], parte['fuentes']):
+                if desplazamiento + indice in seleccion:
+                    productos.append(producto)
+                    fuentes.update(fuentes_producto)
+            desplazamiento += len(parte['rasgos'])
+        if (self.esquema is None or descartado) and productos:
+            registrar_esquema(self.proveedor, EsquemaTabla.aprender(self.firma, self.columnas_precios, fuentes,
+                                                                    self.esquema),
+                              self.estilos, version_extraccion())
+            clasificador['esquemas_aprendidos'] += 1
+        productos.extend(partes[0]['productos_anidadas'])
+        
+        contenido = {'productos': productos, 'proveedor': self.proveedor}
+        return {'archivo': archivo_nombre, 'contenido': contenido, 'error': None, 'clasificador': clasificador,
+                'poda': poda}
+
+def _procesar_rango_hoja(rango):
+    """
+    Parsea y clasifica las filas de un rango de una hoja (se ejecuta en el
+    proceso worker). De la tabla principal devuelve también los rasgos de
+    cada fila, el número de fila (dentro del rango) de cada producto y las
+    columnas de las que salieron sus campos. El esquema conocido de la hoja
+    (o None) se verifica con las filas del rango.
+    """
+    ruta_completa, inicio, fin, codificacion, columnas_precios, esquema, proveedor, separadores = rango
+    descartado = False
+    antes = _estadisticas_clasificacion()
+    antes_poda = _estadisticas_omision()
+    productos = []
+    indices = []
+    fuentes = []
+    rasgos = []
+    productos_anidadas = []
+    try:
+        tipos_celdas = tipos_celdas_de_hoja(ruta_completa)
+        filas = iterar_filas_tablas(leer_rango(ruta_completa, inicio, fin, codificacion).bloques(),
+                                    con_clases=tipos_celdas is not None, podar=True,
+                                    filas_encabezado=filas_encabezado_de_rango(inicio))
+        for indice_tabla, filas_tabla in groupby(filas, key=lambda item: item[0]):
+            filas_tabla = (item[1:] if tipos_celdas is not None else item[1] for item in filas_tabla)
+            if indice_tabla == 0:
+                if tipos_celdas is not None:
+                    filas_rango = [(fila[0], tipos_celdas.tipos_de(fila[1])) for fila in filas_tabla if fila[0]]
+                else:
+                    filas_rango = [(fila, None) for fila in filas_tabla if fila]
+                filas_datos = [fila_datos for fila_datos, _ in filas_rango]
+                tipos_filas = [tipos for _, tipos in filas_rango] if tipos_celdas is not None else None
+                desplazamiento = len(rasgos)
+                rasgos.extend(rasgos_de_filas(filas_datos))
+                columnas = esquema.columnas_a_clasificar() if esquema is not None else None
+                procesadas = procesar_filas_tabla(filas_datos, tipos_filas, columnas_precios, columnas, separadores)
+                if esquema is not None and not esquema.sirve_para(
+                        filas_datos, tipos_filas, [fuentes_fila for _, fuentes_fila in procesadas], CLASIFICADOR):
+                    descartado = True
+                    procesadas = procesar_filas_tabla(filas_datos, tipos_filas, columnas_precios, None, separadores)
+                for indice, (producto, fuentes_fila) in enumerate(procesadas, desplazamiento):
+                    if producto:
+                        productos.append(producto)
+                        indices.append(indice)
+                        fuentes.append(tuple(fuentes_fila.items()))
+            else:
+                productos_anidadas.extend(extraer_productos_de_filas(filas_tabla, tipos_celdas, proveedor,
+                                                                     separadores))
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {
+        'productos': productos,
+        'indices': indices,
+        'fuentes': fuentes,
+        'rasgos': rasgos,
+        'productos_anidadas': productos_anidadas,
+        'esquema_descartado': descartado,
+        'error': error,
+        'clasificador': _diferencia_clasificacion(antes),
+        'poda': _diferencia_omision(antes_poda)
+    }
+
+def _tamano_archivo(ruta):
+    try:
+        return os.path.getsize(ruta)
+    except OSError:
+        return 0
+
+def extraer_datos_html(directorio, archivo_salida_personalizado=None, workers=1, usar_cache=True,
+                       directorio_cache=None, hojas=None, formato=None, compacto=False, progreso=None,
+                       puntos_control=False, reanudar=False, directorio_ejecucion=None, max_memory_mb=None,
+                       regiones=False):
     """
     Función mejorada para extraer datos con algoritmo v2 superior
     Replica la funcionalidad de la primera versión exitosa
@@ -391,7 +790,20 @@ def extraer_datos_html(directorio, archivo_salida_personalizado=None):
     Args:
         directorio: Directorio que contiene los archivos HTML
         archivo_salida_personalizado: Ruta completa del archivo de salida (opcional)
+        workers: Cantidad de procesos para procesar hojas en paralelo (1 = secuencial)
+        usar_cache: Reutilizar resultados de hojas sin cambios (CacheExtraccion)
+        directorio_cache: Directorio de la cache (opcional, por defecto en ~/.cache)
+        hojas: Nombres de pestaña o de archivo a extraer (opcional, por defecto todas)
+        formato: 'json' o 'ndjson' (por defecto según la extensión del archivo de salida, si no 'json')
+        compacto: Omitir fila_completa y la copia de los productos dentro de cada hoja
+        progreso: Función que recibe el estado del avance (ProgresoExtraccion) al terminar cada hoja
+        puntos_control: Guardar cada hoja terminada en el directorio de la ejecución (PuntosControl)
+        reanudar: Tomar las hojas ya guardadas por una corrida interrumpida (implica puntos_control)
+        directorio_ejecucion: Directorio de los puntos de control (por defecto, uno por libro en ~/.cache)
+        max_memory_mb: Límite de memoria residente en MB: tablas en lotes y productos en disco (memoria_acotada)
+        regiones: Clasificar sólo las regiones de productos, sin calculadoras ni avisos (regiones_tabla)
     """
+    escritor = None
     try:
         import json
         import os
@@ -399,13 +811,51 @@ def extraer_datos_html(directorio, archivo_salida_personalizado=None):
         from bs4 import BeautifulSoup
         import re
         
-        # Detectar archivos HTML
-        archivos_html = detectar_archivos_html(directorio)
-        if not archivos_html:
-            print("❌ No se encontraron archivos HTML")
-            return None, None
+        # Elegir el backend según el tipo de archivo: libro .xlsx o exportación HTML
+        libro_xlsx = detectar_libro_xlsx(directorio)
+        if libro_xlsx:
+            archivos_html = listar_hojas_xlsx(libro_xlsx)
+            print(f"📗 Libro .xlsx con {len(archivos_html)} hojas: {os.path.basename(libro_xlsx)}")
+            pestanas = {nombre_hoja: nombre_hoja for nombre_hoja in archivos_html}
+            candidatas = set(hojas or [])
+        else:
+            archivos_html = detectar_archivos_html(directorio)
+            if not archivos_html:
+                print("❌ No se encontraron archivos HTML")
+                return None, None
+            
+            print(f"📁 Encontrados {len(archivos_html)} archivos HTML")
+            
+            # Nombres reales de las pestañas desde el frameset del libro
+            manifiesto = cargar_manifiesto(directorio)
+            pestanas = {hoja.archivo: hoja.nombre for hoja in manifiesto}
+            candidatas = {hoja.archivo for hoja in manifiesto.seleccionar(hojas or [])}
+        
+        seleccion = None
+        if hojas:
+            seleccion = candidatas & set(archivos_html)
+            if not seleccion:
+                print(f"❌ Ninguna hoja coincide con: {', '.join(hojas)}")
+                return None, None
+            print(f"📑 Hojas seleccionadas: {len(seleccion)} de {len(archivos_html)}")
+        
+        # Determinar archivo de salida
+        if formato is None:
+            es_ndjson = bool(archivo_salida_personalizado) and es_salida_ndjson(archivo_salida_personalizado)
+            formato = 'ndjson' if es_ndjson else 'json'
+        if archivo_salida_personalizado:
+            archivo_salida = archivo_salida_personalizado
+        else:
+            # Comportamiento por defecto (con timestamp)
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            directorio_salida = os.path.dirname(libro_xlsx) if libro_xlsx else directorio
+            extension = EXTENSION_NDJSON if formato == 'ndjson' else '.json'
+            archivo_salida = os.path.join(directorio_salida, f'datos_estructurados_{timestamp}{extension}')
         
-        print(f"📁 Encontrados {len(archivos_html)} archivos HTML")
+        # En NDJSON los productos se escriben a medida que se extrae cada hoja
+        if formato == 'ndjson':
+            escritor = EscritorNDJSON(archivo_salida, compacto)
+            archivo_salida = escritor.ruta
         
         # Inicializar estadísticas
         hojas_procesadas = []
@@ -416,48 +866,99 @@ def extraer_datos_html(directorio, archivo_salida_personalizado=None):
         productos_con_precio = 0
         productos_con_iva = 0
         
-        # Detectar nombre de planilla desde directorio
-        planilla_name = os.path.basename(directorio).replace('_archivos', '').replace('_files', '')
+        # Detectar nombre de planilla desde directorio (o desde el libro .xlsx)
+        if libro_xlsx:
+            planilla_name = os.path.splitext(os.path.basename(libro_xlsx))[0]
+        else:
+            planilla_name = os.path.basename(directorio).replace('_archivos', '').replace('_files', '')
         if not planilla_name or planilla_name == '.':
             planilla_name = 'ANALISIS_HTML'
         
-        # Procesar cada archivo
-        for i, archivo_nombre in enumerate(archivos_html):
-            try:
-                # Construir ruta completa
-                ruta_completa = os.path.join(directorio, archivo_nombre)
+        errores = []
+        estadisticas_clasificador = dict.fromkeys(_estadisticas_clasificacion(), 0)
+        estadisticas_de_poda = dict.fromkeys(_estadisticas_omision(), 0)
+        cache = CacheExtraccion(version_extraccion(regiones), directorio_cache) if usar_cache else None
+        tabla = TablaProductos()
+        
+        # Memoria acotada: un solo proceso, tablas en lotes y productos derramados a disco
+        filas_por_lote = None
+        if max_memory_mb:
+            if workers > 1:
+                print(f"🧠 Con límite de memoria las hojas se procesan de a una (se ignoran los {workers} workers)")
+                workers = 1
+            filas_por_lote = filas_por_lote_para(max_memory_mb)
+            tabla = ProductosEnDisco()
+            print(f"🧠 Límite de memoria: {max_memory_mb} MB (lotes de {filas_por_lote} filas)")
+        
+        control = None
+        if puntos_control or reanudar:
+            control = PuntosControl(directorio_ejecucion or directorio_ejecucion_por_defecto(directorio, hojas),
+                                    reanudar)
+            if reanudar:
+                print(f"♻️ Reanudando: {len(control.completadas())} hojas ya completadas en {control.directorio}")
+        
+        # Pre-escaneo de las filas de cada hoja para informar el avance
+        avance = None
+        if progreso is not None:
+            a_procesar = [archivo for archivo in archivos_html if seleccion is None or archivo in seleccion]
+            filas_estimadas = preescanear_hojas(directorio, a_procesar, libro_xlsx)
+            avance = ProgresoExtraccion(filas_estimadas, progreso)
+            print(f"📏 Pre-escaneo: {avance.filas_totales:,} filas estimadas en {len(a_procesar)} hojas")
+        
+        # Procesar cada archivo (en paralelo si workers > 1)
+        for resultado_hoja in procesar_archivos_en_paralelo(directorio, archivos_html, workers, cache, seleccion,
+                                                            libro_xlsx, control, filas_por_lote, regiones):
+            archivo_nombre = resultado_hoja['archivo']
+            print(f"🔍 Procesando: {archivo_nombre}")
+            
+            if resultado_hoja['clasificador']:
+                for clave, cantidad in resultado_hoja['clasificador'].items():
+                    estadisticas_clasificador[clave] += cantidad
+            if resultado_hoja['poda']:
+                for clave, cantidad in resultado_hoja['poda'].items():
+                    estadisticas_de_poda[clave] += cantidad
+            if avance is not None:
+                avance.hoja_terminada(archivo_nombre, desde_cache=resultado_hoja['clasificador'] is None)
+            
+            if resultado_hoja['error']:
+                print(f"❌ Error procesando {archivo_nombre}: {resultado_hoja['error']}")
+                errores.append({'archivo': archivo_nombre, 'error': resultado_hoja['error']})
+                continue
+            
+            datos_hoja = resultado_hoja['datos']
+            if datos_hoja and archivo_nombre in pestanas:
+                datos_hoja['pestana'] = pestanas[archivo_nombre]
+            
+            if datos_hoja and datos_hoja.get('productos'):
+                hojas_procesadas.append(datos_hoja)
+                num_productos = len(datos_hoja['productos'])
+                total_productos += num_productos
                 
-                print(f"🔍 Procesando: {archivo_nombre}")
+                # Estadísticas por hoja
+                nombre_hoja = datos_hoja['nombre']
+                productos_por_hoja[nombre_hoja] = num_productos
                 
-                # Procesar archivo HTML usando algoritmo mejorado
-                datos_hoja = procesar_archivo_html_completo(ruta_completa, archivo_nombre, i)
+                # Estadísticas de calidad de datos
+                for producto in datos_hoja['productos']:
+                    total_filas_procesadas += 1
+                    if producto.get('codigo'):
+                        productos_con_codigo += 1
+                    if producto.get('precio') or producto.get('precios'):
+                        productos_con_precio += 1
+                    if producto.get('iva') is not None:
+                        productos_con_iva += 1
                 
-                if datos_hoja and datos_hoja.get('productos'):
-                    hojas_procesadas.append(datos_hoja)
-                    num_productos = len(datos_hoja['productos'])
-                    total_productos += num_productos
-                    
-                    # Estadísticas por hoja
-                    nombre_hoja = datos_hoja['nombre']
-                    productos_por_hoja[nombre_hoja] = num_productos
-                    
-                    # Estadísticas de calidad de datos
-                    for producto in datos_hoja['productos']:
-                        total_filas_procesadas += 1
-                        if producto.get('codigo'):
-                            productos_con_codigo += 1
-                        if producto.get('precio') or producto.get('precios'):
-                            productos_con_precio += 1
-                        if producto.get('iva') is not None:
-                            productos_con_iva += 1
-                    
-                    print(f"   ✅ {num_productos} productos extraídos ({datos_hoja.get('proveedor', 'N/A')})")
-                else:
-                    print(f"   ⚠️ Sin productos válidos en {archivo_nombre}")
-                    
-            except Exception as e:
-                print(f"❌ Error procesando {archivo_nombre}: {e}")
-                continue
+                # Pasar los productos de la hoja a la tabla columnar (los dicts se liberan)
+                inicio = len(tabla)
+                tabla.extender(datos_hoja['productos'])
+                datos_hoja['productos'] = tabla.vista(inicio, len(tabla))
+                if escritor:
+                    escritor.escribir_hoja(datos_hoja)
+                
+                print(f"   ✅ {num_productos} productos extraídos ({datos_hoja.get('proveedor', 'N/A')})")
+            else:
+                print(f"   ⚠️ Sin productos válidos en {archivo_nombre}")
+        
         if not hojas_procesadas:
             print("❌ No se procesaron hojas válidas")
             return None, None
@@ -490,7 +991,8 @@ def extraer_datos_html(directorio, archivo_salida_personalizado=None):
                 'productos_con_medida': 0,  # Implementar si es necesario
                 'productos_con_iva': productos_con_iva
             },
-            'productos': [],
+            # Todas las hojas son rangos consecutivos de la misma tabla
+            'productos': tabla.vista(),
             # Mantener compatibilidad con estructura anterior
             'hojas': hojas_procesadas,
             'resumen': {
@@ -500,13 +1002,9 @@ def extraer_datos_html(directorio, archivo_salida_personalizado=None):
             },
             'fecha_procesamiento': datetime.now().isoformat(),
             'estrategia_proveedores': 'single_provider' if len(proveedores_detectados) == 1 else 'multiple_providers',
-            'proveedor_principal': proveedor_principal
+            'proveedor_principal': proveedor_principal,
+            'errores': errores
         }
-          # Agregar todos los productos a la lista plana (como en v2)
-        for hoja in hojas_procesadas:
-            for producto in hoja['productos']:
-                resultado['productos'].append(producto)
-        
         print(f"✅ Extracción completada con metadatos:")
         print(f"   📊 {len(hojas_procesadas)} hojas procesadas")
         print(f"   🛍️ {total_productos} productos únicos")
@@ -515,111 +1013,176 @@ def extraer_datos_html(directorio, archivo_salida_personalizado=None):
         print(f"   📋 Productos con código: {productos_con_codigo}")
         print(f"   💰 Productos con precio: {productos_con_precio}")
         print(f"   📊 Productos con IVA: {productos_con_iva}")
-        
-        # Determinar archivo de salida
-        if archivo_salida_personalizado:
-            archivo_salida = archivo_salida_personalizado
-        else:
-            # Comportamiento por defecto (con timestamp)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            archivo_salida = os.path.join(directorio, f'datos_estructurados_{timestamp}.json')
+        if errores:
+            print(f"   ⚠️ Hojas con errores: {len(errores)}")
+        if cache is not None:
+            estadisticas_cache = cache.estadisticas()
+            print(f"   🗃️ Cache: {estadisticas_cache['aciertos']} aciertos, {estadisticas_cache['fallos']} fallos")
+        if estadisticas_clasificador['consultas']:
+            print(f"   🧮 Clasificador de celdas: {tasa_aciertos(estadisticas_clasificador):.1f}% aciertos "
+                  f"({estadisticas_clasificador['consultas']} consultas)")
+        if estadisticas_clasificador['celdas_en_lote']:
+            print(f"   🧮 Clasificación en lote: {estadisticas_clasificador['valores_en_lote']} valores distintos "
+                  f"para {estadisticas_clasificador['celdas_en_lote']} celdas")
+        if estadisticas_clasificador['esquemas_conocidos'] or estadisticas_clasificador['esquemas_aprendidos']:
+            descartados = estadisticas_clasificador['esquemas_descartados']
+            print(f"   📐 Esquemas de tabla: {estadisticas_clasificador['esquemas_conocidos']} conocidos, "
+                  f"{estadisticas_clasificador['esquemas_aprendidos']} aprendidos"
+                  + (f", {descartados} descartados por no servir para su tabla" if descartados else ""))
+        if celdas_omitidas(estadisticas_de_poda):
+            print(f"   ✂️ Poda: {celdas_omitidas(estadisticas_de_poda)} celdas sin clasificar "
+                  f"({estadisticas_de_poda['filas_vacias']} filas vacías, "
+                  f"{estadisticas_de_poda['filas_ocultas']} filas ocultas, "
+                  f"{estadisticas_de_poda['celdas_ocultas']} celdas ocultas)")
+        if estadisticas_de_poda['filas_prefiltradas']:
+            print(f"   🧹 Pre-filtro: {estadisticas_de_poda['filas_prefiltradas']} filas de relleno quitadas antes "
+                  f"del parser ({estadisticas_de_poda['bytes_prefiltrados'] / 1024:.0f} KB)")
+        if estadisticas_de_poda['filas_fuera_de_region']:
+            print(f"   🧭 Regiones de productos: {estadisticas_de_poda['filas_fuera_de_region']} filas fuera de "
+                  f"las regiones en {estadisticas_de_poda['tablas_con_regiones']} tablas (calculadoras, avisos, "
+                  f"encabezados)")
         
         # Guardar resultados
-        with open(archivo_salida, 'w', encoding='utf-8') as f:
-            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        if escritor:
+            escritor.cerrar(resultado)
+            print(f"📝 Encabezado: {escritor.ruta_encabezado}")
+        else:
+            escribir_json(resultado, archivo_salida, compacto)
         
         print(f"💾 Archivo guardado en: {archivo_salida}")
+        if control is not None:
+            if control.reanudadas:
+                print(f"   ♻️ {control.reanudadas} hojas tomadas de los puntos de control")
+            control.finalizar()
+        if max_memory_mb:
+            pico = rss_pico_mb()
+            if pico is not None:
+                excedido = " ⚠️ excedido" if pico > max_memory_mb else ""
+                print(f"🧠 Memoria: pico de RSS {pico:.1f} MB (límite {max_memory_mb} MB){excedido}")
         
         return resultado, archivo_salida
     except Exception as e:
         print(f"❌ Error en extraer_datos_html: {e}")
         return None, None
+    finally:
+        if escritor:
+            escritor.descartar()
 
 def procesar_archivo_html_completo(ruta_archivo, nombre_archivo, indice):
     """Procesa un archivo HTML completo y extrae productos con algoritmo mejorado"""
     try:
-        with open(ruta_archivo, 'r', encoding='utf-8', errors='ignore') as archivo:
-            contenido = archivo.read()
-        
-        soup = BeautifulSoup(contenido, 'html.parser')
-        tablas = soup.find_all('table')
-        
-        if not tablas:
-            return None
-        
-        # Detectar proveedor en el contenido
-        proveedor = detectar_proveedor_en_contenido(contenido)
-        
-        # Extraer productos de todas las tablas
-        productos = []
-        
-        for tabla in tablas:
-            productos_tabla = extraer_productos_de_tabla(tabla)
-            productos.extend(productos_tabla)
-        
-        if not productos:
-            return None
-        
-        # Determinar nombre de hoja inteligente
-        nombre_hoja = generar_nombre_hoja_inteligente(nombre_archivo, proveedor, indice)
-        
-        # Agregar proveedor a cada producto
-        for producto in productos:
-            if not producto.get('proveedor'):
-                producto['proveedor'] = proveedor
-            producto['hoja'] = nombre_hoja
-        
-        return {
-            'nombre': nombre_hoja,
-            'archivo': nombre_archivo,
-            'productos': productos,
-            'total_productos': len(productos),
-            'proveedor': proveedor
-        }
-        
+        return _procesar_archivo_html(ruta_archivo, nombre_archivo, indice)
     except Exception as e:
         print(f"Error procesando archivo HTML {nombre_archivo}: {e}")
         return None
 
+def _procesar_archivo_html(ruta_archivo, nombre_archivo, indice):
+    """Igual que procesar_archivo_html_completo pero propagando los errores"""
+    productos, proveedor = extraer_productos_de_archivo(ruta_archivo)
+    return armar_datos_hoja(productos, proveedor, nombre_archivo, indice)
+
+def extraer_productos_de_archivo(ruta_archivo, filas_por_lote=None):
+    """
+    Extrae (productos, proveedor) de una hoja HTML. Sólo depende del
+    contenido del archivo, por eso es lo que se guarda en la cache.
+
+    El archivo se decodifica una sola vez con su charset declarado; el
+    mismo texto lo recorren el detector de proveedores y el parser, que lo
+    consume por bloques: las filas se clasifican a medida que se cierran y
+    nunca se arma el árbol DOM completo de la hoja. Si el libro tiene hoja
+    de estilos, el tipo de cada celda sale de su clase (estilos_libro). Las
+    filas ocultas o vacías y las celdas ocultas se podan antes de clasificar.
+    Los precios se leen con los separadores que declara la hoja.
+
+    Con filas_por_lote (memoria acotada) el texto completo sólo se usa para
+    detectar el proveedor: se libera antes de parsear la hoja, que se
+    vuelve a leer por streaming, y cada tabla se clasifica en lotes
+    (extraer_productos_de_filas_por_lotes).
+    """
+    documento = leer_documento(ruta_archivo)
+    tipos_celdas = tipos_celdas_de_hoja(ruta_archivo, documento.texto)
+
+    # Detectar proveedor en el contenido (también elige los esquemas de tabla)
+    proveedor = elegir_proveedor_principal(contar_proveedores_en_contenido(documento.texto))
+    separadores = separadores_de_texto(documento.texto)
+    if filas_por_lote is None:
+        bloques = documento.bloques()
+    else:
+        documento = None
+        bloques = leer_bloques(ruta_archivo)
+
+    # Extraer productos de todas las tablas
+    productos = []
+    filas = iterar_filas_tablas(bloques, con_clases=tipos_celdas is not None, podar=True)
+
+    for _, filas_tabla in groupby(filas, key=lambda item: item[0]):
+        filas_tabla = (item[1:] if tipos_celdas is not None else item[1] for item in filas_tabla)
+        if filas_por_lote is None:
+            productos_tabla = extraer_productos_de_filas(filas_tabla, tipos_celdas, proveedor, separadores)
+        else:
+            productos_tabla = extraer_productos_de_filas_por_lotes(filas_tabla, tipos_celdas, proveedor,
+                                                                   separadores, filas_por_lote)
+        productos.extend(productos_tabla)
+
+    return productos, proveedor
+
+def extraer_productos_de_hoja_xlsx(ruta_libro, nombre_hoja, filas_por_lote=None):
+    """
+    Extrae (productos, proveedor) de una hoja de un libro .xlsx leyéndola
+    por streaming. Las filas pasan por la misma clasificación que las de
+    las tablas HTML, con los valores numéricos de las celdas sin convertir.
+    """
+    conteo_proveedores = contar_proveedores_en_contenido(nombre_hoja)
+
+    def filas_con_deteccion():
+        for fila_datos in iterar_filas_xlsx(ruta_libro, nombre_hoja):
+            textos = [celda for celda in fila_datos if isinstance(celda, str) and celda]
+            if textos:
+                for proveedor, conteo in contar_proveedores_en_contenido(' '.join(textos)).items():
+                    conteo_proveedores[proveedor] = conteo_proveedores.get(proveedor, 0) + conteo
+            yield fila_datos
+
+    if filas_por_lote is None:
+        productos = extraer_productos_de_filas(filas_con_deteccion())
+    else:
+        productos = extraer_productos_de_filas_por_lotes(filas_con_deteccion(), filas_por_lote=filas_por_lote)
+    proveedor = elegir_proveedor_principal(conteo_proveedores)
+
+    return productos, proveedor
+
+def armar_datos_hoja(productos, proveedor, nombre_archivo, indice):
+    """Arma el resultado de una hoja (None si no tiene productos)"""
+    if not productos:
+        return None
+
+    # Determinar nombre de hoja inteligente
+    nombre_hoja = generar_nombre_hoja_inteligente(nombre_archivo, proveedor, indice)
+
+    # Agregar proveedor a cada producto
+    for producto in productos:
+        if not producto.get('proveedor'):
+            producto['proveedor'] = proveedor
+        producto['hoja'] = nombre_hoja
+
+    return {
+        'nombre': nombre_hoja,
+        'archivo': nombre_archivo,
+        'productos': productos,
+        'total_productos': len(productos),
+        'proveedor': proveedor
+    }
+
+def contar_proveedores_en_contenido(contenido):
+    """Cuenta las apariciones de cada proveedor conocido en el contenido (bytes o texto)"""
+    return DETECTOR.contar(contenido)
+
+def elegir_proveedor_principal(detecciones):
+    """Devuelve el proveedor con más apariciones (o 'VARIOS')"""
+    return elegir_proveedor(detecciones) or 'VARIOS'
+
 def detectar_proveedor_en_contenido(contenido):
     """Detecta el proveedor principal en el contenido del archivo"""
-    import re
-    
-    # Lista de proveedores conocidos con patrones
-    proveedores_conocidos = {
-        'YAYI': [r'YAYI', r'yayi'],
-        'CRIMARAL': [r'CRIMARAL', r'crimaral'],
-        'ANCAIG': [r'ANCAIG', r'ancaig'],
-        'DAFYS': [r'DAFYS', r'dafys'],
-        'HERRAMETAL': [r'HERRAMETAL', r'herrametal'],
-        'FERRIPLAST': [r'FERRIPLAST', r'ferriplast'],
-        'BABUSI': [r'BABUSI', r'babusi'],
-        'DIST_CITY_BELL': [r'DIST.*CITY.*BELL', r'DISTRIBUIDORA.*CITY', r'CITY.*BELL'],
-        'BRIMAX': [r'BRIMAX', r'brimax'],
-        'PUMA': [r'PUMA', r'puma'],
-        'ROTAFLEX': [r'ROTAFLEX', r'rotaflex'],
-        'STANLEY': [r'STANLEY', r'stanley'],
-        'BLACK_DECKER': [r'BLACK.*DECKER', r'BLACK&DECKER']
-    }
-    
-    texto_contenido = contenido.upper()
-    detecciones = {}
-    
-    for proveedor, patrones in proveedores_conocidos.items():
-        conteo = 0
-        for patron in patrones:
-            matches = re.findall(patron, texto_contenido, re.IGNORECASE)
-            conteo += len(matches)
-        
-        if conteo > 0:
-            detecciones[proveedor] = conteo
-    
-    # Devolver el proveedor con más apariciones
-    if detecciones:
-        proveedor_principal = max(detecciones.items(), key=lambda x: x[1])[0]
-        return proveedor_principal
-    
-    return 'VARIOS'
+    return elegir_proveedor_principal(contar_proveedores_en_contenido(contenido))
 
 def generar_nombre_hoja_inteligente(nombre_archivo, proveedor, indice):
     """Genera un nombre de hoja inteligente basado en el proveedor y contenido"""
@@ -645,43 +1208,203 @@ def generar_nombre_hoja_inteligente(nombre_archivo, proveedor, indice):
     # Nombre genérico
     return f"HOJA_{indice+1:02d}"
 
-def extraer_productos_de_tabla(tabla):
-    """Extrae productos de una tabla HTML usando algoritmo mejorado v2"""
+def extraer_productos_de_tabla(tabla, tipos_celdas=None, vectorizado=True):
+    """
+    Extrae productos de una tabla HTML usando algoritmo mejorado v2
+    (vectorizado=False clasifica celda por celda, como referencia)
+    """
+    filas = filas_en_grilla(tabla, con_clases=tipos_celdas is not None)
+    return extraer_productos_de_filas(filas, tipos_celdas, vectorizado=vectorizado)
+
+def extraer_productos_de_filas(filas, tipos_celdas=None, proveedor=None, separadores=SEPARADORES_POR_DEFECTO,
+                               vectorizado=True):
+    """
+    Extrae productos de las filas de una tabla (listas de celdas limpias).
+    Las columnas de precios salen de las primeras filas. Con la detección
+    de regiones activa (configurar_regiones) sólo se clasifican las filas
+    de las regiones de productos de la tabla (regiones_tabla):
+    calculadoras, presupuestos y avisos quedan afuera.
+    
+    Con tipos_celdas (TiposCeldas del libro) cada fila llega como
+    (fila_datos, clases) y el tipo de las celdas sale de su clase CSS.
+    
+    Con proveedor se usa el esquema de la tabla (esquemas_tabla): si el
+    encabezado ya es conocido se toman sus columnas de precios y sólo se
+    clasifican sus columnas de campos; si no, se aprende de esta tabla.
+    
+    Los precios se convierten por columna con los separadores de la hoja y
+    los campos se clasifican con la tabla entera (clasificacion_tabla);
+    con vectorizado=False, celda por celda (implementación de referencia).
+    """
     productos = []
     
     try:
-        filas = tabla.find_all('tr')
-        
-        if len(filas) < 1:
-            return productos
-        
-        # Convertir tabla HTML a matriz de datos
-        matriz_tabla = []
-        for fila in filas:
-            celdas = fila.find_all(['td', 'th'])
-            fila_datos = [limpiar_texto(celda.get_text()) for celda in celdas]
-            if fila_datos:  # Solo agregar filas con datos
-                matriz_tabla.append(fila_datos)
+        # Solo considerar filas con datos
+        if tipos_celdas is None:
+            filas = [(fila_datos, None) for fila_datos in filas if fila_datos]
+        else:
+            filas = [(fila_datos, clases) for fila_datos, clases in filas if fila_datos]
         
-        if not matriz_tabla:
+        if not filas:
             return productos
         
-        # Identificar columnas de precios
-        columnas_precios = identificar_columnas_precios(matriz_tabla)
-        
-        # Procesar cada fila con algoritmo sofisticado
-        for fila_datos in matriz_tabla:
-            # Usar algoritmo de clasificación inteligente con precios estructurados
-            producto = procesar_fila_inteligente_v2(fila_datos, columnas_precios)
-            
+        # Esquema conocido del proveedor o columnas de precios de las primeras filas (headers)
+        primeras_filas = [fila_datos for fila_datos, _ in filas[:FILAS_ENCABEZADO]]
+        estilos = tipos_celdas.firma if tipos_celdas is not None else None
+        esquema = fuentes = columnas = None
+        if proveedor is not None:
+            firma = firma_encabezado(primeras_filas)
+            esquema = buscar_esquema(proveedor, firma, estilos, version_extraccion())
+        conocido = esquema
+        columnas_precios = esquema.columnas_precios if esquema is not None else \
+            identificar_columnas_precios(primeras_filas)
+
+        # Procesar las filas de las regiones de productos con algoritmo sofisticado
+        indices = filas_a_clasificar(rasgos_de_filas([fila_datos for fila_datos, _ in filas]))
+        filas_datos = [filas[i][0] for i in indices]
+        tipos_filas = [tipos_celdas.tipos_de(filas[i][1]) for i in indices] if tipos_celdas is not None else None
+
+        # Con el esquema conocido sólo se clasifican sus columnas; si no sirve para esta tabla, las filas completas
+        if esquema is not None:
+            columnas = esquema.columnas_a_clasificar()
+        procesadas = procesar_filas_tabla(filas_datos, tipos_filas, columnas_precios, columnas, separadores,
+                                          vectorizado)
+        esquema = esquema_para_filas(esquema, filas_datos, tipos_filas,
+                                     [fuentes_fila for _, fuentes_fila in procesadas], CLASIFICADOR)
+        if esquema is None and proveedor is not None:
+            fuentes = Counter()
+            if conocido is not None:
+                procesadas = procesar_filas_tabla(filas_datos, tipos_filas, columnas_precios, None, separadores,
+                                                  vectorizado)
+        for producto, fuentes_fila in procesadas:
             if producto:
                 productos.append(producto)
+                if fuentes is not None:
+                    fuentes.update(fuentes_fila.items())
+
+        if fuentes is not None and productos:
+            registrar_esquema(proveedor, EsquemaTabla.aprender(firma, columnas_precios, fuentes, conocido),
+                              estilos, version_extraccion())
     
     except Exception as e:
         print(f"Error extrayendo productos de tabla: {e}")
     
     return productos
 
+def _lotes_de_filas(filas, con_clases, filas_por_lote):
+    """Filas con datos de una tabla, como (fila_datos, clases), en listas de filas_por_lote"""
+    lote = []
+    for fila in filas:
+        fila_datos, clases = fila if con_clases else (fila, None)
+        if not fila_datos:
+            continue
+        lote.append((fila_datos, clases))
+        if len(lote) >= filas_por_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def extraer_productos_de_filas_por_lotes(filas, tipos_celdas=None, proveedor=None,
+                                         separadores=SEPARADORES_POR_DEFECTO, filas_por_lote=1024):
+    """
+    Igual que extraer_productos_de_filas, pero sin tener la tabla entera en
+    memoria: las filas (un iterable, se consume una vez) se clasifican en
+    lotes de filas_por_lote. Sólo se guardan los rasgos de todas las filas
+    y los productos; con la detección de regiones activa, las regiones se
+    eligen con los rasgos de la tabla entera al final, así el resultado es
+    el mismo.
+    """
+    productos = []
+
+    try:
+        lotes = _lotes_de_filas(filas, tipos_celdas is not None, max(filas_por_lote, FILAS_ENCABEZADO))
+        rasgos = []
+        candidatos = []
+        esquema = conocido = columnas_precios = firma = None
+        estilos = tipos_celdas.firma if tipos_celdas is not None else None
+        # Las columnas de origen se cuentan siempre: si el esquema no sirve para un lote se vuelve a aprender
+        fuentes = Counter() if proveedor is not None else None
+
+        for lote in lotes:
+            if not rasgos:
+                # Esquema o columnas de precios de las primeras filas, como en extraer_productos_de_filas
+                primeras_filas = [fila_datos for fila_datos, _ in lote[:FILAS_ENCABEZADO]]
+                if proveedor is not None:
+                    firma = firma_encabezado(primeras_filas)
+                    esquema = conocido = buscar_esquema(proveedor, firma, estilos, version_extraccion())
+                columnas_precios = esquema.columnas_precios if esquema is not None else \
+                    identificar_columnas_precios(primeras_filas)
+
+            desplazamiento = len(rasgos)
+            filas_datos = [fila_datos for fila_datos, _ in lote]
+            rasgos.extend(rasgos_de_filas(filas_datos))
+            tipos_filas = [tipos_celdas.tipos_de(clases) for _, clases in lote] if tipos_celdas is not None else None
+            # Cada lote verifica el esquema; si no sirve, ese lote y los siguientes van completos
+            columnas = esquema.columnas_a_clasificar() if esquema is not None else None
+            procesadas = procesar_filas_tabla(filas_datos, tipos_filas, columnas_precios, columnas, separadores)
+            if esquema is not None:
+                esquema = esquema_para_filas(esquema, filas_datos, tipos_filas,
+                                             [fuentes_fila for _, fuentes_fila in procesadas], CLASIFICADOR)
+                if esquema is None:
+                    procesadas = procesar_filas_tabla(filas_datos, tipos_filas, columnas_precios, None, separadores)
+            candidatos.extend((desplazamiento + i, producto, fuentes_fila)
+                              for i, (producto, fuentes_fila) in enumerate(procesadas) if producto)
+            del lote, filas_datos, tipos_filas, procesadas
+
+        seleccion = set(filas_a_clasificar(rasgos))
+        for indice, producto, fuentes_fila in candidatos:
+            if indice in seleccion:
+                productos.append(producto)
+                if fuentes is not None:
+                    fuentes.update(fuentes_fila.items())
+
+        if fuentes is not None and esquema is None and productos:
+            registrar_esquema(proveedor, EsquemaTabla.aprender(firma, columnas_precios, fuentes, conocido),
+                              estilos, version_extraccion())
+
+    except Exception as e:
+        print(f"Error extrayendo productos de tabla: {e}")
+
+    return productos
+
+def procesar_filas_tabla(filas_datos, tipos_filas, columnas_precios, columnas=None,
+                         separadores=SEPARADORES_POR_DEFECTO, vectorizado=True):
+    """
+    Procesa las filas de una tabla: devuelve (producto o None, columnas de
+    origen de sus campos) por fila. Los precios se convierten por columna;
+    los campos salen de clasificar_tabla sobre la matriz de la tabla o, con
+    vectorizado=False, de procesar_fila_inteligente_v2 fila por fila.
+    """
+    precios = precios_estructurados_de_filas(filas_datos, columnas_precios, separadores)
+    
+    if not vectorizado:
+        procesadas = []
+        for fila_datos, tipos, precios_fila in zip(filas_datos, tipos_filas or [None] * len(filas_datos), precios):
+            fuentes_fila = {}
+            producto = procesar_fila_inteligente_v2(fila_datos, columnas_precios, tipos_celdas=tipos,
+                                                    columnas=columnas, fuentes=fuentes_fila, precios=precios_fila)
+            procesadas.append((producto, fuentes_fila))
+        return procesadas
+    
+    campos = clasificar_tabla(filas_datos, columnas_precios, CLASIFICADOR, tipos_filas, columnas)
+    codigos, descripciones, ivas, medidas = (campos[campo][0] for campo in CAMPOS_CLASIFICADOS)
+    columnas_filas = zip(*(campos[campo][1].tolist() for campo in CAMPOS_CLASIFICADOS))
+    
+    # Hay pocas combinaciones distintas de columnas de origen: un dict de fuentes por combinación
+    fuentes_por_columnas = {}
+    procesadas = []
+    for fila_datos, precios_fila, codigo, descripcion, iva, medida, columnas_fila in zip(
+            filas_datos, precios, codigos, descripciones, ivas, medidas, columnas_filas):
+        fuentes_fila = fuentes_por_columnas.get(columnas_fila)
+        if fuentes_fila is None:
+            fuentes_fila = fuentes_por_columnas[columnas_fila] = {
+                campo: columna for campo, columna in zip(CAMPOS_CLASIFICADOS, columnas_fila) if columna >= 0}
+        campos_clasificados = {'codigo': codigo, 'descripcion': descripcion, 'iva': iva, 'medida': medida,
+                               'precios': precios_fila}
+        procesadas.append((armar_producto(fila_datos, campos_clasificados), fuentes_fila))
+    return procesadas
+
 def procesar_fila_inteligente(fila):
     """Procesa una fila usando algoritmo de clasificación inteligente"""
     import re
@@ -697,8 +1420,8 @@ def procesar_fila_inteligente(fila):
         r'BUSCADOR RAPIDO', r'distribuidora.*@.*\.com', r'Precios orientativos',
         r'CALCULADORA.*', r'COMPLETAR DONDE DICE', r'FUNCIONAMIENTO',
         r'INGRESAR.*CENTIMETROS', r'MARGEN DE GANANCIA', r'POR DEFECTO VIENE',
-        r'UwU', r'AQU VER LA DESCRIPCIN', r'CODIGO.*DESCRIPCION.*BASE',
-        r'ESCRIBA AQUI MISMO UN CODIGO', r'DIAMETRO DEL CAO',
+        r'UwU', r'AQU[IÍ]? VER LA DESCRIPCI[OÓ]?N', r'CODIGO.*DESCRIPCION.*BASE',
+        r'ESCRIBA AQUI MISMO UN CODIGO', r'DIAMETRO DEL CA[NÑ]?O',
         r'^DESCRIPCION$', r'^YAYI$', r'^Gs\s*-$', r'^\.$', r'^-$', r'^\+$',
         r'OFERTAS', r'FECHA', r'% GANANCIA', r'PUBLICO', r'CODIGO DE FABRICA',
         r'SIN IVA.*', r'COSTO FINAL', r'BASE', r'CON OFERTAS'
@@ -818,18 +1541,23 @@ def procesar_fila_inteligente(fila):
     
     return None
 
-def procesar_fila_inteligente_v2(fila_datos, columnas_precios):
+def procesar_fila_inteligente_v2(fila_datos, columnas_precios, clasificador=None, tipos_celdas=None,
+                                 columnas=None, fuentes=None, precios=None):
     """
     Procesa una fila usando algoritmo de clasificación inteligente v2
     con identificación específica de tipos de precios
+    
+    tipos_celdas es el tipo de cada celda según la hoja de estilos (o None):
+    los valores numéricos formateados (moneda, decimal...) se descartan sin
+    pasar por el clasificador. columnas limita la clasificación a esas
+    posiciones (en orden; las de un EsquemaTabla conocido) y en fuentes,
+    si se pasa un dict, queda la columna de la que salió cada campo.
+    precios son los precios estructurados de la fila ya convertidos con
+    toda la tabla (precios_estructurados_de_filas).
     """
-    import re
+    clasificador = clasificador or CLASIFICADOR
     
-    # Patrones especializados
-    patron_codigo = re.compile(r'^[0-9]{6,8}$')
-    patron_medida = re.compile(r'^\d+/\d+$|^\d+x\d+$|^\d+mm$|^\d+cm$|^\d+"$')
-    patron_iva = re.compile(r'^\d{1,2}$')
-      # Clasificar campos
+    # Clasificar campos
     campos_clasificados = {
         'codigo': None,
         'descripcion': None,
@@ -839,31 +1567,46 @@ def procesar_fila_inteligente_v2(fila_datos, columnas_precios):
     }
     
     # Extraer precios estructurados usando las columnas identificadas
-    precios_estructurados = extraer_precios_estructurados(fila_datos, columnas_precios)
-    campos_clasificados['precios'] = precios_estructurados
-      # Clasificar otros campos
-    for i, valor in enumerate(fila_datos):
-        if i in columnas_precios.values():
-            continue  # Skip price columns, already processed
-        
-        campo = clasificar_campo_v2(valor)
+    if precios is None:
+        precios = extraer_precios_estructurados(fila_datos, columnas_precios, clasificador.normalizar_precio)
+    campos_clasificados['precios'] = precios
+    
+    # Clasificar otros campos
+    columnas_de_precio = set(columnas_precios.values())
+    celdas = enumerate(fila_datos) if columnas is None else (
+        (i, fila_datos[i]) for i in columnas if i < len(fila_datos))
+    for i, valor in celdas:
+        if i in columnas_de_precio or valor == '':
+            continue  # Skip price columns (already processed) and empty cells
+        
+        # Valor numérico según el formato de la celda: no es un campo de texto
+        if tipos_celdas and i < len(tipos_celdas) and tipos_celdas[i] in TIPOS_SIN_TEXTO \
+                and valor.upper() == valor.lower():
+            continue
+        
+        campo = clasificador.clasificar(str(valor))
         if campo:
-            tipo, valor_limpio = campo['tipo'], campo['valor']
+            tipo, valor_limpio = campo
             
-            if tipo == 'codigo' and not campos_clasificados['codigo']:
-                campos_clasificados['codigo'] = valor_limpio
-            elif tipo == 'descripcion' and not campos_clasificados['descripcion']:
-                campos_clasificados['descripcion'] = valor_limpio
-            elif tipo == 'iva' and not campos_clasificados['iva']:
-                campos_clasificados['iva'] = valor_limpio
-            elif tipo == 'medida' and not campos_clasificados['medida']:
-                campos_clasificados['medida'] = valor_limpio
+            # Cada campo (codigo, descripcion, iva, medida) sale de la primera celda que lo aporta
+            if not campos_clasificados[tipo]:
+                campos_clasificados[tipo] = valor_limpio
+                if fuentes is not None:
+                    fuentes[tipo] = i
     
+    return armar_producto(fila_datos, campos_clasificados)
+
+def armar_producto(fila_datos, campos_clasificados):
+    """
+    Producto de una fila a partir de sus campos clasificados (codigo,
+    descripcion, iva, medida y precios estructurados), o None si la fila
+    no tiene información suficiente
+    """
     # Validar que el producto tenga información suficiente
     if (campos_clasificados['descripcion'] and len(campos_clasificados['descripcion']) > 3) or \
        (campos_clasificados['codigo']) or \
        (campos_clasificados['precios']):
-          producto = {
+        producto = {
             'codigo': campos_clasificados['codigo'],
             'descripcion': campos_clasificados['descripcion'] or 'Sin descripción',
             'precios_estructurados': campos_clasificados['precios'],  # Nuevo campo estructurado
@@ -889,52 +1632,12 @@ def procesar_fila_inteligente_v2(fila_datos, columnas_precios):
     return None
 
 def clasificar_campo_v2(valor):
-    """Versión mejorada de clasificación de campos"""
-    import re
-    
-    valor_str = str(valor).strip()
-    
-    if not valor_str or valor_str == '':
+    """Versión mejorada de clasificación de campos (usa el clasificador compartido)"""
+    campo = CLASIFICADOR.clasificar(str(valor))
+    if campo is None:
         return None
-    
-    # Patrones irrelevantes actualizados para no incluir tipos de precio
-    patrones_irrelevantes = [
-        r'BUSCADOR RAPIDO', r'distribuidora.*@.*\.com', r'Precios orientativos',
-        r'CALCULADORA.*', r'COMPLETAR DONDE DICE', r'FUNCIONAMIENTO',
-        r'INGRESAR.*CENTIMETROS', r'MARGEN DE GANANCIA', r'POR DEFECTO VIENE',
-        r'UwU', r'AQU VER LA DESCRIPCIN', r'CODIGO.*DESCRIPCION.*BASE',
-        r'ESCRIBA AQUI MISMO UN CODIGO', r'DIAMETRO DEL CAO',
-        r'^DESCRIPCION$', r'^YAYI$', r'^Gs\s*-$', r'^\.$', r'^-$', r'^\+$',
-        r'OFERTAS', r'FECHA', r'% GANANCIA', r'CODIGO DE FABRICA'
-    ]
-    
-    # Verificar si es texto irrelevante
-    for patron in patrones_irrelevantes:
-        if re.search(patron, valor_str, re.IGNORECASE):
-            return None
-    
-    # Código de producto (6-8 dígitos)
-    patron_codigo = re.compile(r'^[0-9]{6,8}$')
-    if patron_codigo.match(valor_str):
-        return {'tipo': 'codigo', 'valor': valor_str}
-    
-    # IVA (1-2 dígitos, valor <= 50)
-    patron_iva = re.compile(r'^\d{1,2}$')
-    if patron_iva.match(valor_str) and valor_str.isdigit() and int(valor_str) <= 50:
-        return {'tipo': 'iva', 'valor': valor_str}
-    
-    # Medida específica
-    patron_medida = re.compile(r'^\d+/\d+$|^\d+x\d+$|^\d+mm$|^\d+cm$|^\d+"$')
-    if patron_medida.match(valor_str):
-        return {'tipo': 'medida', 'valor': valor_str}
-    
-    # Descripción (texto útil)
-    if 3 <= len(valor_str) <= 80:
-        descripcion_limpia = re.sub(r'\s+', ' ', valor_str).strip()
-        if descripcion_limpia and len(descripcion_limpia) >= 3:
-            return {'tipo': 'descripcion', 'valor': descripcion_limpia}
-    
-    return None
+    return {'tipo': campo[0], 'valor': campo[1]}
+
 def encontrar_columna(headers, posibles_nombres):
     """Encuentra la columna que coincide con los posibles nombres"""
     for i, header in enumerate(headers):
@@ -950,82 +1653,108 @@ def obtener_valor_columna(fila_datos, columna_index):
         return fila_datos[columna_index]
     return ''
 
-def main():
+def crear_parser_argumentos():
+    """Crea el parser de argumentos de la línea de comandos"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(
+        description="Extractor de datos de planillas de ferretería exportadas a HTML")
+    parser.add_argument('directorio', nargs='?',
+                        default=os.path.dirname(os.path.abspath(__file__)),
+                        help="Directorio con los archivos HTML o libro .xlsx (por defecto, el del script)")
+    parser.add_argument('-o', '--salida', default=None,
+                        help="Archivo de salida .json o .ndjson (por defecto, con timestamp en el directorio)")
+    parser.add_argument('--formato', choices=['json', 'ndjson'], default=None,
+                        help="Formato de salida (por defecto, según la extensión de --salida; si no, json)")
+    parser.add_argument('--compacto', action='store_true',
+                        help="Omitir fila_completa y la copia de los productos dentro de cada hoja")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="Procesos para procesar hojas en paralelo (1 = secuencial)")
+    parser.add_argument('--no-cache', dest='usar_cache', action='store_false',
+                        help="No usar la cache de hojas ya extraídas (fuerza reprocesar todo)")
+    parser.add_argument('--hojas', nargs='+', default=None,
+                        help="Extraer sólo estas pestañas (nombre de pestaña o de archivo)")
+    parser.add_argument('--listar-hojas', action='store_true',
+                        help="Mostrar las pestañas del libro (sin extraer) y salir")
+    parser.add_argument('--reanudar', '--resume', dest='reanudar', action='store_true',
+                        help="Reanudar una corrida interrumpida: las hojas ya completadas no se vuelven a extraer")
+    parser.add_argument('--sin-puntos-control', dest='puntos_control', action='store_false',
+                        help="No guardar cada hoja terminada (la corrida no se podrá reanudar)")
+    parser.add_argument('--directorio-ejecucion', default=None,
+                        help="Directorio de los puntos de control (por defecto, uno por libro en ~/.cache)")
+    parser.add_argument('--sin-progreso', dest='progreso', action='store_false',
+                        help="No mostrar el avance (filas procesadas, filas/s y ETA) al terminar cada hoja")
+    parser.add_argument('--max-memory-mb', type=int, default=None,
+                        help="Límite de memoria residente en MB (por defecto, el de [extraction] en config.ini; "
+                             "0 = sin límite)")
+    parser.add_argument('--regiones', action='store_true',
+                        help="Clasificar sólo las regiones de productos (omite calculadoras, presupuestos y avisos "
+                             "embebidos; más lento en listas sin ellos)")
+    return parser
+
+def mostrar_progreso(estado):
+    """Imprime el avance de la extracción en la consola"""
+    print(f"   {formatear_progreso(estado)}")
+
+def main(argv=None):
     """Función principal"""
-    # Usar directorio actual o permitir especificar uno diferente
-    import sys
-    if len(sys.argv) > 1:
-        directorio_base = sys.argv[1]
-    else:
-        directorio_base = os.path.dirname(os.path.abspath(__file__))
+    args = crear_parser_argumentos().parse_args(argv)
+    directorio_base = args.directorio
+    
+    if args.listar_hojas and detectar_libro_xlsx(directorio_base):
+        libro_xlsx = detectar_libro_xlsx(directorio_base)
+        nombres_hojas = listar_hojas_xlsx(libro_xlsx)
+        print(f"📗 {os.path.basename(libro_xlsx)} ({len(nombres_hojas)} hojas)")
+        for i, nombre_hoja in enumerate(nombres_hojas, 1):
+            print(f"  {i:>2}. {nombre_hoja}")
+        return None, None
+    
+    if args.listar_hojas:
+        manifiesto = cargar_manifiesto(directorio_base)
+        print(f"📚 {manifiesto.nombre} ({len(manifiesto)} pestañas, desde {manifiesto.origen})")
+        for hoja in manifiesto:
+            tamano = f"{hoja.tamano / 1024:.0f} KB" if hoja.existe else "no disponible"
+            print(f"  {hoja.indice + 1:>2}. {hoja.nombre} [{hoja.archivo}, {tamano}]")
+        return None, None
     
     print("=== EXTRACTOR DE DATOS - PLANILLA FERRETERÍA ===")
     print(f"Directorio: {directorio_base}")
     print(f"Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    if args.workers > 1:
+        print(f"Workers: {args.workers}")
+    max_memory_mb = leer_max_memory_mb() if args.max_memory_mb is None else args.max_memory_mb or None
     print()
     
-    # Detectar archivos HTML automáticamente
-    html_files = detectar_archivos_html(directorio_base)
-    
-    if not html_files:
-        print("❌ No se encontraron archivos HTML en el directorio")
-        return
+    resultado, archivo_salida = extraer_datos_html(directorio_base, args.salida, workers=args.workers,
+                                                   usar_cache=args.usar_cache, hojas=args.hojas,
+                                                   formato=args.formato, compacto=args.compacto,
+                                                   progreso=mostrar_progreso if args.progreso else None,
+                                                   puntos_control=args.puntos_control, reanudar=args.reanudar,
+                                                   directorio_ejecucion=args.directorio_ejecucion,
+                                                   max_memory_mb=max_memory_mb, regiones=args.regiones)
     
-    print(f"📁 Archivos HTML detectados: {len(html_files)}")
-    for file in html_files:
-        print(f"   • {file}")
-    print()
-    
-    # Determinar nombre de la planilla desde el directorio
-    planilla_name = os.path.basename(directorio_base).replace('_archivos', '').replace('_files', '')
-    if not planilla_name or planilla_name == '.':
-        planilla_name = 'ANALISIS_HTML'
-    
-    # Estructura principal de datos
-    datos_completos = {
-        'planilla': planilla_name.upper(),
-        'directorio': directorio_base,
-        'fecha_extraccion': datetime.now().isoformat(),
-        'total_hojas': len(html_files),
-        'hojas': []
-    }      # Procesar cada archivo HTML detectado
-    for html_file in html_files:
-        ruta_archivo = os.path.join(directorio_base, html_file)
-        nombre_hoja = determinar_nombre_hoja(html_file)
-        
-        if os.path.exists(ruta_archivo):
-            resultado = procesar_hoja(ruta_archivo, nombre_hoja)
-            if resultado:
-                datos_completos['hojas'].append(resultado)
-        else:
-            print(f"⚠️  Archivo no encontrado: {ruta_archivo}")
-    
-    # Determinar archivo de salida
-    if archivo_salida_personalizado:
-        archivo_salida = archivo_salida_personalizado
-    else:
-        # Comportamiento por defecto (con timestamp)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        archivo_salida = os.path.join(directorio_base, f'datos_estructurados_{timestamp}.json')
-      # Guardar resultados
-    with open(archivo_salida, 'w', encoding='utf-8') as f:
-        json.dump(datos_completos, f, ensure_ascii=False, indent=2)
+    if not resultado:
+        print("❌ No se pudieron extraer datos del directorio")
+        return None, None
     
     print()
     print("=== RESUMEN FINAL ===")
-    print(f"Planilla: {datos_completos['planilla']}")
+    print(f"Planilla: {resultado['metadata']['planilla_original']}")
     print(f"Archivo guardado en: {archivo_salida}")
     print(f"Directorio: {directorio_base}")
-    print(f"Hojas procesadas: {len(datos_completos['hojas'])}")
+    print(f"Hojas procesadas: {resultado['resumen']['total_hojas']}")
+    
+    for nombre_hoja, num_productos in resultado['metadata']['productos_por_hoja'].items():
+        print(f"  {nombre_hoja}: {num_productos} producto(s)")
     
-    for hoja in datos_completos['hojas']:
-        print(f"  {hoja['hoja']}: {hoja['total_tablas']} tabla(s)")
+    for error in resultado['errores']:
+        print(f"  ❌ {error['archivo']}: {error['error']}")
     
     print()
     print("✅ Procesamiento completado")
     
     # Retornar datos y ubicación del archivo
-    return datos_completos, archivo_salida
+    return resultado, archivo_salida
 
 if __name__ == "__main__":
     main()
@@ -21,6 +21,9 @@ import webbrowser
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from detector_proveedores import escanear_proveedores
+from lector_html import leer_documento
+
 # Clase del purificador (integrada directamente)
 class PurificadorDatos:
     def __init__(self):
@@ -775,32 +778,24 @@ class FerreteriaAnalyzerApp:
         proveedores_encontrados = []
         
         try:
-            with open(ruta_archivo, 'r', encoding='utf-8', errors='ignore') as archivo:
-                contenido = archivo.read()
-            
-            soup = BeautifulSoup(contenido, 'html.parser')
-            
-            # Lista de proveedores conocidos
-            proveedores_conocidos = [
-                'CRIMARAL', 'ANCAIG', 'DAFYS', 'HERRAMETAL', 'YAYI', 
-                'DIST_CITY_BELL', 'BABUSI', 'FERRIPLAST', 'FERRETERIA',
-                'DISTCITYBELL', 'CITY_BELL', 'DISTRIBUIDORA',
-                'BRIMAX', 'PUMA', 'ROTAFLEX', 'STANLEY', 'BLACK_DECKER'
-            ]
-            
-            texto_completo = soup.get_text().upper()
-            
-            for proveedor in proveedores_conocidos:
-                if proveedor in texto_completo:
-                    ocurrencias = texto_completo.count(proveedor)
-                    proveedores_encontrados.append({
-                        'nombre': proveedor,
-                        'ocurrencias': ocurrencias,
-                        'confianza': min(ocurrencias / 10, 1.0)
-                    })
+            contenido = leer_documento(ruta_archivo).texto
+            
+            # Una sola pasada sobre el contenido; se cuenta sólo el texto visible
+            escaneo = escanear_proveedores(contenido)
+            visibles = {}
+            for ubicacion in ('titulo', 'pestanas', 'celdas'):
+                for proveedor, ocurrencias in escaneo['por_ubicacion'][ubicacion].items():
+                    visibles[proveedor] = visibles.get(proveedor, 0) + ocurrencias
+            
+            for proveedor, ocurrencias in visibles.items():
+                proveedores_encontrados.append({
+                    'nombre': proveedor,
+                    'ocurrencias': ocurrencias,
+                    'confianza': min(ocurrencias / 10, 1.0)
+                })
             
             # Buscar emails para detectar proveedores por dominio
-            emails = re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', texto_completo)
+            emails = re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', contenido)
             for email in emails:
                 domain_part = email.split('@')[1].split('.')[0].upper()
                 if len(domain_part) > 3 and domain_part not in [p['nombre'] for p in proveedores_encontrados]:
@@ -884,10 +879,7 @@ class FerreteriaAnalyzerApp:
     def procesar_hoja_html(self, archivo_path, nombre_hoja):
         """Procesa una hoja HTML individual"""
         try:
-            with open(archivo_path, 'r', encoding='utf-8', errors='ignore') as archivo:
-                contenido = archivo.read()
-                
-            soup = BeautifulSoup(contenido, 'html.parser')
+            soup = BeautifulSoup(leer_documento(archivo_path).texto, 'html.parser')
             tablas = soup.find_all('table')
             
             datos_tablas = []
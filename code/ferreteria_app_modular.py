@@ -5,6 +5,7 @@ Controlador Principal - Ferretería Analyzer con IA
 
 import json
 import os
+import shutil
 import sys
 from pathlib import Path
 from datetime import datetime
@@ -13,7 +14,13 @@ import pandas as pd
 # Importar módulos locales
 from ferreteria_ui import FerreteriaUI
 from extraer_datos import extraer_datos_html
+from manifiesto_libro import cargar_manifiesto
+from memoria_acotada import leer_max_memory_mb
+from progreso_extraccion import formatear_duracion, formatear_progreso
+from vista_previa import vista_previa_libro
 from data_analyzer import analizar_datos_con_ia
+from salida_resultados import cargar_resultado, es_salida_ndjson
+from tabla_productos import productos_a_dataframe
 
 class FerreteriaController:
     """Controlador principal de la aplicación"""
@@ -21,6 +28,7 @@ class FerreteriaController:
     def __init__(self):
         self.ui = None
         self.current_data = None
+        self.current_workbook = None  # Manifiesto del libro seleccionado
         self.analyzed_data = None
         self.api_key = ""
         self.custom_prompt = ""
@@ -54,12 +62,44 @@ class FerreteriaController:
             html_files = list(Path(directory).glob("*.htm*"))
             if html_files:
                 self.log_message(f"✅ Encontrados {len(html_files)} archivos HTML")
+                
+                # Mostrar las pestañas del libro sin parsear ninguna hoja
+                self.current_workbook = cargar_manifiesto(directory)
+                self.ui.show_workbook_tabs(self.current_workbook)
+                self.log_message(f"📚 Libro '{self.current_workbook.nombre}': "
+                                 f"{len(self.current_workbook.nombres())} pestañas disponibles")
+                self.log_message("💡 Selecciona pestañas en el árbol para extraer sólo esas (ninguna = todas)")
+                self.ui.run_in_thread(self.preview_workbook, directory)
             else:
                 self.ui.show_warning_dialog("Advertencia", 
                     "No se encontraron archivos HTML en el directorio seleccionado")
         else:
             self.log_message("❌ Selección de directorio cancelada")
     
+    def preview_workbook(self, directory):
+        """Vista previa rápida del libro: proveedor y primeros productos de cada pestaña"""
+        try:
+            vista = vista_previa_libro(directory)
+        except Exception as e:
+            self.log_message(f"⚠️ No se pudo generar la vista previa: {e}")
+            return
+        if self.ui.selected_dir != directory:
+            return  # Se eligió otro directorio mientras tanto
+        
+        self.ui.show_workbook_preview(vista)
+        muestras = sum(len(hoja['productos']) for hoja in vista['hojas'])
+        self.log_message(f"👀 Vista previa en {vista['tiempo']:.2f}s: proveedor {vista['proveedor']}, "
+                         f"{muestras} productos de muestra")
+        if vista['agotado']:
+            self.log_message("⏱️ Vista previa cortada por tiempo: algunas pestañas quedaron sin muestra")
+    
+    def report_progress(self, estado):
+        """Muestra el avance de la extracción en el log y en la barra de progreso"""
+        self.log_message(formatear_progreso(estado))
+        self.ui.update_progress(estado['fraccion'],
+                                f"{estado['filas']:,}/{estado['filas_totales']:,} filas · "
+                                f"ETA {formatear_duracion(estado['eta'])}")
+    
     def extract_data(self):
         """Extrae datos desde archivos HTML con diálogo para guardar archivo"""
         if not self.ui.selected_dir:
@@ -78,7 +118,8 @@ class FerreteriaController:
         archivo_salida = filedialog.asksaveasfilename(
             title="Guardar datos extraídos como...",
             defaultextension=".json",
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            filetypes=[("JSON files", "*.json"), ("NDJSON (un producto por línea)", "*.ndjson"),
+                       ("All files", "*.*")],
             initialfile=default_name
         )
         
@@ -86,13 +127,21 @@ class FerreteriaController:
             self.log_message("❌ Extracción cancelada por el usuario")
             return
         
+        # Pestañas elegidas en el árbol (None = todas)
+        hojas = self.ui.get_selected_sheets() or None
+        
         def extract_worker():
             try:
                 self.log_message("🔍 Iniciando extracción de datos...")
                 self.log_message(f"💾 Archivo de salida: {archivo_salida}")
+                if hojas:
+                    self.log_message(f"📑 Pestañas seleccionadas: {', '.join(hojas)}")
                 
                 # Usar el extractor existente con archivo personalizado
-                data, archivo_guardado = extraer_datos_html(self.ui.selected_dir, archivo_salida)
+                self.ui.update_progress(0, "Pre-escaneando hojas...")
+                data, archivo_guardado = extraer_datos_html(self.ui.selected_dir, archivo_salida, hojas=hojas,
+                                                            progreso=self.report_progress,
+                                                            max_memory_mb=leer_max_memory_mb())
                 if data:
                     self.current_data = data
                     self.last_saved_file = archivo_guardado  # Guardar la ruta del archivo
@@ -109,11 +158,14 @@ class FerreteriaController:
                     self.log_message(f"   🛍️ {total_productos} productos encontrados")
                     self.log_message(f"   💾 Guardado en: {archivo_guardado}")
                     
-                    # También guardar una copia para la app (compatibilidad)
-                    with open('datos_extraidos_app.json', 'w', encoding='utf-8') as f:
-                        json.dump(data, f, ensure_ascii=False, indent=2)
-                    
-                    self.log_message("💾 Datos guardados en 'datos_extraidos_app.json'")
+                    # También dejar una copia para la app (compatibilidad): se copia el
+                    # archivo ya escrito en lugar de volver a serializar todo
+                    if es_salida_ndjson(archivo_guardado):
+                        self.log_message("ℹ️ Salida NDJSON: no se genera 'datos_extraidos_app.json'")
+                    elif not (os.path.exists('datos_extraidos_app.json') and
+                              os.path.samefile(archivo_guardado, 'datos_extraidos_app.json')):
+                        shutil.copyfile(archivo_guardado, 'datos_extraidos_app.json')
+                        self.log_message("💾 Datos guardados en 'datos_extraidos_app.json'")
                     
                     # Mostrar botón para abrir directorio del archivo
                     self.mostrar_boton_abrir_directorio(archivo_guardado)
@@ -152,8 +204,7 @@ class FerreteriaController:
             if self.ui.ask_yes_no("Origen de datos", 
                 f"¿Deseas analizar los datos del archivo que guardaste?\n\n{self.last_saved_file}\n\n(No = usar datos en memoria)"):
                 try:
-                    with open(self.last_saved_file, 'r', encoding='utf-8') as f:
-                        data_to_analyze = json.load(f)
+                    data_to_analyze = cargar_resultado(self.last_saved_file)
                     self.log_message(f"📁 Datos cargados desde: {self.last_saved_file}")
                 except Exception as e:
                     self.log_message(f"❌ Error cargando archivo: {e}")
@@ -247,8 +298,7 @@ class FerreteriaController:
             if self.ui.ask_yes_no("Origen de datos", 
                 f"¿Deseas exportar los datos del archivo que guardaste?\n\n{self.last_saved_file}\n\n(No = usar datos en memoria)"):
                 try:
-                    with open(self.last_saved_file, 'r', encoding='utf-8') as f:
-                        data_to_export = json.load(f)
+                    data_to_export = cargar_resultado(self.last_saved_file)
                     self.log_message(f"📁 Datos cargados desde: {self.last_saved_file}")
                 except Exception as e:
                     self.log_message(f"❌ Error cargando archivo: {e}")
@@ -299,7 +349,8 @@ class FerreteriaController:
                     # Hojas por categoría
                     for i, hoja in enumerate(data_to_export.get('hojas', [])):
                         if 'productos' in hoja and hoja['productos']:
-                            df_productos = pd.DataFrame(hoja['productos'])
+                            # Columnar: precios como precio_<tipo>, proveedor/hoja categóricos
+                            df_productos = productos_a_dataframe(hoja['productos'])
                             
                             # Limpiar nombre de hoja para Excel
                             sheet_name = hoja.get('nombre', f'Hoja_{i+1}')
@@ -7,6 +7,7 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import threading
 from pathlib import Path
+from tabla_productos import VistaProductos
 
 class FerreteriaUI:
     """Clase para manejar la interfaz de usuario"""
@@ -77,6 +78,12 @@ class FerreteriaUI:
         self.dir_label = ttk.Label(control_frame, text="Ningún directorio seleccionado", 
                                   foreground="gray")
         self.dir_label.grid(row=2, column=0, columnspan=5, pady=(10, 0))
+        
+        # Avance de la extracción (filas procesadas sobre las estimadas por el pre-escaneo)
+        self.progress_bar = ttk.Progressbar(control_frame, orient=tk.HORIZONTAL, mode='determinate', maximum=100)
+        self.progress_bar.grid(row=3, column=0, columnspan=3, pady=(10, 0), sticky=(tk.W, tk.E))
+        self.progress_label = ttk.Label(control_frame, text="", foreground="gray")
+        self.progress_label.grid(row=3, column=3, columnspan=2, pady=(10, 0), sticky=tk.W, padx=5)
     
     def create_data_tree(self, parent):
         """Crea el árbol de datos"""
@@ -126,6 +133,12 @@ class FerreteriaUI:
             self.dir_label.config(text="Ningún directorio seleccionado", foreground="gray")
             self.selected_dir = None
     
+    def update_progress(self, fraction, text=""):
+        """Actualiza la barra de progreso (fraction entre 0 y 1)"""
+        self.progress_bar['value'] = fraction * 100
+        self.progress_label.config(text=text)
+        self.root.update_idletasks()
+    
     def log_message(self, message):
         """Añade un mensaje al log"""
         self.log_text.insert(tk.END, f"{message}\n")
@@ -149,12 +162,52 @@ class FerreteriaUI:
         if isinstance(data, dict):
             self._add_dict_to_tree('', 'Datos', data)
     
+    def show_workbook_tabs(self, manifiesto):
+        """Muestra las pestañas del libro (sin extraer) para elegir cuáles procesar"""
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+        
+        libro_node = self.tree.insert('', 'end', text=f"📚 {manifiesto.nombre}",
+                                      values=(f"{len(manifiesto)} pestañas",), open=True)
+        for hoja in manifiesto:
+            if hoja.existe:
+                valor = f"{hoja.archivo} ({hoja.tamano / 1024:,.0f} KB)"
+                # El iid identifica la hoja al leer la selección
+                self.tree.insert(libro_node, 'end', iid=f"hoja:{hoja.archivo}", text=hoja.nombre,
+                                 values=(valor,))
+            else:
+                self.tree.insert(libro_node, 'end', text=hoja.nombre, values=(f"{hoja.archivo} (no disponible)",))
+    
+    def show_workbook_preview(self, vista):
+        """Agrega a cada pestaña del árbol su proveedor y los primeros productos de la vista previa"""
+        estados = {'completa': 'hoja completa', 'muestra': 'muestra', 'sin_tiempo': 'sin tiempo'}
+        for hoja in vista['hojas']:
+            iid = f"hoja:{hoja['archivo']}"
+            if not self.tree.exists(iid):
+                continue
+            for item in self.tree.get_children(iid):
+                self.tree.delete(item)
+            valor = f"{hoja['proveedor'] or '?'} - {len(hoja['productos'])} productos ({estados[hoja['estado']]})"
+            self.tree.item(iid, values=(valor,))
+            for producto in hoja['productos']:
+                desc = producto.get('descripcion') or producto.get('codigo') or 'Producto'
+                if len(desc) > 50:
+                    desc = desc[:50] + "..."
+                detalle = producto.get('codigo') or ''
+                if producto.get('precio'):
+                    detalle += f"  ${producto['precio']:,.2f}"
+                self.tree.insert(iid, 'end', text=desc, values=(detalle,))
+    
+    def get_selected_sheets(self):
+        """Archivos de las pestañas seleccionadas en el árbol"""
+        return [item[len('hoja:'):] for item in self.tree.selection() if item.startswith('hoja:')]
+    
     def _add_dict_to_tree(self, parent, key, data):
         """Añade un diccionario al árbol de manera recursiva"""
         if isinstance(data, dict):
             node = self.tree.insert(parent, 'end', text=key, values=('',))
             for k, v in data.items():
-                if k == 'productos' and isinstance(v, list):
+                if k == 'productos' and isinstance(v, (list, VistaProductos)):
                     self._add_products_to_tree(node, v)
                 else:
                     self._add_dict_to_tree(node, k, v)
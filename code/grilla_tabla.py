@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Grilla de celdas de las tablas HTML exportadas por Excel
+Ubica las celdas combinadas (colspan/rowspan) en su columna real
+"""
+
+# Disposiciones ya calculadas, por la secuencia de (span, oculta) de los <col>
+_DISPOSICIONES = {}
+
+
+class DisposicionColumnas:
+    """Columnas de una tabla según sus <col>: ancho total y columnas ocultas"""
+
+    __slots__ = ('ancho', 'ocultas')
+
+    def __init__(self, ancho=0, ocultas=frozenset()):
+        self.ancho = ancho
+        self.ocultas = ocultas
+
+    def __repr__(self):
+        return f"DisposicionColumnas(ancho={self.ancho}, ocultas={sorted(self.ocultas)})"
+
+
+def disposicion_de_columnas(columnas):
+    """DisposicionColumnas de los <col> de una tabla: [(span, oculta), ...] en orden"""
+    clave = tuple(columnas)
+    disposicion = _DISPOSICIONES.get(clave)
+    if disposicion is None:
+        ancho = 0
+        ocultas = set()
+        for span, oculta in clave:
+            if oculta:
+                ocultas.update(range(ancho, ancho + span))
+            ancho += span
+        disposicion = _DISPOSICIONES[clave] = DisposicionColumnas(ancho, frozenset(ocultas))
+    return disposicion
+
+
+class GrillaTabla:
+    """Columnas de una tabla ocupadas por los rowspan de las filas anteriores"""
+
+    __slots__ = ('disposicion', 'cubiertas')
+
+    def __init__(self, disposicion=None):
+        self.disposicion = disposicion or disposicion_de_columnas(())
+        self.cubiertas = {}  # columna -> filas siguientes que todavía cubre
+
+    def nueva_fila(self):
+        ocupadas = frozenset(self.cubiertas)
+        if self.cubiertas:
+            self.cubiertas = {columna: filas - 1 for columna, filas in self.cubiertas.items() if filas > 1}
+        return FilaGrilla(self, ocupadas)
+
+
+class FilaGrilla:
+    """Posición de las celdas de una fila en la grilla de su tabla"""
+
+    __slots__ = ('grilla', 'ocupadas', 'columna')
+
+    def __init__(self, grilla, ocupadas):
+        self.grilla = grilla
+        self.ocupadas = ocupadas
+        self.columna = 0
+
+    def ubicar(self, colspan=1, rowspan=1):
+        """
+        Columna de la próxima celda y cuántas columnas ocupadas desde
+        arriba hay que completar antes de ella
+        """
+        columna = self.columna
+        while columna in self.ocupadas:
+            columna += 1
+        antes = columna - self.columna
+        self.columna = columna + colspan
+        if rowspan > 1:
+            for cubierta in range(columna, columna + colspan):
+                self.grilla.cubiertas[cubierta] = rowspan - 1
+        return columna, antes
+
+    def faltantes(self):
+        """Columnas vacías que completan la fila: las ocupadas desde arriba y hasta el ancho de la tabla"""
+        fin = self.grilla.disposicion.ancho
+        if self.ocupadas:
+            fin = max(fin, max(self.ocupadas) + 1)
+        return max(fin - self.columna, 0)
+
+
+def _extension(valor):
+    try:
+        return max(int(valor), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def atributos_de_celda(attrs):
+    """(colspan, rowspan) de los atributos de una celda (1 si no están o no son válidos)"""
+    colspan = rowspan = 1
+    for nombre, valor in attrs:
+        if nombre == 'colspan':
+            colspan = _extension(valor)
+        elif nombre == 'rowspan':
+            rowspan = _extension(valor)
+    return colspan, rowspan
+
+
+def filas_en_grilla(tabla, con_clases=False):
+    """
+    Filas de una tabla de BeautifulSoup ubicadas en la grilla de la tabla a
+    la que pertenece cada <tr> (como las entrega lector_html, sin poda):
+    listas de textos limpios o, con con_clases, (textos, clases)
+    """
+    from lector_html import limpiar_texto
+
+    grillas = {}
+    for tr in tabla.find_all('tr'):
+        propia = tr.find_parent('table')
+        grilla = grillas.get(id(propia))
+        if grilla is None:
+            columnas = [(_extension(col.get('span')), False) for col in propia.find_all('col')
+                        if col.find_parent('table') is propia]
+            grilla = grillas[id(propia)] = GrillaTabla(disposicion_de_columnas(columnas))
+
+        fila = grilla.nueva_fila()
+        textos = []
+        clases = []
+        for celda in tr.find_all(['td', 'th']):
+            colspan, rowspan = atributos_de_celda(celda.attrs.items())
+            _, antes = fila.ubicar(colspan, rowspan)
+            textos.extend([''] * antes)
+            textos.append(limpiar_texto(celda.get_text()))
+            textos.extend([''] * (colspan - 1))
+            clases.extend([None] * antes)
+            clases.append(' '.join(celda.get('class')) if celda.get('class') else None)
+            clases.extend([None] * (colspan - 1))
+        faltantes = fila.faltantes()
+        textos.extend([''] * faltantes)
+        clases.extend([None] * faltantes)
+        yield (textos, clases) if con_clases else textos
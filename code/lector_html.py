@@ -0,0 +1,619 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lector incremental de tablas HTML exportadas por Excel
+Entrega cada fila como una lista de celdas limpias sin construir el DOM, con la misma semántica que BeautifulSoup
+"""
+
+import codecs
+import mmap
+import os
+import re
+from collections import deque
+from html.entities import html5
+from html.parser import HTMLParser
+
+from grilla_tabla import GrillaTabla, atributos_de_celda, disposicion_de_columnas
+
+# Tamaño aproximado de cada bloque leído del disco
+TAMANO_BLOQUE = 64 * 1024
+
+# Elementos vacíos: se cierran solos y nunca contienen texto
+ETIQUETAS_VACIAS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen',
+    'link', 'menuitem', 'meta', 'param', 'source', 'track', 'wbr',
+    'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex',
+    'nextid', 'spacer'
+}
+
+# Contenedores cuyo texto no forma parte de get_text()
+ETIQUETAS_SIN_TEXTO = {'script', 'style', 'template'}
+
+PATRON_ESPACIOS = re.compile(r'\s+')
+
+PATRON_OCULTO = re.compile(r'display\s*:\s*none', re.IGNORECASE)
+
+# Filas iniciales de cada tabla donde se buscan los encabezados de precios
+FILAS_ENCABEZADO = 5
+
+# Marca de las celdas ocultas en las filas (su texto no se limpia ni se clasifica)
+CELDA_OCULTA = ()
+
+# Columnas cubiertas por una celda combinada (colspan/rowspan): se entregan vacías
+CELDA_CUBIERTA = ('',)
+
+# Totales acumulados de la poda en este proceso (como las estadísticas del clasificador)
+ESTADISTICAS_PODA = {'filas_ocultas': 0, 'filas_vacias': 0, 'celdas_ocultas': 0, 'celdas_vacias': 0,
+                     'filas_prefiltradas': 0, 'bytes_prefiltrados': 0}
+
+# Bytes iniciales donde se busca la declaración de charset
+TAMANO_SONDEO = 4096
+
+CODIFICACION_POR_DEFECTO = 'utf-8'
+
+PATRON_CHARSET = re.compile(rb'<meta[^>]*?charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+
+# Para partir una hoja en rangos de bytes alineados con sus filas
+PATRON_ETIQUETA_TABLA = re.compile(rb'<(/?)table\b', re.IGNORECASE)
+PATRON_INICIO_FILA = re.compile(rb'<tr[\s>]', re.IGNORECASE)
+PATRON_ROWSPAN = re.compile(rb'rowspan\s*=\s*["\']?\s*(\d+)', re.IGNORECASE)
+
+# Fila de relleno: sólo celdas sin texto (espacios o &nbsp;) y sin rowspan
+PATRON_FILA_VACIA = re.compile(
+    r'<tr(?:\s[^>]*)?>(?:\s*<t[dh](?![^>]*rowspan)(?:\s[^>]*)?>(?:\s|&nbsp;|&#160;)*</t[dh]>)+\s*</tr>',
+    re.IGNORECASE)
+PATRON_MARCAS_FILTRO = re.compile(
+    r'<(?P<cierre>/?)table\b|(?P<fila><tr[\s>])|rowspan\s*=\s*["\']?\s*(?P<rowspan>\d+)', re.IGNORECASE)
+PATRON_FIN_FILA = re.compile(r'</tr', re.IGNORECASE)
+
+
+def estadisticas_poda():
+    """Copia de los totales de la poda (para calcular lo omitido en una hoja)"""
+    return dict(ESTADISTICAS_PODA)
+
+
+def celdas_omitidas(estadisticas):
+    """Celdas que no pasaron por la clasificación: de filas descartadas, ocultas o vacías"""
+    return estadisticas['celdas_ocultas'] + estadisticas['celdas_vacias']
+
+
+def _es_oculto(attrs):
+    """El elemento no se ve en la hoja: display:none, height=0 o width=0"""
+    for nombre, valor in attrs:
+        if nombre == 'style' and valor and PATRON_OCULTO.search(valor):
+            return True
+        if (nombre == 'height' or nombre == 'width') and valor == '0':
+            return True
+    return False
+
+
+def _entero_atributo(attrs, nombre_buscado):
+    for nombre, valor in attrs:
+        if nombre == nombre_buscado:
+            try:
+                return max(int(valor), 1)
+            except (TypeError, ValueError):
+                return 1
+    return 1
+
+
+def limpiar_texto(texto):
+    """Limpia y normaliza el texto"""
+    if not texto:
+        return ""
+
+    # Remover espacios extra y caracteres especiales
+    texto = PATRON_ESPACIOS.sub(' ', texto.strip())
+    texto = texto.replace('\xa0', ' ')  # Non-breaking space
+
+    return texto
+
+
+class LectorFilasHTML(HTMLParser):
+    """
+    Parser incremental que acumula filas completas a medida que se cierran.
+    Con con_clases=True cada fila se entrega junto con el atributo class de
+    sus celdas (None si la celda no tiene). Con podar=True se omiten las
+    filas y celdas que no aportan datos (ver el docstring del módulo),
+    salvo las primeras filas_encabezado de cada tabla.
+    """
+
+    def __init__(self, con_clases=False, podar=False, filas_encabezado=FILAS_ENCABEZADO):
+        super().__init__(convert_charrefs=False)
+        self.con_clases = con_clases
+        self.podar = podar
+        self.filas_encabezado = filas_encabezado
+        self.pila = []              # (etiqueta, objeto) de elementos abiertos
+        self.tablas = deque()       # Tablas aún no entregadas, en orden de inicio
+        self.tablas_abiertas = []
+        self.filas_abiertas = []
+        self.celdas_abiertas = []
+        self.sin_texto = 0
+        self.total_tablas = 0
+        self.filas_listas = []      # (indice_tabla, fila_datos[, clases]) listas para entregar
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ETIQUETAS_VACIAS:
+            if tag == 'col' and self.tablas_abiertas:
+                self._registrar_columna(attrs)
+            return
+
+        objeto = None
+        if tag == 'table':
+            objeto = {'indice': self.total_tablas, 'filas': deque(), 'cerrada': False,
+                      'columnas': [], 'grilla': None, 'entregadas': 0}
+            self.total_tablas += 1
+            self.tablas.append(objeto)
+            self.tablas_abiertas.append(objeto)
+        elif tag == 'tr':
+            objeto = {'celdas': [], 'clases': [], 'cerrada': False, 'grilla': self._grilla_abierta().nueva_fila(),
+                      'oculta': self.podar and _es_oculto(attrs)}
+            for tabla in self.tablas_abiertas:
+                tabla['filas'].append(objeto)
+            self.filas_abiertas.append(objeto)
+        elif tag == 'td' or tag == 'th':
+            objeto = []
+            self._ubicar_celda(objeto, attrs)
+            self.celdas_abiertas.append(objeto)
+        elif tag in ETIQUETAS_SIN_TEXTO:
+            self.sin_texto += 1
+
+        self.pila.append((tag, objeto))
+
+    def handle_endtag(self, tag):
+        # Igual que BeautifulSoup: cerrar hasta el último elemento con ese nombre
+        for posicion in range(len(self.pila) - 1, -1, -1):
+            if self.pila[posicion][0] == tag:
+                break
+        else:
+            return
+
+        while len(self.pila) > posicion:
+            self._cerrar(*self.pila.pop())
+
+        if tag == 'tr' or tag == 'table':
+            self._entregar_filas()
+
+    def handle_data(self, data):
+        if self.sin_texto:
+            return
+        for celda in self.celdas_abiertas:
+            celda.append(data)
+
+    def handle_charref(self, name):
+        # Como BeautifulSoup: las referencias < 256 se leen como windows-1252
+        if name[0] in 'xX':
+            codigo = int(name[1:], 16)
+        else:
+            codigo = int(name)
+
+        data = None
+        if codigo < 256:
+            try:
+                data = bytes([codigo]).decode('windows-1252')
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(codigo)
+            except (ValueError, OverflowError):
+                pass
+        self.handle_data(data or '\ufffd')
+
+    def handle_entityref(self, name):
+        self.handle_data(html5.get(name + ';', '&' + name))
+
+    def close(self):
+        """Termina el análisis cerrando los elementos que quedaron abiertos"""
+        super().close()
+        while self.pila:
+            self._cerrar(*self.pila.pop())
+        self._entregar_filas()
+
+    def _cerrar(self, tag, objeto):
+        if tag == 'table':
+            objeto['cerrada'] = True
+            self.tablas_abiertas.pop()
+        elif tag == 'tr':
+            objeto['cerrada'] = True
+            self.filas_abiertas.pop()
+            faltantes = objeto['grilla'].faltantes()
+            if faltantes:
+                objeto['celdas'].extend([CELDA_CUBIERTA] * faltantes)
+                if self.con_clases:
+                    objeto['clases'].extend([None] * faltantes)
+        elif tag == 'td' or tag == 'th':
+            self.celdas_abiertas.pop()
+        elif tag in ETIQUETAS_SIN_TEXTO:
+            self.sin_texto -= 1
+
+    def _registrar_columna(self, attrs):
+        """Columnas del <col> de la tabla abierta (span = varias columnas iguales)"""
+        tabla = self.tablas_abiertas[-1]
+        if tabla['grilla'] is None:
+            tabla['columnas'].append((_entero_atributo(attrs, 'span'), _es_oculto(attrs)))
+
+    def _grilla_abierta(self):
+        """Grilla de la tabla abierta: su disposición de columnas queda fija en la primera fila"""
+        if not self.tablas_abiertas:
+            return GrillaTabla()
+        tabla = self.tablas_abiertas[-1]
+        if tabla['grilla'] is None:
+            tabla['grilla'] = GrillaTabla(disposicion_de_columnas(tabla['columnas']))
+        return tabla['grilla']
+
+    def _ubicar_celda(self, objeto, attrs):
+        """Agrega la celda a las filas abiertas, en su columna de la grilla de cada fila"""
+        if not self.filas_abiertas:
+            return
+        colspan = rowspan = 1
+        clase = estilo = None
+        for nombre, valor in attrs:
+            if nombre == 'class':
+                clase = valor
+            elif nombre == 'style':
+                estilo = valor
+            elif nombre == 'colspan' or nombre == 'rowspan':
+                colspan, rowspan = atributos_de_celda(attrs)
+
+        celda = objeto
+        interna = True
+        for fila in reversed(self.filas_abiertas):
+            columna, antes = fila['grilla'].ubicar(colspan, rowspan)
+            if interna:
+                # La fila más interna decide si la celda está oculta
+                interna = False
+                if self.podar and (columna in fila['grilla'].grilla.disposicion.ocultas or
+                                   (estilo and 'none' in estilo and PATRON_OCULTO.search(estilo))):
+                    celda = CELDA_OCULTA
+            celdas = fila['celdas']
+            if antes:
+                celdas.extend([CELDA_CUBIERTA] * antes)
+            celdas.append(celda)
+            if colspan > 1:
+                celdas.extend([CELDA_CUBIERTA] * (colspan - 1))
+            if self.con_clases:
+                clases = fila['clases']
+                if antes:
+                    clases.extend([None] * antes)
+                clases.append(clase)
+                if colspan > 1:
+                    clases.extend([None] * (colspan - 1))
+
+    def _podar_fila(self, tabla, fila):
+        """fila_datos de una fila cerrada, o None si la poda la descarta"""
+        celdas = fila['celdas']
+        if celdas and tabla['entregadas'] < self.filas_encabezado:
+            # Fila de encabezado: se entrega aunque esté oculta o vacía
+            tabla['entregadas'] += 1
+            return [limpiar_texto(''.join(celda)) for celda in celdas]
+
+        if fila['oculta']:
+            ESTADISTICAS_PODA['filas_ocultas'] += 1
+            ESTADISTICAS_PODA['celdas_ocultas'] += len(celdas)
+            return None
+
+        fila_datos = ['' if celda is CELDA_OCULTA else limpiar_texto(''.join(celda)) for celda in celdas]
+        vacias = fila_datos.count('')
+        if vacias == len(fila_datos):
+            ESTADISTICAS_PODA['filas_vacias'] += 1
+            ESTADISTICAS_PODA['celdas_vacias'] += vacias
+            return None
+
+        ocultas = sum(1 for celda in celdas if celda is CELDA_OCULTA)
+        ESTADISTICAS_PODA['celdas_ocultas'] += ocultas
+        ESTADISTICAS_PODA['celdas_vacias'] += vacias - ocultas
+        return fila_datos
+
+    def _entregar_filas(self):
+        """Pasa a filas_listas las filas cerradas de la primera tabla pendiente"""
+        while self.tablas:
+            tabla = self.tablas[0]
+            filas = tabla['filas']
+            while filas and filas[0]['cerrada']:
+                fila = filas.popleft()
+                if self.podar:
+                    fila_datos = self._podar_fila(tabla, fila)
+                    if fila_datos is None:
+                        continue
+                else:
+                    fila_datos = [limpiar_texto(''.join(celda)) for celda in fila['celdas']]
+                if self.con_clases:
+                    self.filas_listas.append((tabla['indice'], fila_datos, fila['clases']))
+                else:
+                    self.filas_listas.append((tabla['indice'], fila_datos))
+
+            if not tabla['cerrada']:
+                break
+            self.tablas.popleft()
+
+
+def detectar_codificacion(inicio):
+    """
+    Codificación declarada en los primeros bytes del archivo (BOM o <meta>
+    charset). Si no hay declaración válida se asume UTF-8.
+    """
+    if inicio.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+
+    coincidencia = PATRON_CHARSET.search(inicio)
+    if coincidencia:
+        try:
+            return codecs.lookup(coincidencia.group(1).decode('ascii')).name
+        except LookupError:
+            pass
+
+    return CODIFICACION_POR_DEFECTO
+
+
+class DocumentoHTML:
+    """Texto completo de un archivo HTML, decodificado una sola vez"""
+
+    def __init__(self, texto, codificacion):
+        self.texto = texto
+        self.codificacion = codificacion
+
+    def bloques(self, tamano_bloque=TAMANO_BLOQUE):
+        """
+        Recorre el texto en bloques que terminan en fin de línea,
+        de modo que ningún patrón de una sola línea quede partido
+        """
+        texto = self.texto
+        inicio = 0
+        while inicio < len(texto):
+            fin = texto.find('\n', inicio + tamano_bloque)
+            fin = len(texto) if fin == -1 else fin + 1
+            yield texto[inicio:fin]
+            inicio = fin
+
+
+def leer_documento(ruta_archivo):
+    """
+    Mapea el archivo en memoria, detecta su charset en los primeros KB y
+    lo decodifica una sola vez (sin copia intermedia de los bytes)
+    """
+    with open(ruta_archivo, 'rb') as archivo:
+        if os.fstat(archivo.fileno()).st_size == 0:
+            return DocumentoHTML('', CODIFICACION_POR_DEFECTO)
+
+        with mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            codificacion = detectar_codificacion(mapa[:TAMANO_SONDEO])
+            texto = str(mapa, codificacion, 'ignore')
+
+    return DocumentoHTML(texto, codificacion)
+
+
+def leer_bloques(ruta_archivo, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Lee un archivo con su charset declarado y lo entrega en bloques de
+    líneas (los mismos que DocumentoHTML.bloques). El archivo se lee y se
+    decodifica a medida que se piden los bloques: quien deja de recorrerlos
+    no paga el resto de la hoja.
+    """
+    with open(ruta_archivo, 'rb') as archivo:
+        inicio = archivo.read(TAMANO_SONDEO)
+        decodificador = codecs.getincrementaldecoder(detectar_codificacion(inicio))('ignore')
+        pendiente = decodificador.decode(inicio)
+        while True:
+            datos = archivo.read(tamano_bloque)
+            pendiente += decodificador.decode(datos, final=not datos)
+            while len(pendiente) > tamano_bloque:
+                fin = pendiente.find('\n', tamano_bloque)
+                if fin == -1:
+                    break
+                yield pendiente[:fin + 1]
+                pendiente = pendiente[fin + 1:]
+            if not datos:
+                break
+        if pendiente:
+            yield pendiente
+
+
+class FiltroFilasVacias:
+    """
+    Bloques de texto HTML sin las filas de relleno, que la poda descartaría
+    después de parsearlas. Se dejan siempre:
+    - las primeras filas_encabezado filas de cada tabla (la poda las
+      entrega aunque estén vacías)
+    - las filas cubiertas por un rowspan de una fila anterior (cuentan en
+      la grilla de la tabla)
+    Las filas quitadas y sus bytes (las filas quitadas son ASCII) se suman
+    a ESTADISTICAS_PODA. Una fila partida entre dos bloques se resuelve con
+    el bloque siguiente.
+    """
+
+    def __init__(self, bloques, filas_encabezado=FILAS_ENCABEZADO):
+        self.bloques = bloques
+        self.filas_encabezado = filas_encabezado
+        self.protegidas = []  # Por tabla abierta: filas que todavía no se pueden quitar
+
+    def __iter__(self):
+        pendiente = ''
+        for bloque in self.bloques:
+            filtrado, pendiente = self._filtrar(pendiente + bloque)
+            if filtrado:
+                yield filtrado
+        if pendiente:
+            yield pendiente
+
+    def _filtrar(self, texto):
+        """(texto sin las filas de relleno, resto desde una fila que todavía no se cerró)"""
+        partes = []
+        inicio = posicion = 0
+        while True:
+            marca = PATRON_MARCAS_FILTRO.search(texto, posicion)
+            if marca is None:
+                break
+            posicion = marca.end()
+            if marca.group('rowspan') is not None:
+                if self.protegidas:
+                    self.protegidas[-1] = max(self.protegidas[-1], int(marca.group('rowspan')) - 1)
+            elif marca.group('fila') is None:
+                if marca.group('cierre'):
+                    if self.protegidas:
+                        self.protegidas.pop()
+                else:
+                    self.protegidas.append(self.filas_encabezado)
+            elif PATRON_FIN_FILA.search(texto, posicion) is None:
+                # La fila sigue en el próximo bloque
+                partes.append(texto[inicio:marca.start()])
+                return ''.join(partes), texto[marca.start():]
+            elif self.protegidas and self.protegidas[-1] > 0:
+                self.protegidas[-1] -= 1
+            elif self.protegidas:
+                vacia = PATRON_FILA_VACIA.match(texto, marca.start())
+                if vacia and vacia.group().isascii():
+                    partes.append(texto[inicio:marca.start()])
+                    inicio = posicion = vacia.end()
+                    ESTADISTICAS_PODA['filas_prefiltradas'] += 1
+                    ESTADISTICAS_PODA['bytes_prefiltrados'] += vacia.end() - marca.start()
+        partes.append(texto[inicio:])
+        return ''.join(partes), ''
+
+
+def iterar_filas_tablas(bloques, con_clases=False, podar=False, prefiltrar=True, filas_encabezado=FILAS_ENCABEZADO):
+    """
+    Genera (indice_tabla, fila_datos) para cada fila de cada tabla
+    a partir de un iterable de bloques de texto HTML. Con con_clases=True
+    genera (indice_tabla, fila_datos, clases) con la clase de cada celda;
+    con podar=True omite las filas ocultas o vacías (las de relleno, con
+    prefiltrar, antes de parsearlas) salvo las primeras filas_encabezado
+    de cada tabla.
+    """
+    if podar and prefiltrar:
+        bloques = FiltroFilasVacias(bloques, filas_encabezado)
+    lector = LectorFilasHTML(con_clases, podar, filas_encabezado)
+
+    for bloque in bloques:
+        lector.feed(bloque)
+        if lector.filas_listas:
+            yield from lector.filas_listas
+            lector.filas_listas = []
+
+    lector.close()
+    yield from lector.filas_listas
+
+
+def contar_filas(ruta_archivo):
+    """
+    Cantidad de <tr> de una hoja contada sobre los bytes, sin parsear ni
+    decodificar (estimación de las filas para el progreso de la extracción)
+    """
+    with open(ruta_archivo, 'rb') as archivo:
+        if os.fstat(archivo.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            return sum(1 for _ in PATRON_INICIO_FILA.finditer(mapa))
+
+
+def _codificacion_por_rangos(codificacion, inicio):
+    """El BOM sólo está al principio: los rangos siguientes son UTF-8 común"""
+    if codificacion == 'utf-8-sig' and inicio > 0:
+        return 'utf-8'
+    return codificacion
+
+
+def dividir_en_rangos_de_filas(ruta_archivo, partes):
+    """
+    Divide una hoja en rangos de bytes [inicio, fin) consecutivos que
+    cubren todo el archivo, cortando sólo justo antes de un <tr> de la
+    tabla principal, para parsearlos por separado.
+
+    Devuelve (codificacion, rangos) o None si la hoja no se puede dividir:
+    más de una tabla de primer nivel, charset que no es compatible con
+    ASCII o muy pocas filas. Las tablas anidadas (p. ej. las de las formas
+    VML que exporta Excel) y las primeras FILAS_ENCABEZADO filas de la
+    tabla principal quedan siempre dentro del primer rango: los demás se
+    leen sin filas de encabezado (leer_rango). No se corta antes de una
+    fila cubierta por un rowspan de la fila anterior: la grilla de la
+    tabla (grilla_tabla) no cruza los rangos.
+    """
+    with open(ruta_archivo, 'rb') as archivo:
+        if partes < 2 or os.fstat(archivo.fileno()).st_size == 0:
+            return None
+
+        with mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            codificacion = detectar_codificacion(mapa[:TAMANO_SONDEO])
+            if '<tr'.encode(_codificacion_por_rangos(codificacion, 1)) != b'<tr':
+                return None
+
+            # Una sola tabla de primer nivel; las anidadas deben estar antes de la zona a dividir
+            profundidad = 0
+            etiquetas = list(PATRON_ETIQUETA_TABLA.finditer(mapa))
+            for posicion, etiqueta in enumerate(etiquetas):
+                profundidad += -1 if etiqueta.group(1) else 1
+                if profundidad <= 0 and posicion != len(etiquetas) - 1:
+                    return None
+            if len(etiquetas) < 2 or profundidad != 0:
+                return None
+
+            zona_inicio = etiquetas[-2].end()
+            zona_fin = etiquetas[-1].start()
+            # Los cortes van después de las filas de encabezado
+            primeras = [fila.start() for _, fila in zip(range(FILAS_ENCABEZADO + 1),
+                                                         PATRON_INICIO_FILA.finditer(mapa, zona_inicio, zona_fin))]
+            if len(primeras) <= FILAS_ENCABEZADO:
+                return None
+            zona_inicio = primeras[-1]
+            cubiertas = _filas_cubiertas_por_rowspan(mapa, zona_inicio, zona_fin)
+
+            cortes = []
+            for parte in range(1, partes):
+                objetivo = zona_inicio + (zona_fin - zona_inicio) * parte // partes
+                fila = PATRON_INICIO_FILA.search(mapa, objetivo, zona_fin)
+                while fila and fila.start() in cubiertas:
+                    fila = PATRON_INICIO_FILA.search(mapa, fila.end(), zona_fin)
+                if fila and (not cortes or fila.start() > cortes[-1]):
+                    cortes.append(fila.start())
+
+            if not cortes:
+                return None
+
+            limites = [0] + cortes + [len(mapa)]
+            return codificacion, list(zip(limites, limites[1:]))
+
+
+def _filas_cubiertas_por_rowspan(mapa, inicio, fin):
+    """Posiciones de los <tr> de [inicio, fin) que tienen celdas de un rowspan de una fila anterior"""
+    cubiertas = set()
+    for rowspan in PATRON_ROWSPAN.finditer(mapa, inicio, fin):
+        siguientes = int(rowspan.group(1)) - 1
+        posicion = rowspan.end()
+        while siguientes > 0:
+            fila = PATRON_INICIO_FILA.search(mapa, posicion, fin)
+            if not fila:
+                break
+            cubiertas.add(fila.start())
+            posicion = fila.end()
+            siguientes -= 1
+    return cubiertas
+
+
+def filas_encabezado_de_rango(inicio):
+    """Filas de encabezado de la tabla en el rango que empieza en inicio (sólo el primero las tiene)"""
+    return FILAS_ENCABEZADO if inicio == 0 else 0
+
+
+def leer_rango(ruta_archivo, inicio, fin, codificacion):
+    """
+    Texto de un rango de dividir_en_rangos_de_filas. Los rangos que no son
+    el primero empiezan con la apertura de la tabla principal y sus <col>
+    (hasta su primera fila), para que sus filas se lean como filas de esa
+    tabla, con la misma disposición de columnas. Las filas de encabezado
+    están en el primero: los demás se leen con filas_encabezado_de_rango.
+    """
+    with open(ruta_archivo, 'rb') as archivo:
+        with mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            texto = str(mapa[inicio:fin], _codificacion_por_rangos(codificacion, inicio), 'ignore')
+            apertura = ''
+            if inicio > 0:
+                # La primera <table> es la principal: las anidadas quedan dentro de sus filas
+                tabla = PATRON_ETIQUETA_TABLA.search(mapa, 0, inicio)
+                primera_fila = PATRON_INICIO_FILA.search(mapa, tabla.end(), inicio) if tabla else None
+                if primera_fila:
+                    apertura = str(mapa[tabla.start():primera_fila.start()],
+                                   _codificacion_por_rangos(codificacion, tabla.start()), 'ignore')
+
+    if inicio > 0:
+        texto = (apertura or '<table>') + texto
+    return DocumentoHTML(texto, codificacion)
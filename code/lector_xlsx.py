@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lector de libros .xlsx por streaming
+Entrega las filas de cada hoja con la misma forma que el lector HTML, con los números nativos
+"""
+
+import datetime
+
+from lector_html import limpiar_texto
+
+EXTENSIONES_XLSX = ('.xlsx', '.xlsm')
+
+
+def es_libro_xlsx(ruta):
+    """Indica si la ruta es un libro que lee este backend"""
+    return ruta.lower().endswith(EXTENSIONES_XLSX)
+
+
+def abrir_libro(ruta_libro):
+    """Abre el libro en modo streaming con los valores calculados de las fórmulas"""
+    from openpyxl import load_workbook
+    return load_workbook(ruta_libro, read_only=True, data_only=True)
+
+
+def listar_hojas_xlsx(ruta_libro):
+    """Nombres de las hojas del libro, en orden de pestañas"""
+    libro = abrir_libro(ruta_libro)
+    try:
+        return list(libro.sheetnames)
+    finally:
+        libro.close()
+
+
+def contar_filas_xlsx(ruta_libro):
+    """
+    Filas de cada hoja según la dimensión que guarda el libro (sin leer
+    las celdas); 0 si la hoja no la declara
+    """
+    libro = abrir_libro(ruta_libro)
+    try:
+        return {hoja.title: hoja.max_row or 0 for hoja in libro.worksheets}
+    finally:
+        libro.close()
+
+
+def valor_celda(valor):
+    """
+    Convierte el valor de una celda al de la fila: texto limpio como en el
+    lector HTML, números nativos y fechas como las muestra Excel
+    """
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'VERDADERO' if valor else 'FALSO'
+    if isinstance(valor, (int, float)):
+        return valor
+    if isinstance(valor, datetime.datetime):
+        if valor.time() == datetime.time(0, 0):
+            return valor.strftime('%d/%m/%Y')
+        return valor.strftime('%d/%m/%Y %H:%M')
+    if isinstance(valor, datetime.date):
+        return valor.strftime('%d/%m/%Y')
+    return limpiar_texto(str(valor))
+
+
+def iterar_filas_xlsx(ruta_libro, nombre_hoja):
+    """Genera las filas de una hoja como listas de valores (sin celdas vacías al final)"""
+    libro = abrir_libro(ruta_libro)
+    try:
+        for fila in libro[nombre_hoja].iter_rows(values_only=True):
+            fila_datos = [valor_celda(valor) for valor in fila]
+            while fila_datos and fila_datos[-1] == '':
+                fila_datos.pop()
+            yield fila_datos
+    finally:
+        libro.close()
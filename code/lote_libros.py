@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Extracción por lotes de varios libros, con una cola acotada y un resumen del lote
+"""
+
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from extraer_datos import detectar_archivos_html, detectar_libro_xlsx, extraer_datos_html
+from vigilar_carpeta import libros_de_carpeta, nombre_libro
+
+ARCHIVO_RESUMEN = 'resumen_lote.json'
+
+# Libros que se extraen a la vez por defecto
+JOBS_POR_DEFECTO = 2
+
+
+def expandir_libros(rutas):
+    """Libros de los argumentos (libros, carpetas con libros o patrones), sin repetir y en orden"""
+    libros = []
+    vistos = set()
+    for ruta in rutas:
+        coincidencias = sorted(glob.glob(ruta)) if glob.has_magic(ruta) else [ruta]
+        if not coincidencias:
+            print(f"⚠️ Ningún archivo coincide con: {ruta}")
+        for coincidencia in coincidencias:
+            # Una carpeta se expande a sus libros (ella misma si es un libro); lo que no es un libro se
+            # intenta igual y queda como fallido en el resumen
+            candidatos = [coincidencia]
+            if os.path.isdir(coincidencia):
+                candidatos = libros_de_carpeta(coincidencia) or candidatos
+            for libro in candidatos:
+                clave = os.path.realpath(libro)
+                if clave not in vistos:
+                    vistos.add(clave)
+                    libros.append(libro)
+    return libros
+
+
+def salidas_de_libros(libros, directorio_salida):
+    """Archivo de salida de cada libro (con sufijo si dos libros tienen el mismo nombre)"""
+    salidas = []
+    usados = set()
+    for libro in libros:
+        nombre = nombre_libro(libro)
+        candidato = nombre
+        repeticion = 1
+        while candidato in usados:
+            repeticion += 1
+            candidato = f"{nombre}_{repeticion}"
+        usados.add(candidato)
+        salidas.append(os.path.join(directorio_salida, f"datos_estructurados_{candidato}.json"))
+    return salidas
+
+
+def bytes_de_libro(libro):
+    """Tamaño de las hojas del libro (HTML o .xlsx) en bytes"""
+    if os.path.isfile(libro):
+        return os.path.getsize(libro)
+    with contextlib.redirect_stdout(io.StringIO()):
+        archivos = [os.path.join(libro, archivo) for archivo in detectar_archivos_html(libro)]
+        libro_xlsx = None if archivos else detectar_libro_xlsx(libro)
+    if libro_xlsx:
+        archivos = [libro_xlsx]
+    total = 0
+    for archivo in archivos:
+        with contextlib.suppress(OSError):
+            total += os.path.getsize(archivo)
+    return total
+
+
+def fila_de_libro(libro, error=None):
+    """Fila del resumen de un libro todavía sin extraer (o que falló con error)"""
+    return {
+        'libro': libro,
+        'salida': None,
+        'ok': False,
+        'productos': 0,
+        'hojas': 0,
+        'errores_hojas': 0,
+        'bytes': 0,
+        'segundos': 0.0,
+        'bytes_por_segundo': 0.0,
+        'error': error,
+    }
+
+
+def extraer_libro(tarea):
+    """
+    Extrae un libro del lote (en el proceso de un job): tarea es (libro,
+    salida, opciones de extraer_datos_html, detallado). Devuelve la fila del
+    resumen del libro; los errores quedan en la fila, no se propagan.
+    """
+    libro, salida, opciones, detallado = tarea
+    inicio = time.perf_counter()
+    fila = fila_de_libro(libro)
+    consola = contextlib.nullcontext() if detallado else contextlib.redirect_stdout(io.StringIO())
+    try:
+        fila['bytes'] = bytes_de_libro(libro)
+        with consola:
+            resultado, archivo_salida = extraer_datos_html(libro, salida, **opciones)
+        if resultado is None:
+            fila['error'] = "no se pudieron extraer datos (¿sin hojas?)"
+        else:
+            fila.update(ok=True, salida=archivo_salida, productos=resultado['metadata']['total_productos'],
+                        hojas=resultado['resumen']['total_hojas'], errores_hojas=len(resultado['errores']))
+    except Exception as e:
+        fila['error'] = f"{type(e).__name__}: {e}"
+    segundos = time.perf_counter() - inicio
+    fila['segundos'] = round(segundos, 3)
+    fila['bytes_por_segundo'] = round(fila['bytes'] / segundos, 1) if fila['ok'] and segundos > 0 else 0.0
+    return fila
+
+
+def _mostrar_fila(fila, terminados, total):
+    if fila['ok']:
+        avisos = f", {fila['errores_hojas']} hojas con errores" if fila['errores_hojas'] else ""
+        print(f"✅ [{terminados}/{total}] {nombre_libro(fila['libro'])}: {fila['productos']} productos, "
+              f"{fila['hojas']} hojas en {fila['segundos']:.2f} s "
+              f"({fila['bytes_por_segundo'] / 1024 / 1024:.1f} MB/s){avisos}")
+    else:
+        print(f"❌ [{terminados}/{total}] {nombre_libro(fila['libro'])}: {fila['error']}")
+
+
+def procesar_lote(libros, directorio_salida, jobs=JOBS_POR_DEFECTO, cola=None, detallado=False, **opciones):
+    """
+    Extrae los libros con a lo sumo jobs a la vez y cola más encolados
+    (por defecto, tantos como jobs). opciones se pasan a extraer_datos_html.
+    Devuelve las filas del resumen en el orden de los libros.
+    """
+    os.makedirs(directorio_salida, exist_ok=True)
+    opciones.setdefault('puntos_control', False)
+    tareas = [(libro, salida, opciones, detallado)
+              for libro, salida in zip(libros, salidas_de_libros(libros, directorio_salida))]
+    filas = [None] * len(tareas)
+
+    if jobs <= 1 or len(tareas) <= 1:
+        for indice, tarea in enumerate(tareas):
+            filas[indice] = extraer_libro(tarea)
+            _mostrar_fila(filas[indice], indice + 1, len(tareas))
+        return filas
+
+    limite = jobs + (jobs if cola is None else max(cola, 0))
+    pendientes = iter(enumerate(tareas))
+    en_curso = {}
+    terminados = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        while True:
+            for indice, tarea in pendientes:
+                en_curso[executor.submit(extraer_libro, tarea)] = indice
+                if len(en_curso) >= limite:
+                    break
+            if not en_curso:
+                break
+            listos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                indice = en_curso.pop(futuro)
+                try:
+                    filas[indice] = futuro.result()
+                except Exception as e:  # El proceso del job murió (p. ej. sin memoria)
+                    filas[indice] = fila_de_libro(tareas[indice][0], f"{type(e).__name__}: {e}")
+                terminados += 1
+                _mostrar_fila(filas[indice], terminados, len(tareas))
+    return filas
+
+
+def crear_resumen(filas, segundos, jobs):
+    """Resumen consolidado del lote"""
+    total_bytes = sum(fila['bytes'] for fila in filas if fila['ok'])
+    return {
+        'fecha': datetime.now().isoformat(),
+        'jobs': jobs,
+        'total_libros': len(filas),
+        'libros_ok': sum(1 for fila in filas if fila['ok']),
+        'libros_fallidos': sum(1 for fila in filas if not fila['ok']),
+        'total_productos': sum(fila['productos'] for fila in filas),
+        'total_bytes': total_bytes,
+        'segundos': round(segundos, 3),
+        'bytes_por_segundo': round(total_bytes / segundos, 1) if segundos > 0 else 0.0,
+        'libros': filas,
+    }
+
+
+def crear_parser_argumentos():
+    """Crea el parser de argumentos de la línea de comandos"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Extrae varios libros (carpetas, .xlsx o patrones) con una cola acotada de jobs")
+    parser.add_argument('rutas', nargs='+',
+                        help="Libros, carpetas con libros o patrones glob (entre comillas)")
+    parser.add_argument('--salida-dir', default=None,
+                        help="Directorio de las salidas y del resumen (por defecto, lote_<fecha> en el actual)")
+    parser.add_argument('-j', '--jobs', type=int, default=JOBS_POR_DEFECTO,
+                        help="Libros que se extraen a la vez (1 = secuencial)")
+    parser.add_argument('--cola', type=int, default=None,
+                        help="Libros encolados como máximo además de los que se extraen (por defecto, --jobs)")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="Procesos por libro para procesar sus hojas en paralelo")
+    parser.add_argument('--formato', choices=['json', 'ndjson'], default=None,
+                        help="Formato de las salidas (por defecto, json)")
+    parser.add_argument('--compacto', action='store_true',
+                        help="Omitir fila_completa y la copia de los productos dentro de cada hoja")
+    parser.add_argument('--no-cache', dest='usar_cache', action='store_false',
+                        help="No usar la cache de hojas ya extraídas (fuerza reprocesar todo)")
+    parser.add_argument('--detallado', action='store_true',
+                        help="Mostrar la salida completa del extractor de cada libro")
+    return parser
+
+
+def main(argv=None):
+    """Función principal: devuelve el código de salida (1 si algún libro falló)"""
+    args = crear_parser_argumentos().parse_args(argv)
+    libros = expandir_libros(args.rutas)
+    if not libros:
+        print("❌ No hay libros para procesar")
+        return 1
+
+    directorio_salida = args.salida_dir or os.path.join(os.getcwd(),
+                                                        f"lote_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    print("=== EXTRACCIÓN POR LOTES ===")
+    print(f"📚 {len(libros)} libros · {args.jobs} a la vez · salidas en {directorio_salida}")
+
+    inicio = time.perf_counter()
+    filas = procesar_lote(libros, directorio_salida, jobs=args.jobs, cola=args.cola, detallado=args.detallado,
+                          workers=args.workers, formato=args.formato, compacto=args.compacto,
+                          usar_cache=args.usar_cache)
+    resumen = crear_resumen(filas, time.perf_counter() - inicio, args.jobs)
+
+    archivo_resumen = os.path.join(directorio_salida, ARCHIVO_RESUMEN)
+    with open(archivo_resumen, 'w', encoding='utf-8') as archivo:
+        json.dump(resumen, archivo, ensure_ascii=False, indent=2)
+
+    print()
+    print("=== RESUMEN DEL LOTE ===")
+    print(f"Libros: {resumen['libros_ok']}/{resumen['total_libros']} extraídos")
+    print(f"Productos: {resumen['total_productos']}")
+    print(f"Tiempo: {resumen['segundos']:.2f} s ({resumen['bytes_por_segundo'] / 1024 / 1024:.1f} MB/s)")
+    print(f"Resumen guardado en: {archivo_resumen}")
+    if resumen['libros_fallidos']:
+        print(f"❌ {resumen['libros_fallidos']} libros fallaron")
+        return 1
+    print("✅ Lote completado")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Manifiesto de un libro de Excel exportado como HTML
+Hojas del libro con su nombre de pestaña, leídas del frameset sin abrir ninguna hoja
+"""
+
+import html
+import os
+import re
+from urllib.parse import unquote
+
+from lector_html import leer_documento
+
+PATRON_ENLACE_HOJA = re.compile(r'<link\s+id="?shLink"?\s+href="([^"]+)"', re.IGNORECASE)
+PATRON_NOMBRE_PESTANA = re.compile(r'c_rgszSh\[(\d+)\]\s*=\s*"([^"]*)"')
+PATRON_ARCHIVO_PRINCIPAL = re.compile(r'<link\s+id="?Main-File"?[^>]*\shref="([^"]+)"', re.IGNORECASE)
+PATRON_PESTANA_TABSTRIP = re.compile(r'<a\s+href="([^"]+)"[^>]*>(.*?)</a>', re.IGNORECASE | re.DOTALL)
+PATRON_ETIQUETA = re.compile(r'<[^>]+>')
+
+SUFIJOS_DIRECTORIO = ('_archivos', '_files')
+ARCHIVOS_AUXILIARES = {'tabstrip.htm', 'filelist.xml'}
+
+
+class HojaLibro:
+    """Una pestaña del libro: nombre, archivo, ruta y tamaño"""
+
+    def __init__(self, indice, nombre, ruta):
+        self.indice = indice
+        self.nombre = nombre
+        self.ruta = ruta
+        self.archivo = os.path.basename(ruta)
+        self.existe = os.path.isfile(ruta)
+        self.tamano = os.path.getsize(ruta) if self.existe else None
+        self._contenido = None
+
+    @property
+    def extraida(self):
+        """Indica si la hoja ya se parseó"""
+        return self._contenido is not None
+
+    def extraer(self):
+        """
+        Devuelve {'productos', 'proveedor'} de la hoja, parseándola
+        sólo la primera vez que se pide
+        """
+        if self._contenido is None:
+            # Importación diferida: extraer_datos usa este módulo
+            from extraer_datos import extraer_productos_de_archivo
+            productos, proveedor = extraer_productos_de_archivo(self.ruta)
+            self._contenido = {'productos': productos, 'proveedor': proveedor}
+        return self._contenido
+
+    def __repr__(self):
+        return f"HojaLibro({self.indice}, {self.nombre!r}, {self.archivo!r})"
+
+
+class ManifiestoLibro:
+    """Hojas de un libro en el orden de sus pestañas"""
+
+    def __init__(self, nombre, directorio, hojas, origen):
+        self.nombre = nombre
+        self.directorio = directorio
+        self.hojas = hojas
+        self.origen = origen  # 'frameset', 'tabstrip' o 'archivos'
+
+    def __iter__(self):
+        return iter(self.hojas)
+
+    def __len__(self):
+        return len(self.hojas)
+
+    def __getitem__(self, nombre):
+        """Busca una hoja por nombre de pestaña o por nombre de archivo"""
+        hoja = self.buscar(nombre)
+        if hoja is None:
+            raise KeyError(nombre)
+        return hoja
+
+    def buscar(self, nombre):
+        """Hoja con ese nombre de pestaña o de archivo (None si no existe)"""
+        for hoja in self.hojas:
+            if nombre in (hoja.nombre, hoja.archivo):
+                return hoja
+        return None
+
+    def nombres(self):
+        """Nombres de pestaña de las hojas presentes en disco"""
+        return [hoja.nombre for hoja in self.hojas if hoja.existe]
+
+    def disponibles(self):
+        """Hojas cuyo archivo existe"""
+        return [hoja for hoja in self.hojas if hoja.existe]
+
+    def seleccionar(self, nombres):
+        """Hojas disponibles que coinciden con los nombres (pestaña o archivo) en orden de libro"""
+        buscados = set(nombres)
+        return [hoja for hoja in self.disponibles() if hoja.nombre in buscados or hoja.archivo in buscados]
+
+
+def cargar_manifiesto(ruta):
+    """
+    Arma el manifiesto a partir del archivo principal del libro (frameset)
+    o de su directorio de hojas (..._archivos / ..._files)
+    """
+    if os.path.isfile(ruta):
+        return _manifiesto_desde_frameset(ruta)
+
+    directorio = os.path.abspath(ruta)
+    nombre = os.path.basename(directorio)
+    for sufijo in SUFIJOS_DIRECTORIO:
+        if nombre.endswith(sufijo):
+            nombre = nombre[:-len(sufijo)]
+            break
+
+    frameset = _buscar_frameset(directorio, nombre)
+    if frameset:
+        manifiesto = _manifiesto_desde_frameset(frameset)
+        # El frameset debe describir este mismo directorio
+        if manifiesto.hojas and all(os.path.dirname(hoja.ruta) == directorio for hoja in manifiesto.hojas):
+            return manifiesto
+
+    ruta_tabstrip = os.path.join(directorio, 'tabstrip.htm')
+    if os.path.isfile(ruta_tabstrip):
+        hojas = _hojas_desde_tabstrip(ruta_tabstrip)
+        if hojas:
+            return ManifiestoLibro(nombre, directorio, hojas, 'tabstrip')
+
+    return ManifiestoLibro(nombre, directorio, _hojas_desde_archivos(directorio), 'archivos')
+
+
+def _buscar_frameset(directorio, nombre):
+    """Archivo principal del libro: junto al directorio o el Main-File de tabstrip.htm"""
+    padre = os.path.dirname(directorio)
+    candidatos = [os.path.join(padre, nombre + extension) for extension in ('.htm', '.html')]
+
+    ruta_tabstrip = os.path.join(directorio, 'tabstrip.htm')
+    if os.path.isfile(ruta_tabstrip):
+        documento = leer_documento(ruta_tabstrip)
+        principal = PATRON_ARCHIVO_PRINCIPAL.search(documento.texto)
+        if principal:
+            href = unquote(principal.group(1), encoding=documento.codificacion)
+            candidatos.append(os.path.normpath(os.path.join(directorio, href)))
+
+    for candidato in candidatos:
+        if os.path.isfile(candidato):
+            return candidato
+    return None
+
+
+def _manifiesto_desde_frameset(ruta_frameset):
+    documento = leer_documento(ruta_frameset)
+    base = os.path.dirname(os.path.abspath(ruta_frameset))
+
+    rutas = [
+        os.path.normpath(os.path.join(base, unquote(href, encoding=documento.codificacion)))
+        for href in PATRON_ENLACE_HOJA.findall(documento.texto)
+    ]
+    nombres = {int(i): _limpiar_nombre(nombre) for i, nombre in PATRON_NOMBRE_PESTANA.findall(documento.texto)}
+
+    hojas = [
+        HojaLibro(i, nombres.get(i) or os.path.splitext(os.path.basename(ruta))[0], ruta)
+        for i, ruta in enumerate(rutas)
+    ]
+    directorio = os.path.dirname(rutas[0]) if rutas else base
+    nombre = os.path.splitext(os.path.basename(ruta_frameset))[0]
+    return ManifiestoLibro(nombre, directorio, hojas, 'frameset')
+
+
+def _hojas_desde_tabstrip(ruta_tabstrip):
+    documento = leer_documento(ruta_tabstrip)
+    directorio = os.path.dirname(os.path.abspath(ruta_tabstrip))
+    hojas = []
+    for href, etiqueta in PATRON_PESTANA_TABSTRIP.findall(documento.texto):
+        ruta = os.path.normpath(os.path.join(directorio, unquote(href, encoding=documento.codificacion)))
+        nombre = _limpiar_nombre(html.unescape(PATRON_ETIQUETA.sub('', etiqueta)))
+        hojas.append(HojaLibro(len(hojas), nombre or os.path.splitext(os.path.basename(ruta))[0], ruta))
+    return hojas
+
+
+def _hojas_desde_archivos(directorio):
+    try:
+        archivos = sorted(
+            archivo for archivo in os.listdir(directorio)
+            if archivo.lower().endswith(('.htm', '.html')) and archivo.lower() not in ARCHIVOS_AUXILIARES
+        )
+    except OSError:
+        return []
+    return [
+        HojaLibro(i, os.path.splitext(archivo)[0], os.path.join(directorio, archivo))
+        for i, archivo in enumerate(archivos)
+    ]
+
+
+def _limpiar_nombre(nombre):
+    """Los nombres de pestaña usan &nbsp; (\\xa0 en windows-1252) como espacio"""
+    return ' '.join(nombre.replace('\xa0', ' ').split())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Extracción con memoria acotada (--max-memory-mb o max_memory_mb en [extraction] de config.ini)
+Tablas clasificadas en lotes de filas y productos derramados a disco, con el mismo resultado
+"""
+
+import configparser
+import os
+import pickle
+import tempfile
+from array import array
+
+from tabla_productos import TablaProductos, VistaProductos
+
+try:
+    import resource
+except ImportError:  # Windows: no hay getrusage
+    resource = None
+
+RUTA_CONFIG_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.ini')
+SECCION_CONFIG = 'extraction'
+
+# Memoria estimada por fila de un lote (celdas, rasgos, matrices de clasificación y producto)
+BYTES_POR_FILA = 4096
+
+# Fracción de la memoria libre que se usa para el lote (el resto queda para los productos de la hoja)
+FRACCION_LOTE = 0.25
+
+FILAS_POR_LOTE_MINIMO = 256
+FILAS_POR_LOTE_MAXIMO = 8192
+
+MB = 1024 * 1024
+
+
+def leer_max_memory_mb(ruta_config=RUTA_CONFIG_INI):
+    """max_memory_mb de la sección [extraction] de config.ini (None si no hay límite)"""
+    configuracion = configparser.ConfigParser()
+    try:
+        configuracion.read(ruta_config, encoding='utf-8')
+        valor = configuracion.getint(SECCION_CONFIG, 'max_memory_mb', fallback=0)
+    except (configparser.Error, ValueError) as e:
+        print(f"⚠️ max_memory_mb inválido en {ruta_config}: {e}")
+        return None
+    return valor if valor > 0 else None
+
+
+def rss_actual_mb():
+    """Memoria residente actual del proceso en MB (None si no se puede medir)"""
+    try:
+        with open('/proc/self/statm', 'r') as archivo:
+            return int(archivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / MB
+    except (OSError, ValueError, IndexError):
+        return rss_pico_mb()
+
+
+def rss_pico_mb():
+    """Pico de memoria residente del proceso en MB (None si no se puede medir)"""
+    # VmHWM es el del programa actual; ru_maxrss se hereda a través de exec del proceso padre
+    try:
+        with open('/proc/self/status', 'r') as archivo:
+            for linea in archivo:
+                if linea.startswith('VmHWM:'):
+                    return int(linea.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB; macOS, bytes
+    return pico / MB if pico > 1024 * MB else pico / 1024
+
+
+def filas_por_lote_para(max_memory_mb):
+    """Filas de cada lote de clasificación según la memoria libre dentro del límite"""
+    actual = rss_actual_mb()
+    if actual is None:
+        return FILAS_POR_LOTE_MINIMO
+    libre = max_memory_mb - actual
+    if libre <= 0:
+        print(f"⚠️ El límite de {max_memory_mb} MB está por debajo de la memoria que ya usa el proceso "
+              f"({actual:.0f} MB)")
+        return FILAS_POR_LOTE_MINIMO
+    filas = int(libre * MB * FRACCION_LOTE / BYTES_POR_FILA)
+    return max(FILAS_POR_LOTE_MINIMO, min(filas, FILAS_POR_LOTE_MAXIMO))
+
+
+class ListaPerezosa(list):
+    """
+    Productos que json.dump recorre de a uno sin materializarlos: el
+    codificador de json (el de Python, que es el que usa json.dump) sólo
+    pide len() y el iterador de las listas. No es una lista de verdad, sólo
+    sirve como valor a serializar.
+    """
+
+    def __init__(self, longitud, iterar):
+        super().__init__()
+        self._longitud = longitud
+        self._iterar = iterar
+
+    def __len__(self):
+        return self._longitud
+
+    def __iter__(self):
+        return self._iterar()
+
+
+class VistaProductosEnDisco(VistaProductos):
+    """VistaProductos de un ProductosEnDisco: al serializarla los productos se leen de a uno"""
+
+    def __iter__(self):
+        return self.tabla.iterar(self.inicio, self.fin)
+
+    def para_json(self, omitir=()):
+        return ListaPerezosa(len(self), lambda: self.tabla.iterar(self.inicio, self.fin, omitir))
+
+    def __repr__(self):
+        return f"VistaProductosEnDisco({len(self)} productos)"
+
+
+class ProductosEnDisco:
+    """
+    Productos en orden de extracción guardados en un archivo temporal (un
+    pickle por producto y su posición en memoria). Misma interfaz que
+    TablaProductos para extraer_datos_html: agregar/extender, producto y
+    vista; el archivo se borra al liberar el objeto.
+    """
+
+    def __init__(self, directorio=None):
+        self.archivo = tempfile.TemporaryFile(prefix='productos_', suffix='.derrame', dir=directorio)
+        self.posiciones = array('q')
+        self.fin_datos = 0
+
+    def __len__(self):
+        return len(self.posiciones)
+
+    def agregar(self, producto):
+        self.archivo.seek(self.fin_datos)
+        self.posiciones.append(self.fin_datos)
+        pickle.dump(producto, self.archivo, protocol=pickle.HIGHEST_PROTOCOL)
+        self.fin_datos = self.archivo.tell()
+
+    def extender(self, productos):
+        for producto in productos:
+            self.agregar(producto)
+        self.archivo.flush()
+
+    def producto(self, indice, omitir=()):
+        if indice < 0:
+            indice += len(self)
+        self.archivo.seek(self.posiciones[indice])
+        return self._sin_campos(pickle.load(self.archivo), omitir)
+
+    def iterar(self, inicio=0, fin=None, omitir=()):
+        """Productos del rango leídos en orden (una sola pasada por el archivo)"""
+        fin = len(self) if fin is None else fin
+        if inicio >= fin:
+            return
+        posicion = self.posiciones[inicio]
+        for _ in range(inicio, fin):
+            self.archivo.seek(posicion)  # Por si otro lector movió el archivo mientras tanto
+            producto = pickle.load(self.archivo)
+            posicion = self.archivo.tell()
+            yield self._sin_campos(producto, omitir)
+
+    def vista(self, inicio=0, fin=None):
+        return VistaProductosEnDisco(self, inicio, len(self) if fin is None else fin)
+
+    def a_dataframe(self, inicio=0, fin=None):
+        return TablaProductos.desde_productos(self.iterar(inicio, fin)).a_dataframe()
+
+    @staticmethod
+    def _sin_campos(producto, omitir):
+        if omitir:
+            return {clave: valor for clave, valor in producto.items() if clave not in omitir}
+        return producto
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Progreso de la extracción: pre-escaneo de filas y ETA
+"""
+
+import os
+import time
+
+from lector_html import contar_filas
+from lector_xlsx import contar_filas_xlsx
+
+
+def preescanear_hojas(directorio, archivos, libro_xlsx=None):
+    """Filas estimadas de cada hoja: {archivo: filas} (0 si no se puede leer)"""
+    if libro_xlsx:
+        try:
+            filas_xlsx = contar_filas_xlsx(libro_xlsx)
+        except Exception:
+            filas_xlsx = {}
+        return {archivo: filas_xlsx.get(archivo, 0) for archivo in archivos}
+
+    filas = {}
+    for archivo in archivos:
+        try:
+            filas[archivo] = contar_filas(os.path.join(directorio, archivo))
+        except OSError:
+            filas[archivo] = 0
+    return filas
+
+
+class ProgresoExtraccion:
+    """
+    Avance de una extracción sobre las filas estimadas de sus hojas. Cada
+    hoja_terminada llama a callback con el estado actual (dict).
+    """
+
+    def __init__(self, filas_por_hoja, callback):
+        self.filas_por_hoja = filas_por_hoja
+        self.callback = callback
+        self.filas_totales = sum(filas_por_hoja.values())
+        self.filas = 0
+        self.filas_parseadas = 0
+        self.hojas_terminadas = 0
+        self.inicio = time.perf_counter()
+
+    def hoja_terminada(self, archivo, desde_cache=False):
+        filas_hoja = self.filas_por_hoja.get(archivo, 0)
+        self.filas += filas_hoja
+        if not desde_cache:
+            self.filas_parseadas += filas_hoja
+        self.hojas_terminadas += 1
+        self.callback(self.estado(archivo))
+
+    def estado(self, archivo=None):
+        """Filas procesadas, filas por segundo y ETA (None mientras no haya ritmo)"""
+        transcurrido = time.perf_counter() - self.inicio
+        filas_por_segundo = self.filas_parseadas / transcurrido if transcurrido > 0 else 0.0
+        restantes = max(self.filas_totales - self.filas, 0)
+        if not restantes:
+            eta = 0.0
+        else:
+            eta = restantes / filas_por_segundo if filas_por_segundo else None
+        return {
+            'archivo': archivo,
+            'hojas_terminadas': self.hojas_terminadas,
+            'total_hojas': len(self.filas_por_hoja),
+            'filas': self.filas,
+            'filas_totales': self.filas_totales,
+            'fraccion': self.filas / self.filas_totales if self.filas_totales else
+            self.hojas_terminadas / max(len(self.filas_por_hoja), 1),
+            'filas_por_segundo': filas_por_segundo,
+            'eta': eta,
+            'transcurrido': transcurrido,
+        }
+
+
+def formatear_duracion(segundos):
+    """Segundos como m:ss ('?' si no se conoce)"""
+    if segundos is None:
+        return '?'
+    minutos, segundos = divmod(int(round(segundos)), 60)
+    return f"{minutos}:{segundos:02d}"
+
+
+def formatear_progreso(estado):
+    """Línea de progreso para el log y la consola"""
+    return (f"⏳ {estado['hojas_terminadas']}/{estado['total_hojas']} hojas · "
+            f"{estado['filas']:,}/{estado['filas_totales']:,} filas ({estado['fraccion']:.0%}) · "
+            f"{estado['filas_por_segundo']:,.0f} filas/s · ETA {formatear_duracion(estado['eta'])}")
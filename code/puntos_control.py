@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Puntos de control de una extracción en curso
+Cada hoja terminada se guarda en el directorio de la ejecución, para reanudar una corrida interrumpida
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+DIRECTORIO_EJECUCIONES_POR_DEFECTO = os.path.join(
+    os.path.expanduser('~'), '.cache', 'ferreteria_analyzer', 'ejecuciones')
+
+NOMBRE_MANIFIESTO = 'manifiesto.json'
+
+
+def directorio_ejecucion_por_defecto(directorio, hojas=None):
+    """Directorio de ejecución de un libro (y selección de hojas): el mismo en cada corrida"""
+    identidad = f"{os.path.abspath(directorio)}\0{chr(1).join(sorted(hojas or []))}"
+    return os.path.join(DIRECTORIO_EJECUCIONES_POR_DEFECTO, hashlib.sha256(identidad.encode('utf-8')).hexdigest()[:24])
+
+
+def _escribir_json_atomico(ruta, datos):
+    ruta_temporal = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        with open(ruta_temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(datos, archivo, ensure_ascii=False, separators=(',', ':'))
+        os.replace(ruta_temporal, ruta)
+    finally:
+        if os.path.exists(ruta_temporal):
+            os.remove(ruta_temporal)
+
+
+class PuntosControl:
+    """Hojas completas de una extracción, guardadas a medida que terminan"""
+
+    def __init__(self, directorio_ejecucion, reanudar=False):
+        self.directorio = directorio_ejecucion
+        self.reanudadas = 0
+
+        # Sin reanudar se empieza de cero: se descartan los puntos de una corrida anterior
+        if not reanudar and os.path.isdir(self.directorio):
+            shutil.rmtree(self.directorio, ignore_errors=True)
+        os.makedirs(self.directorio, exist_ok=True)
+
+        self.hojas = {}
+        if reanudar:
+            try:
+                with open(self._ruta(NOMBRE_MANIFIESTO), 'r', encoding='utf-8') as archivo:
+                    self.hojas = json.load(archivo)['hojas']
+            except (OSError, ValueError, KeyError):
+                self.hojas = {}
+
+    def completadas(self):
+        """Archivos de las hojas ya guardadas"""
+        return list(self.hojas)
+
+    def obtener(self, archivo, clave):
+        """Contenido guardado de la hoja si su clave no cambió (None si hay que extraerla)"""
+        entrada = self.hojas.get(archivo)
+        if entrada is None or entrada['clave'] != clave:
+            return None
+        try:
+            with open(self._ruta(entrada['resultado']), 'r', encoding='utf-8') as archivo_resultado:
+                contenido = json.load(archivo_resultado)
+        except (OSError, ValueError):
+            return None
+        self.reanudadas += 1
+        return contenido
+
+    def guardar(self, archivo, clave, contenido):
+        """Guarda el contenido de una hoja terminada y la agrega al manifiesto"""
+        nombre_resultado = f"{hashlib.sha256(archivo.encode('utf-8')).hexdigest()[:24]}.json"
+        try:
+            _escribir_json_atomico(self._ruta(nombre_resultado), contenido)
+            self.hojas[archivo] = {'clave': clave, 'resultado': nombre_resultado}
+            _escribir_json_atomico(self._ruta(NOMBRE_MANIFIESTO), {'hojas': self.hojas})
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el punto de control de {archivo}: {e}")
+
+    def finalizar(self):
+        """La extracción terminó: los puntos de control ya no hacen falta"""
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def _ruta(self, nombre):
+        return os.path.join(self.directorio, nombre)
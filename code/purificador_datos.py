@@ -5,7 +5,10 @@ Clase PurificadorDatos - Módulo separado para purificación de datos
 
 import json
 import re
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Tuple, Iterable
+
+from conversion_precios import convertir_precio
+from salida_resultados import hojas_de_resultado, iterar_hojas, leer_encabezado
 
 class PurificadorDatos:
     """Clase para purificar y estructurar datos de ferretería"""
@@ -23,6 +26,17 @@ class PurificadorDatos:
         if not datos_originales or 'hojas' not in datos_originales:
             return datos_originales
         
+        return self._purificar_hojas(datos_originales, hojas_de_resultado(datos_originales))
+    
+    def purificar_archivo(self, ruta_resultado: str) -> Dict:
+        """
+        Purifica un resultado guardado (.json o .ndjson + .meta.json).
+        Con NDJSON los productos se leen de a uno, hoja por hoja.
+        """
+        return self._purificar_hojas(leer_encabezado(ruta_resultado), iterar_hojas(ruta_resultado))
+    
+    def _purificar_hojas(self, datos_originales: Dict, hojas: Iterable) -> Dict:
+        """Purifica los productos de cada (hoja, productos) conservando los metadatos"""
         datos_purificados = {
             'hojas': [],
             'resumen': datos_originales.get('resumen', {}),
@@ -33,13 +47,10 @@ class PurificadorDatos:
         
         productos_vistos = set()
         
-        for hoja in datos_originales['hojas']:
-            if 'productos' not in hoja:
-                continue
-            
+        for hoja, productos in hojas:
             productos_purificados = []
             
-            for producto in hoja['productos']:
+            for producto in productos:
                 # Purificar producto individual
                 producto_limpio = self._purificar_producto(producto)
                 
@@ -155,25 +166,15 @@ class PurificadorDatos:
         return codigo.upper()
     
     def _limpiar_precio(self, precio) -> str:
-        """Limpia y formatea el precio"""
+        """Limpia y formatea el precio ("$ 16.729,55" -> "16729.55"; vacío si no es un precio)"""
         if not precio:
             return ''
         
-        precio_str = str(precio).strip()
-        
-        # Extraer números y puntos/comas
-        precio_limpio = re.sub(r'[^\d\.\,]', '', precio_str)
-        
-        if not precio_limpio:
+        precio_num = convertir_precio(precio)
+        if precio_num is None:
             return ''
         
-        # Formatear precio
-        try:
-            # Convertir a float y volver a string con formato
-            precio_num = float(precio_limpio.replace(',', '.'))
-            return f"{precio_num:.2f}"
-        except:
-            return precio_limpio
+        return f"{precio_num:.2f}"
     
     def _es_producto_valido(self, producto: Dict) -> bool:
         """Verifica si un producto es válido"""
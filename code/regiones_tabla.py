@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Detección de las regiones de productos de una tabla
+Deja afuera calculadoras, presupuestos y avisos embebidos en la hoja (apagada por defecto)
+"""
+
+import re
+from collections import Counter
+
+# Filas ancla mínimas para considerar una columna de códigos o una región
+MIN_FILAS_REGION = 3
+
+# Fracción mínima de las filas con texto de la tabla que deben ser ancla
+COBERTURA_MINIMA = 0.2
+
+# Una columna es de códigos si tiene al menos esta fracción de los códigos de la principal
+FRACCION_COLUMNA_CODIGO = 0.15
+
+# Filas sin código admitidas dentro de una región
+MAX_HUECO = 5
+
+# Una columna es habitual si la completan al menos esta fracción de las filas ancla
+FRACCION_COLUMNA_HABITUAL = 0.5
+
+PATRON_FORMA_CODIGO = re.compile(r'^(?=[^\d]{0,4}\d)[A-Za-z0-9][A-Za-z0-9./-]{0,14}$')
+PATRON_LETRAS = re.compile(r'[^\W\d_]{2}')
+
+PALABRAS_ENCABEZADO = (
+    'CODIGO', 'CÓDIGO', 'COD.', 'ARTICULO', 'ARTÍCULO', 'DESCRIPCION', 'DESCRIPCIÓN', 'DETALLE',
+    'PRODUCTO', 'PRECIO', 'COSTO', 'SUBTOTAL', 'FINAL', 'LITROS', 'PROVEEDOR', 'MARCA', 'STOCK',
+    'UNIDAD', 'IVA', 'PUBLICO', 'PÚBLICO'
+)
+
+
+# Filas omitidas por estar fuera de las regiones de productos (acumulado del proceso)
+ESTADISTICAS_REGIONES = {
+    'tablas_con_regiones': 0,
+    'filas_fuera_de_region': 0,
+}
+
+
+# Detección de regiones en este proceso (apagada: se clasifican todas las filas)
+_CONFIGURACION_REGIONES = {'detectar': False}
+
+
+def configurar_regiones(detectar=False):
+    """Activa o apaga la detección de regiones en este proceso"""
+    _CONFIGURACION_REGIONES['detectar'] = detectar
+
+
+def regiones_activas():
+    """Valor vigente de configurar_regiones (para repetirlo en los procesos worker)"""
+    return _CONFIGURACION_REGIONES['detectar']
+
+
+def estadisticas_regiones():
+    """Copia de los contadores de regiones (para calcular diferencias antes/después)"""
+    return dict(ESTADISTICAS_REGIONES)
+
+
+def tiene_forma_de_codigo(valor):
+    """Token corto sin espacios con un dígito (no un precio con coma ni un porcentaje)"""
+    if type(valor) is not str:
+        return type(valor) is int and valor >= 0
+    return PATRON_FORMA_CODIGO.match(valor) is not None
+
+
+def rasgos_de_fila(fila):
+    """
+    Lo que la detección necesita de una fila: (columnas con forma de código,
+    o None si la fila no tiene texto; columnas completas; si es una fila de
+    encabezado). Son tuplas chicas, así los rangos de una hoja repartida
+    entre procesos pueden devolverlas y las regiones se detectan una vez
+    sobre la tabla completa.
+    """
+    codigos = []
+    completas = []
+    texto = False
+    codigo_valido = PATRON_FORMA_CODIGO.match
+    letras = PATRON_LETRAS.search
+    for j, valor in enumerate(fila):
+        if valor == '' or valor is None:
+            continue
+        completas.append(j)
+        if type(valor) is str:
+            # Un código no tiene espacios ni comas: descripciones y precios no pasan por el patrón
+            if ' ' not in valor and ',' not in valor and codigo_valido(valor):
+                codigos.append(j)
+            elif not texto and letras(valor):
+                texto = True
+        elif type(valor) is int and valor >= 0:
+            codigos.append(j)
+
+    # Encabezado: dos títulos de columna y ningún código (en los bloques lado a
+    # lado un producto puede compartir la fila con el encabezado del vecino)
+    encabezado = texto and not codigos and sum(
+        1 for valor in fila if type(valor) is str and valor.upper().startswith(PALABRAS_ENCABEZADO)
+    ) >= 2
+    return (tuple(codigos) if texto else None), tuple(completas), encabezado
+
+
+def _es_compatible(rasgos, habituales):
+    """Fila sin código con texto y con datos sólo en columnas habituales de las filas ancla"""
+    codigos, completas, _ = rasgos
+    return codigos is not None and len(completas) >= 2 and habituales.issuperset(completas)
+
+
+def detectar_regiones(rasgos):
+    """
+    Regiones de productos de una tabla (rasgos_de_fila de cada fila) como
+    rangos [inicio, fin) de índices de filas, o None si la tabla no tiene
+    una columna de códigos definida (en ese caso se procesa completa)
+    """
+    # Las filas de una lista repiten unos pocos rasgos: se cuentan y se clasifican una vez por rasgos distintos
+    distintos = Counter(rasgos)
+    con_texto = sum(cantidad for (codigos, _, _), cantidad in distintos.items() if codigos is not None)
+    conteo = Counter()
+    for (codigos, _, _), cantidad in distintos.items():
+        if codigos:
+            for j in codigos:
+                conteo[j] += cantidad
+    if not conteo:
+        return None
+
+    maximo = max(conteo.values())
+    minimo = max(MIN_FILAS_REGION, maximo * FRACCION_COLUMNA_CODIGO)
+    columnas_codigo = {j for j, cantidad in conteo.items() if cantidad >= minimo}
+
+    anclas = {rasgos_fila for rasgos_fila in distintos
+              if rasgos_fila[0] and not columnas_codigo.isdisjoint(rasgos_fila[0])}
+    total_anclas = sum(distintos[rasgos_fila] for rasgos_fila in anclas)
+    if total_anclas < MIN_FILAS_REGION or total_anclas < con_texto * COBERTURA_MINIMA:
+        return None
+
+    completas = Counter()
+    for rasgos_fila in anclas:
+        for j in rasgos_fila[1]:
+            completas[j] += distintos[rasgos_fila]
+    habituales = {j for j, cantidad in completas.items() if cantidad >= total_anclas * FRACCION_COLUMNA_HABITUAL}
+    # True: fila ancla, False: fila compatible, None: fuera de las regiones
+    clases = {rasgos_fila: True if rasgos_fila in anclas else (False if _es_compatible(rasgos_fila, habituales)
+                                                                else None)
+              for rasgos_fila in distintos}
+
+    regiones = []
+    inicio = anterior = None
+    cantidad = 0
+    for i, rasgos_fila in enumerate(rasgos):
+        es_ancla = clases[rasgos_fila]
+        if es_ancla is None:
+            continue
+        if inicio is not None and i - anterior - 1 > MAX_HUECO:
+            if cantidad >= MIN_FILAS_REGION:
+                regiones.append((inicio, anterior + 1))
+            inicio = None
+        if inicio is None:
+            if not es_ancla:
+                continue  # Las filas compatibles no inician una región
+            inicio, cantidad = i, 0
+        anterior = i
+        cantidad += es_ancla
+    if inicio is not None and cantidad >= MIN_FILAS_REGION:
+        regiones.append((inicio, anterior + 1))
+
+    return regiones or None
+
+
+def rasgos_de_filas(filas_datos):
+    """rasgos_de_fila de cada fila, o None por fila si la detección está apagada"""
+    if not _CONFIGURACION_REGIONES['detectar']:
+        return [None] * len(filas_datos)
+    return [rasgos_de_fila(fila_datos) for fila_datos in filas_datos]
+
+
+def filas_a_clasificar(rasgos):
+    """indices_de_productos de los rasgos_de_filas de una tabla, o todas sus filas si la detección está apagada"""
+    if not _CONFIGURACION_REGIONES['detectar']:
+        return range(len(rasgos))
+    return indices_de_productos(rasgos)
+
+
+def indices_de_productos(rasgos):
+    """
+    Índices de las filas a clasificar: las de las regiones de productos sin
+    los encabezados repetidos, o todas si la tabla no tiene regiones
+    """
+    regiones = detectar_regiones(rasgos)
+    if regiones is None:
+        return range(len(rasgos))
+
+    indices = [i for inicio, fin in regiones for i in range(inicio, fin) if not rasgos[i][2]]
+    ESTADISTICAS_REGIONES['tablas_con_regiones'] += 1
+    ESTADISTICAS_REGIONES['filas_fuera_de_region'] += len(rasgos) - len(indices)
+    return indices
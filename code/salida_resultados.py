@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Escritura y lectura de los resultados de extraer_datos_html (JSON histórico, NDJSON y compacto)
+"""
+
+import json
+import os
+from itertools import islice
+
+from tabla_productos import convertir_para_json
+
+EXTENSION_NDJSON = '.ndjson'
+SUFIJO_ENCABEZADO = '.meta.json'
+VERSION_FORMATO = 1
+
+CAMPOS_OMITIDOS_COMPACTO = ('fila_completa',)
+
+
+def es_salida_ndjson(ruta):
+    """Indica si la ruta es un resultado NDJSON (el .ndjson o su encabezado)"""
+    ruta = ruta.lower()
+    return ruta.endswith(EXTENSION_NDJSON) or ruta.endswith(SUFIJO_ENCABEZADO)
+
+
+def rutas_ndjson(ruta):
+    """(ruta del .ndjson, ruta del encabezado) a partir de cualquiera de las dos"""
+    if ruta.lower().endswith(SUFIJO_ENCABEZADO):
+        base = ruta[:-len(SUFIJO_ENCABEZADO)]
+    else:
+        base = os.path.splitext(ruta)[0]
+    return base + EXTENSION_NDJSON, base + SUFIJO_ENCABEZADO
+
+
+def indice_hoja(datos_hoja, inicio):
+    """Datos de la hoja sin sus productos, con su posición en la lista plana"""
+    indice = {clave: valor for clave, valor in datos_hoja.items() if clave != 'productos'}
+    indice['inicio'] = inicio
+    indice['total_productos'] = len(datos_hoja['productos'])
+    return indice
+
+
+def _encabezado(resultado, hojas, formato, compacto):
+    encabezado = {clave: valor for clave, valor in resultado.items() if clave not in ('productos', 'hojas')}
+    encabezado['formato'] = {'tipo': formato, 'version': VERSION_FORMATO, 'compacto': compacto}
+    encabezado['hojas'] = hojas
+    return encabezado
+
+
+class EscritorNDJSON:
+    """Escribe los productos de cada hoja apenas se extrae y el encabezado al final"""
+
+    def __init__(self, ruta, compacto=False):
+        self.ruta, self.ruta_encabezado = rutas_ndjson(ruta)
+        self.compacto = compacto
+        self.omitir = CAMPOS_OMITIDOS_COMPACTO if compacto else ()
+        self.hojas = []
+        self.total_productos = 0
+        self.completo = False
+        self.archivo = open(self.ruta, 'w', encoding='utf-8')
+
+    def escribir_hoja(self, datos_hoja):
+        """Agrega los productos de una hoja (una línea JSON por producto)"""
+        self.hojas.append(indice_hoja(datos_hoja, self.total_productos))
+        for producto in datos_hoja['productos']:
+            if self.omitir:
+                producto = {clave: valor for clave, valor in producto.items() if clave not in self.omitir}
+            self.archivo.write(json.dumps(producto, ensure_ascii=False, separators=(',', ':')))
+            self.archivo.write('\n')
+        self.total_productos += len(datos_hoja['productos'])
+        self.archivo.flush()
+
+    def cerrar(self, resultado=None):
+        """Cierra el .ndjson y, si hay resultado, escribe el encabezado"""
+        if not self.archivo.closed:
+            self.archivo.close()
+        if resultado is not None:
+            with open(self.ruta_encabezado, 'w', encoding='utf-8') as f:
+                json.dump(_encabezado(resultado, self.hojas, 'ndjson', self.compacto), f,
+                          ensure_ascii=False, indent=2)
+            self.completo = True
+
+    def descartar(self):
+        """Cierra y borra un .ndjson que quedó sin encabezado (extracción fallida)"""
+        self.cerrar()
+        if not self.completo and os.path.exists(self.ruta):
+            os.remove(self.ruta)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        self.descartar()
+
+
+def escribir_json(resultado, ruta, compacto=False):
+    """Guarda el resultado completo en un único archivo JSON"""
+    with open(ruta, 'w', encoding='utf-8') as f:
+        if not compacto:
+            json.dump(resultado, f, ensure_ascii=False, indent=2, default=convertir_para_json)
+            return
+
+        hojas = []
+        inicio = 0
+        for datos_hoja in resultado['hojas']:
+            hojas.append(indice_hoja(datos_hoja, inicio))
+            inicio += len(datos_hoja['productos'])
+
+        salida = _encabezado(resultado, hojas, 'json', True)
+        productos = resultado['productos']
+        if hasattr(productos, 'para_json'):
+            salida['productos'] = productos.para_json(CAMPOS_OMITIDOS_COMPACTO)
+        else:
+            salida['productos'] = [
+                {clave: valor for clave, valor in producto.items() if clave not in CAMPOS_OMITIDOS_COMPACTO}
+                for producto in productos
+            ]
+        json.dump(salida, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def leer_encabezado(ruta):
+    """
+    Metadatos de un resultado sin sus productos. Para NDJSON sólo lee el
+    encabezado; un JSON se carga completo y se le quita 'productos'.
+    """
+    if es_salida_ndjson(ruta):
+        with open(rutas_ndjson(ruta)[1], 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    with open(ruta, 'r', encoding='utf-8') as f:
+        datos = json.load(f)
+    datos.pop('productos', None)
+    for hoja in datos.get('hojas', []):
+        productos = hoja.pop('productos', None)
+        if productos is not None:
+            hoja.setdefault('total_productos', len(productos))
+    return datos
+
+
+def iterar_productos(ruta):
+    """Genera los productos de un resultado (NDJSON línea por línea)"""
+    if es_salida_ndjson(ruta):
+        with open(rutas_ndjson(ruta)[0], 'r', encoding='utf-8') as f:
+            for linea in f:
+                if linea.strip():
+                    yield json.loads(linea)
+        return
+
+    with open(ruta, 'r', encoding='utf-8') as f:
+        datos = json.load(f)
+    if 'productos' in datos:
+        yield from datos['productos']
+    else:
+        for hoja in datos.get('hojas', []):
+            yield from hoja.get('productos', [])
+
+
+def iterar_hojas(ruta):
+    """
+    Genera (hoja, productos) en orden, donde hoja son los datos de la hoja
+    sin productos y productos un iterador que se debe consumir antes de
+    pasar a la hoja siguiente
+    """
+    if not es_salida_ndjson(ruta):
+        with open(ruta, 'r', encoding='utf-8') as f:
+            yield from hojas_de_resultado(json.load(f))
+        return
+
+    encabezado = leer_encabezado(ruta)
+    productos = iterar_productos(ruta)
+    for hoja in encabezado.get('hojas', []):
+        yield hoja, islice(productos, hoja['total_productos'])
+
+
+def hojas_de_resultado(datos):
+    """(hoja, productos) de un resultado en memoria, con o sin productos dentro de cada hoja"""
+    productos = datos.get('productos', [])
+    for hoja in datos.get('hojas', []):
+        if 'productos' in hoja:
+            productos_hoja = hoja['productos']
+            hoja = {clave: valor for clave, valor in hoja.items() if clave != 'productos'}
+            yield hoja, iter(productos_hoja)
+        elif 'inicio' in hoja:
+            yield hoja, iter(productos[hoja['inicio']:hoja['inicio'] + hoja['total_productos']])
+
+
+def cargar_resultado(ruta):
+    """Resultado completo en el formato histórico (hojas con sus productos)"""
+    if es_salida_ndjson(ruta):
+        datos = leer_encabezado(ruta)
+        hojas_con_productos = iterar_hojas(ruta)
+    else:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+        if 'formato' not in datos:
+            return datos  # JSON histórico: ya tiene los productos en cada hoja
+        hojas_con_productos = hojas_de_resultado(datos)
+
+    hojas = []
+    productos = []
+    for hoja, productos_hoja in hojas_con_productos:
+        hoja = {clave: valor for clave, valor in hoja.items() if clave != 'inicio'}
+        hoja['productos'] = list(productos_hoja)
+        productos.extend(hoja['productos'])
+        hojas.append(hoja)
+    datos.pop('formato', None)
+    datos['hojas'] = hojas
+    datos['productos'] = productos
+    return datos
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tabla columnar de productos
+Columnas tipadas y codificadas en lugar de un dict por producto, con vistas de sólo lectura y DataFrame sin copia
+"""
+
+import math
+import sys
+from array import array
+from collections.abc import Sequence
+
+TIPOS_PRECIO = ('base', 'sin_iva', 'sin_iva_ofertas', 'costo_final', 'publico')
+
+# Orden en que procesar_fila_inteligente_v2 elige el precio principal (legacy)
+PRIORIDAD_PRECIO_PRINCIPAL = ('publico', 'costo_final', 'sin_iva', 'base')
+
+CAMPOS_CONOCIDOS = (
+    'codigo', 'descripcion', 'precios_estructurados', 'iva', 'medida',
+    'fila_completa', 'precio', 'proveedor', 'hoja', 'categoria'
+)
+
+IVA_AUSENTE = -1
+
+
+def _internar(valor):
+    return sys.intern(valor) if type(valor) is str else valor
+
+
+class ColumnaCategorica:
+    """Columna codificada con diccionario: valores distintos + códigos enteros"""
+
+    # Tipo de array según la cantidad de categorías (los mismos cortes que
+    # usa pandas para los códigos de un Categorical, así no se copian)
+    LIMITES_TIPO = ((127, 'b'), (32767, 'h'), (2147483647, 'i'))
+
+    def __init__(self):
+        self.valores = []
+        self.indices = {}
+        self.codigos = array('b')
+
+    def agregar(self, valor):
+        if valor is None:
+            self.codigos.append(-1)
+            return
+
+        codigo = self.indices.get(valor)
+        if codigo is None:
+            codigo = len(self.valores)
+            self.valores.append(_internar(valor))
+            self.indices[valor] = codigo
+            self._ajustar_tipo()
+        self.codigos.append(codigo)
+
+    def __getitem__(self, indice):
+        codigo = self.codigos[indice]
+        return None if codigo < 0 else self.valores[codigo]
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def _ajustar_tipo(self):
+        for limite, tipo in self.LIMITES_TIPO:
+            if len(self.valores) < limite:
+                break
+        if tipo != self.codigos.typecode:
+            self.codigos = array(tipo, self.codigos)
+
+    def a_categorical(self, inicio=0, fin=None):
+        import numpy as np
+        import pandas as pd
+        codigos = np.frombuffer(self.codigos, dtype=self.codigos.typecode)[inicio:fin]
+        return pd.Categorical.from_codes(codigos, categories=self.valores)
+
+
+class TablaProductos:
+    """Productos en columnas compactas, en orden de extracción"""
+
+    def __init__(self):
+        self.codigo = []
+        self.descripcion = []
+        self.fila_completa = []
+        self.precios = {tipo: array('d') for tipo in TIPOS_PRECIO}
+        self.iva = array('b')
+        self.medida = ColumnaCategorica()
+        self.proveedor = ColumnaCategorica()
+        self.hoja = ColumnaCategorica()
+        self.categoria = ColumnaCategorica()
+        # Orden de las claves de cada producto y de sus precios estructurados
+        # (hay muy pocas combinaciones distintas, se codifican igual que las categorías)
+        self.claves = ColumnaCategorica()
+        self.orden_precios = ColumnaCategorica()
+        # Valores que no entran en las columnas tipadas: {indice: {campo: valor}}
+        self.excepciones = {}
+
+    def __len__(self):
+        return len(self.descripcion)
+
+    @classmethod
+    def desde_productos(cls, productos):
+        """Arma una tabla a partir de dicts de producto"""
+        tabla = cls()
+        tabla.extender(productos)
+        return tabla
+
+    def extender(self, productos):
+        for producto in productos:
+            self.agregar(producto)
+
+    def agregar(self, producto):
+        """Agrega un producto (dict con el formato de procesar_fila_inteligente_v2)"""
+        excepciones = {}
+
+        self.claves.agregar(tuple(producto))
+        self.codigo.append(_internar(producto.get('codigo')))
+        self.descripcion.append(_internar(producto.get('descripcion')))
+
+        fila = producto.get('fila_completa')
+        if type(fila) is list:
+            self.fila_completa.append(tuple(_internar(celda) for celda in fila))
+        else:
+            self.fila_completa.append(None)
+            if fila is not None:
+                excepciones['fila_completa'] = fila
+
+        precios = producto.get('precios_estructurados')
+        if type(precios) is dict and all(tipo in self.precios for tipo in precios):
+            self.orden_precios.agregar(tuple(precios))
+            for tipo, columna in self.precios.items():
+                valor = precios.get(tipo)
+                if type(valor) is float and valor == valor:
+                    columna.append(valor)
+                else:
+                    # Precio que no es un float (p. ej. '16.729.55'): se guarda tal cual
+                    columna.append(math.nan)
+                    if tipo in precios:
+                        excepciones.setdefault('precios_texto', {})[tipo] = valor
+        else:
+            self.orden_precios.agregar(None)
+            for columna in self.precios.values():
+                columna.append(math.nan)
+            excepciones['precios_estructurados'] = precios
+
+        iva = producto.get('iva')
+        if type(iva) is str and iva.isdigit() and str(int(iva)) == iva and int(iva) <= 100:
+            self.iva.append(int(iva))
+        else:
+            self.iva.append(IVA_AUSENTE)
+            if iva is not None:
+                excepciones['iva'] = iva
+
+        self.medida.agregar(producto.get('medida'))
+        self.proveedor.agregar(producto.get('proveedor'))
+        self.hoja.agregar(producto.get('hoja'))
+        self.categoria.agregar(producto.get('categoria'))
+
+        # El precio principal se deriva de los estructurados; guardar sólo si difiere
+        if 'precio' in producto and producto['precio'] != self._precio_principal(len(self) - 1, excepciones):
+            excepciones['precio'] = producto['precio']
+
+        extras = {campo: valor for campo, valor in producto.items() if campo not in CAMPOS_CONOCIDOS}
+        if extras:
+            excepciones['extras'] = extras
+
+        if excepciones:
+            self.excepciones[len(self) - 1] = excepciones
+
+    def precios_de(self, indice, excepciones=None):
+        """precios_estructurados del producto, con sus claves en el orden original"""
+        excepciones = self.excepciones.get(indice, {}) if excepciones is None else excepciones
+        if 'precios_estructurados' in excepciones:
+            return excepciones['precios_estructurados']
+
+        precios_texto = excepciones.get('precios_texto', {})
+        return {
+            tipo: precios_texto[tipo] if tipo in precios_texto else self.precios[tipo][indice]
+            for tipo in self.orden_precios[indice]
+        }
+
+    def _precio_principal(self, indice, excepciones):
+        """El primer precio no vacío según la prioridad legacy"""
+        precios = self.precios_de(indice, excepciones)
+        if type(precios) is dict:
+            for tipo in PRIORIDAD_PRECIO_PRINCIPAL:
+                if precios.get(tipo):
+                    return precios[tipo]
+        return None
+
+    def producto(self, indice, omitir=()):
+        """
+        Arma el dict del producto con las mismas claves y el mismo orden que
+        el extractor (sin los campos de omitir)
+        """
+        if indice < 0:
+            indice += len(self)
+        excepciones = self.excepciones.get(indice, {})
+        valores = {}
+
+        for campo in self.claves[indice]:
+            if campo in omitir:
+                continue
+            elif campo == 'codigo':
+                valores[campo] = self.codigo[indice]
+            elif campo == 'descripcion':
+                valores[campo] = self.descripcion[indice]
+            elif campo == 'precios_estructurados':
+                valores[campo] = self.precios_de(indice, excepciones)
+            elif campo == 'iva':
+                iva = self.iva[indice]
+                valores[campo] = excepciones.get('iva') if iva == IVA_AUSENTE else str(iva)
+            elif campo == 'fila_completa':
+                fila = self.fila_completa[indice]
+                valores[campo] = list(fila) if fila is not None else excepciones.get('fila_completa')
+            elif campo == 'precio':
+                if 'precio' in excepciones:
+                    valores[campo] = excepciones['precio']
+                else:
+                    valores[campo] = self._precio_principal(indice, excepciones)
+            elif campo in CAMPOS_CONOCIDOS:
+                valores[campo] = getattr(self, campo)[indice]
+            else:
+                valores[campo] = excepciones['extras'][campo]
+        return valores
+
+    def vista(self, inicio=0, fin=None):
+        """Secuencia de sólo lectura con los productos del rango"""
+        return VistaProductos(self, inicio, len(self) if fin is None else fin)
+
+    def a_dataframe(self, inicio=0, fin=None):
+        """
+        DataFrame con una fila por producto. Precios (precio_<tipo>) e IVA
+        comparten memoria con la tabla; proveedor, hoja, categoría y medida
+        son Categorical sobre los códigos de la tabla.
+        """
+        import numpy as np
+        import pandas as pd
+
+        fin = len(self) if fin is None else fin
+        iva = np.frombuffer(self.iva, dtype=np.int8)[inicio:fin]
+
+        columnas = {
+            'codigo': np.array(self.codigo[inicio:fin], dtype=object),
+            'descripcion': np.array(self.descripcion[inicio:fin], dtype=object),
+        }
+        for tipo, columna in self.precios.items():
+            columnas[f'precio_{tipo}'] = np.frombuffer(columna, dtype=np.float64)[inicio:fin]
+        columnas['iva'] = pd.arrays.IntegerArray(iva, iva == IVA_AUSENTE)
+        columnas['medida'] = self.medida.a_categorical(inicio, fin)
+        columnas['proveedor'] = self.proveedor.a_categorical(inicio, fin)
+        columnas['hoja'] = self.hoja.a_categorical(inicio, fin)
+        columnas['categoria'] = self.categoria.a_categorical(inicio, fin)
+
+        return pd.DataFrame(columnas, copy=False)
+
+
+class VistaProductos(Sequence):
+    """Rango de una TablaProductos visto como una lista de dicts de producto"""
+
+    def __init__(self, tabla, inicio, fin):
+        self.tabla = tabla
+        self.inicio = inicio
+        self.fin = fin
+
+    def __len__(self):
+        return self.fin - self.inicio
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self.tabla.producto(self.inicio + i) for i in range(*indice.indices(len(self)))]
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError('índice de producto fuera de rango')
+        return self.tabla.producto(self.inicio + indice)
+
+    def __iter__(self):
+        for indice in range(self.inicio, self.fin):
+            yield self.tabla.producto(indice)
+
+    def __eq__(self, otra):
+        if isinstance(otra, (VistaProductos, list)):
+            return len(self) == len(otra) and all(a == b for a, b in zip(self, otra))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"VistaProductos({len(self)} productos)"
+
+    def a_lista(self, omitir=()):
+        """Materializa los dicts de producto (sin los campos de omitir)"""
+        return [self.tabla.producto(indice, omitir) for indice in range(self.inicio, self.fin)]
+
+    def para_json(self, omitir=()):
+        """Productos a serializar con json.dump (sin los campos de omitir)"""
+        return self.a_lista(omitir)
+
+    def a_dataframe(self):
+        return self.tabla.a_dataframe(self.inicio, self.fin)
+
+
+def convertir_para_json(objeto):
+    """Para json.dump(default=...): serializa las vistas como listas de productos"""
+    if isinstance(objeto, VistaProductos):
+        return objeto.para_json()
+    raise TypeError(f"Object of type {type(objeto).__name__} is not JSON serializable")
+
+
+def productos_a_dataframe(productos):
+    """DataFrame columnar de una VistaProductos o de una lista de dicts (p. ej. leída de JSON)"""
+    if isinstance(productos, VistaProductos):
+        return productos.a_dataframe()
+    return TablaProductos.desde_productos(productos).a_dataframe()
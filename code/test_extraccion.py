@@ -5,6 +5,7 @@ Script de prueba de la extracción corregida
 
 from extraer_datos import extraer_datos_html
 import json
+from tabla_productos import convertir_para_json
 
 def test_extraccion():
     print("🧪 PROBANDO EXTRACCIÓN DE DATOS")
@@ -42,7 +43,7 @@ def test_extraccion():
             
             # Guardar resultado para verificación
             with open('test_extraccion_resultado.json', 'w', encoding='utf-8') as f:
-                json.dump(resultado, f, ensure_ascii=False, indent=2)
+                json.dump(resultado, f, ensure_ascii=False, indent=2, default=convertir_para_json)
             
             print(f"\n💾 Resultado guardado en 'test_extraccion_resultado.json'")
             
@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas del extractor de datos (extraer_datos_html)
+Usan el libro de prueba de conftest.py (copias de hojas chicas de html/)
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from cache_extraccion import CacheExtraccion
+from clasificador_celdas import PATRONES_IRRELEVANTES, ClasificadorCeldas
+from conversion_precios import Separadores, convertir_precios, separadores_de_hoja
+import esquemas_tabla
+from estilos_libro import leer_estilos, tipo_de_formato, tipos_celdas_de_hoja
+from extraer_datos import (VERSION_EXTRACTOR, HojaPorRangos, detectar_nombre_desde_contenido, extraer_datos_html,
+                           extraer_productos_de_archivo, extraer_productos_de_filas,
+                           extraer_productos_de_filas_por_lotes, normalizar_precio_avanzado, version_extraccion)
+from lector_html import contar_filas, dividir_en_rangos_de_filas, iterar_filas_tablas, leer_bloques, leer_documento
+import lote_libros
+from manifiesto_libro import cargar_manifiesto
+from memoria_acotada import ProductosEnDisco
+from regiones_tabla import configurar_regiones, detectar_regiones, indices_de_productos, rasgos_de_fila
+from puntos_control import PuntosControl
+from salida_resultados import cargar_resultado, leer_encabezado
+from tabla_productos import TablaProductos
+from vigilar_carpeta import VigilanteCarpeta
+from vista_previa import MUESTRA, SIN_TIEMPO, vista_previa_hoja, vista_previa_libro
+
+DIRECTORIO_HTML = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'html')
+
+
+def sin_fechas(resultado):
+    """Quita los campos que dependen del momento de ejecución"""
+    resultado = dict(resultado)
+    resultado.pop('fecha_procesamiento')
+    resultado['metadata'] = dict(resultado['metadata'])
+    resultado['metadata'].pop('fecha_purificacion')
+    return resultado
+
+
+def test_paralelo_igual_a_secuencial(libro_prueba):
+    """Con workers > 1 el resultado es idéntico al secuencial"""
+    libro = libro_prueba()
+    secuencial, _ = libro.extraer('serial.json', usar_cache=False)
+    paralelo, _ = libro.extraer('paralelo.json', workers=3, usar_cache=False)
+
+    assert secuencial['productos']
+    assert sin_fechas(paralelo) == sin_fechas(secuencial)
+    assert list(paralelo['metadata']['productos_por_hoja']) == list(secuencial['metadata']['productos_por_hoja'])
+
+
+def test_errores_por_hoja_en_resultado(libro_prueba):
+    """Una hoja que falla queda registrada en 'errores' sin cortar el resto"""
+    libro = libro_prueba()
+    os.mkdir(libro.ruta('sheet000.htm'))  # No se puede abrir como archivo
+
+    resultado, _ = libro.extraer('salida.json', workers=2, usar_cache=False)
+
+    assert [error['archivo'] for error in resultado['errores']] == ['sheet000.htm']
+    assert resultado['resumen']['total_hojas'] > 0
+
+
+def test_cache_reutiliza_hojas_sin_cambios(libro_prueba, tmp_path):
+    """Una segunda corrida toma todas las hojas de la cache con el mismo resultado"""
+    libro = libro_prueba()
+    directorio_cache = str(tmp_path / 'cache_libro')
+
+    frio, _ = libro.extraer('frio.json', directorio_cache=directorio_cache)
+    cache = CacheExtraccion(VERSION_EXTRACTOR, directorio_cache)
+    claves = [cache.calcular_clave(libro.ruta(f'sheet{i:03d}.htm')) for i in range(1, len(libro.hojas) + 1)]
+    assert all(cache.obtener(clave) is not None for clave in claves)
+
+    caliente, _ = libro.extraer('caliente.json', directorio_cache=directorio_cache)
+    assert sin_fechas(caliente) == sin_fechas(frio)
+
+
+def test_cache_expulsa_entradas_menos_usadas(tmp_path):
+    """Al superar el tamaño máximo se eliminan primero las entradas más viejas"""
+    directorio_cache = str(tmp_path / 'cache_lru')
+    cache = CacheExtraccion('test', directorio_cache, tamano_maximo_mb=0.002)  # ~2 KB
+    datos = {'productos': ['x' * 900], 'proveedor': 'YAYI'}
+
+    cache.guardar('a', datos)
+    cache.guardar('b', datos)
+    os.utime(os.path.join(directorio_cache, 'a.json'), (0, 0))
+    os.utime(os.path.join(directorio_cache, 'b.json'), (1, 1))
+    assert cache.obtener('a') == datos  # 'a' pasa a ser la más reciente
+
+    cache.guardar('c', datos)
+    assert sorted(os.listdir(directorio_cache)) == ['a.json', 'c.json']
+    assert cache.estadisticas() == {'aciertos': 1, 'fallos': 0}
+
+
+def test_nombre_de_hoja_desde_titulo_encabezados_y_primeras_celdas(tmp_path):
+    """Como con BeautifulSoup: el título, los h1-h6 y las primeras 3x3 celdas de las primeras 2 tablas"""
+    def nombre(cuerpo, titulo=''):
+        ruta = tmp_path / 'sheet001.htm'
+        ruta.write_text(f'<html><head>{titulo}</head><body>{cuerpo}</body></html>', encoding='utf-8')
+        return detectar_nombre_desde_contenido(str(ruta))
+
+    fila = '<tr><td>1</td><td>TORNILLO</td><td>$ 10,00</td><td>{}</td></tr>'
+    tabla = '<table>' + fila.format('') * 3 + fila.format('PUMA') + '</table>'
+    assert nombre(tabla) is None
+    assert nombre('<h2>Lista BABUSI</h2>' + tabla) == 'BABUSI'
+    assert nombre(tabla + '<table><tr><td></td><td>DAFYS</td></tr></table>') == 'DAFYS'
+    assert nombre('<h2>Lista BABUSI</h2>' + tabla, '<title>ANCAIG</title>') == 'ANCAIG'
+
+
+def test_clasificador_alternativa_unica_equivale_a_patrones():
+    """La alternativa combinada descarta las mismas celdas que los patrones por separado"""
+    clasificador = ClasificadorCeldas(normalizar_precio_avanzado)
+    ruta = os.path.join(DIRECTORIO_HTML, 'YAYI FULL - 3 FEBRERO_archivos', 'sheet004.htm')
+    celdas = [celda.strip() for _, fila in iterar_filas_tablas(leer_bloques(ruta)) for celda in fila]
+
+    for celda in celdas:
+        esperado = any(re.search(patron, celda, re.IGNORECASE) for patron in PATRONES_IRRELEVANTES)
+        assert bool(clasificador.patron_irrelevante.search(celda)) == esperado, celda
+
+    for celda in celdas:
+        clasificador.clasificar(celda)
+    estadisticas = clasificador.estadisticas()
+    assert estadisticas['consultas'] == len(celdas)
+    assert estadisticas['aciertos'] == len(celdas) - len(set(celdas))
+
+
+def test_manifiesto_lee_pestanas_del_frameset():
+    """Las hojas se exponen con el nombre real de la pestaña y se parsean recién al pedirlas"""
+    manifiesto = cargar_manifiesto(os.path.join(DIRECTORIO_HTML, 'YAYI FULL - 3 FEBRERO_archivos'))
+
+    assert manifiesto.origen == 'frameset'
+    assert manifiesto.nombres() == ['OFERTAS Y CAMBIOS', 'COTIZADORA PLANILLA CORTA YAYI',
+                                    'COTIZADORA PLANILLA LARGA YAYI', 'COMPARTIVAS']
+    assert not manifiesto['BASE'].existe
+
+    hoja = manifiesto['COMPARTIVAS']
+    assert hoja.archivo == 'sheet006.htm' and not hoja.extraida
+    assert hoja.extraer()['productos'] and hoja.extraida
+    assert not any(otra.extraida for otra in manifiesto if otra is not hoja)
+
+
+def test_extraer_solo_hojas_seleccionadas(libro_prueba):
+    """Con hojas= sólo se procesan esas hojas, con el mismo nombre que en la corrida completa"""
+    libro = libro_prueba()
+    completo, _ = libro.extraer('completo.json', usar_cache=False)
+    parcial, _ = libro.extraer('parcial.json', usar_cache=False, hojas=['sheet002.htm', 'sheet004.htm'])
+
+    esperadas = [hoja for hoja in completo['hojas'] if hoja['archivo'] in ('sheet002.htm', 'sheet004.htm')]
+    assert parcial['hojas'] == esperadas
+
+
+def test_libro_xlsx_conserva_numeros_nativos(tmp_path):
+    """Un .xlsx se lee por streaming con la misma clasificación y precios numéricos"""
+    from openpyxl import Workbook
+
+    libro = Workbook()
+    hoja = libro.active
+    hoja.title = 'LISTA YAYI'
+    hoja.append(['CODIGO', 'DESCRIPCION', 'IVA', 'PRECIO PUBLICO'])
+    hoja.append([7700123, 'CAÑO ALUMINIO GAS 3/8', 21, 16729.55])
+    hoja.append([7700124, 'CAÑO COBRE GAS 5/16', 21, 0])
+    ruta_libro = str(tmp_path / 'lista.xlsx')
+    libro.save(ruta_libro)
+
+    resultado, _ = extraer_datos_html(ruta_libro, str(tmp_path / 'salida.json'), usar_cache=False)
+
+    productos = {producto['codigo']: producto for producto in resultado['productos']}
+    assert productos['7700123']['descripcion'] == 'CAÑO ALUMINIO GAS 3/8'
+    assert productos['7700123']['precios_estructurados'] == {'publico': 16729.55}
+    assert productos['7700123']['iva'] == '21'
+    assert productos['7700124']['precios_estructurados'] == {}
+    assert resultado['hojas'][0]['pestana'] == 'LISTA YAYI'
+    assert resultado['proveedor_principal'] == 'YAYI'
+
+
+def test_tabla_productos_equivale_a_dicts_y_comparte_memoria(libro_prueba):
+    """La tabla columnar reproduce los dicts del JSON y el DataFrame usa sus arreglos sin copiar"""
+    resultado, archivo = libro_prueba().extraer('salida.json', usar_cache=False)
+    with open(archivo, encoding='utf-8') as f:
+        guardado = json.load(f)
+
+    assert resultado['productos'] == guardado['productos']
+    assert [list(hoja['productos']) for hoja in resultado['hojas']] == \
+        [hoja['productos'] for hoja in guardado['hojas']]
+    # Las hojas son rangos de la misma tabla que la lista plana
+    assert all(hoja['productos'].tabla is resultado['productos'].tabla for hoja in resultado['hojas'])
+
+    tabla = TablaProductos.desde_productos(guardado['productos'])
+    assert tabla.vista() == guardado['productos']
+
+    df = tabla.a_dataframe()
+    assert len(df) == len(guardado['productos'])
+    assert np.shares_memory(df['precio_costo_final'].to_numpy(), np.frombuffer(tabla.precios['costo_final']))
+    assert np.shares_memory(df['proveedor'].array.codes, np.frombuffer(tabla.proveedor.codigos, dtype=np.int8))
+    assert set(df['proveedor'].cat.categories) == {producto['proveedor'] for producto in guardado['productos']}
+
+
+def test_salida_ndjson_y_compacta_equivalen_al_json(libro_prueba):
+    """NDJSON (con encabezado) y JSON compacto se leen igual que el JSON histórico"""
+    libro = libro_prueba()
+    libro.extraer('completo.json', usar_cache=False)
+    libro.extraer('productos.ndjson', usar_cache=False)
+    libro.extraer('compacto.json', usar_cache=False, compacto=True)
+
+    completo = cargar_resultado(libro.ruta('completo.json'))
+    ndjson = cargar_resultado(libro.ruta('productos.meta.json'))
+    compacto = cargar_resultado(libro.ruta('compacto.json'))
+
+    with open(libro.ruta('productos.ndjson'), encoding='utf-8') as f:
+        assert sum(1 for _ in f) == len(completo['productos'])
+    assert 'productos' not in leer_encabezado(libro.ruta('productos.ndjson'))
+    assert os.path.getsize(libro.ruta('compacto.json')) < os.path.getsize(libro.ruta('completo.json')) / 2
+
+    assert sin_fechas(ndjson) == sin_fechas(completo)
+    sin_fila = [{clave: valor for clave, valor in producto.items() if clave != 'fila_completa'}
+                for producto in completo['productos']]
+    assert compacto['productos'] == sin_fila
+    assert [hoja['nombre'] for hoja in compacto['hojas']] == [hoja['nombre'] for hoja in completo['hojas']]
+
+
+def test_hoja_por_rangos_igual_a_hoja_completa():
+    """Una hoja partida en rangos de filas da los mismos productos y en el mismo orden"""
+    ruta = os.path.join(DIRECTORIO_HTML, 'YAYI FULL - 3 FEBRERO_archivos', 'sheet004.htm')
+    productos, proveedor = extraer_productos_de_archivo(ruta)
+
+    codificacion, rangos = dividir_en_rangos_de_filas(ruta, 3)
+    assert len(rangos) == 3 and rangos[0][0] == 0 and rangos[-1][1] == os.path.getsize(ruta)
+    with open(ruta, 'rb') as f:
+        contenido = f.read()
+    assert all(contenido[inicio:inicio + 3].lower() == b'<tr' for inicio, _ in rangos[1:])
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        resultado = HojaPorRangos.enviar(executor, (ruta, 'sheet004.htm', 0, None), 3).result()
+
+    assert resultado['error'] is None
+    assert resultado['contenido'] == {'productos': productos, 'proveedor': proveedor}
+
+
+def test_hoja_por_rangos_poda_las_filas_ocultas_de_cada_rango(tmp_path):
+    """Sólo el primer rango tiene filas de encabezado: las ocultas y vacías se podan en todos"""
+    filas = ['<tr><td>CODIGO</td><td>DESCRIPCION</td><td>PRECIO</td></tr>']
+    filas += [f'<tr><td>{2000000 + i}</td><td>ARANDELA {i} MM</td><td>$ 2,00</td></tr>' for i in range(4)]
+    for i in range(2000):
+        filas.append(f'<tr style="display:none"><td>{9000000 + i}</td><td>OCULTO {i}</td><td>$ 1,00</td></tr>')
+        filas.append('<tr><td>&nbsp;</td><td></td><td></td></tr>')
+        filas.append(f'<tr><td>{1000000 + i}</td><td>TORNILLO {i} MM</td><td>$ {i},50</td></tr>')
+    ruta = tmp_path / 'sheet001.htm'
+    ruta.write_text('<html><body><table>\n' + '\n'.join(filas) + '\n</table></body></html>', encoding='utf-8')
+
+    productos, proveedor = extraer_productos_de_archivo(str(ruta))
+    assert sum(1 for producto in productos if producto['codigo']) == 2004
+    assert not any('OCULTO' in producto['descripcion'] for producto in productos)
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        for partes in (2, 4, 7):
+            resultado = HojaPorRangos.enviar(executor, (str(ruta), 'sheet001.htm', 0, None), partes).result()
+            assert resultado['contenido'] == {'productos': productos, 'proveedor': proveedor}
+
+
+def test_tipos_de_celda_desde_hoja_de_estilos():
+    """Las clases xl* se tipan con la hoja de estilos y los valores formateados no son descripciones"""
+    assert tipo_de_formato(r'"\@"') == 'texto'
+    assert tipo_de_formato(r'"\[$$-2C0A\]\\ \#\,\#\#0\.00"') == 'moneda'
+    assert tipo_de_formato(r'"\0022$\0022\\ \#\,\#\#0\.00"') == 'moneda'
+    assert tipo_de_formato(r'"\[$-2C0A\]dddd\\ d\0022 de \0022mmmm"') == 'fecha'
+    assert tipo_de_formato(r'"\#\\ ?\/?"') == 'fraccion'
+    assert tipo_de_formato('0%') == 'porcentaje'
+    assert tipo_de_formato(r'"0\.0"') == 'decimal'
+    assert tipo_de_formato('0') == 'entero'
+
+    css = '.style0 {mso-number-format:General;}\n.xl65\n\t{mso-style-parent:style0;\n\tmso-number-format:Fixed;}' \
+          '\n.xl66\n\t{mso-style-parent:style0;}'
+    assert leer_estilos(css) == {'style0': 'general', 'xl65': 'decimal', 'xl66': 'general'}
+
+    # YAYI tiene bloques de calculadora con montos formateados que antes quedaban como descripción
+    ruta = os.path.join(DIRECTORIO_HTML, 'YAYI FULL - 3 FEBRERO_archivos', 'sheet005.htm')
+    tipos_celdas = tipos_celdas_de_hoja(ruta)
+    assert tipos_celdas is not None and len(tipos_celdas) > 1000
+    productos, _ = extraer_productos_de_archivo(ruta)
+    assert productos
+    assert not [p for p in productos if re.fullmatch(r'[$\s\d.,%-]+', p['descripcion'])]
+
+
+def test_regiones_de_productos_omiten_calculadoras_y_avisos():
+    """Sólo se clasifican las filas de los bloques con columna de códigos (y sus filas compatibles)"""
+    filas = [
+        ['BUSCADOR RAPIDO', '', ''],
+        ['INGRESAR CENTIMETROS', '120', ''],
+        ['CODIGO', 'DESCRIPCION', 'PRECIO'],
+        ['01-0001', 'TORNILLO AUTOPERFORANTE', '$ 10,00'],
+        ['2265', 'ARANDELA PLANA', '$ 5,00'],
+        ['CODIGO', 'DESCRIPCION', 'PRECIO'],
+        ['1300037', 'BOMBA PERIFERICA', '$ 100,00'],
+        ['', 'MALLA PVC SIN CODIGO', '$ 20,00'],
+        ['Los precios pueden cambiar sin previo aviso', '', ''],
+    ] + [['', '', '']] * 6 + [
+        ['CUANTO COBRAR AL CLIENTE', '30', '%'],
+    ]
+    rasgos = [rasgos_de_fila(fila) for fila in filas]
+    assert detectar_regiones(rasgos) == [(3, 8)]
+    assert list(indices_de_productos(rasgos)) == [3, 4, 6, 7]
+
+    # Sin una columna de códigos la tabla se procesa completa
+    sin_codigos = [rasgos_de_fila(['TORNILLO', '$ 10,00']), rasgos_de_fila(['ARANDELA', '$ 5,00'])]
+    assert detectar_regiones(sin_codigos) is None
+
+    # La detección está apagada por defecto: el presupuesto de YAYI sale con sus totales y aclaraciones
+    ruta = os.path.join(DIRECTORIO_HTML, 'YAYI FULL - 3 FEBRERO_archivos', 'sheet004.htm')
+    productos, _ = extraer_productos_de_archivo(ruta)
+    assert 'SUMA PARCIAL' in [p['descripcion'] for p in productos]
+
+    # Con la detección sólo quedan los artículos cargados, y la cache no mezcla ambos resultados
+    configurar_regiones(True)
+    productos, _ = extraer_productos_de_archivo(ruta)
+    assert [p['codigo'] for p in productos] == ['2240403', '1300000', '7900000']
+    assert version_extraccion() != version_extraccion(False)
+
+
+def test_esquema_conocido_da_los_mismos_productos():
+    """Con el esquema aprendido sólo se clasifican sus columnas y los productos no cambian"""
+    encabezado = [['Distribuidora Babusi S.A.', '25/07/2023'], ['COD.', 'Descripción', 'PRECIO FINAL']]
+    otra_fecha = [['Distribuidora  Babusi S.A.', '01/08/2023'], ['COD.', 'DESCRIPCION', 'PRECIO FINAL']]
+    assert esquemas_tabla.firma_encabezado(encabezado) == esquemas_tabla.firma_encabezado(otra_fecha)
+    assert esquemas_tabla.firma_encabezado(encabezado) != esquemas_tabla.firma_encabezado(encabezado[1:])
+
+    ruta = os.path.join(DIRECTORIO_HTML, 'FERRETERIA 1', 'sheet009.htm')
+    filas = [fila for indice, fila in iterar_filas_tablas(leer_documento(ruta).bloques(), podar=True) if indice == 0]
+    heuristica = extraer_productos_de_filas(filas)
+
+    # La primera vez se aprende y después se usa desde memoria
+    assert extraer_productos_de_filas(filas, proveedor='PRUEBA_ESQUEMAS') == heuristica
+    antes = esquemas_tabla.estadisticas_esquemas()
+    assert extraer_productos_de_filas(filas, proveedor='PRUEBA_ESQUEMAS') == heuristica
+    assert esquemas_tabla.estadisticas_esquemas()['esquemas_conocidos'] == antes['esquemas_conocidos'] + 1
+
+    firma = esquemas_tabla.firma_encabezado(filas[:5])
+    esquema = esquemas_tabla.buscar_esquema('PRUEBA_ESQUEMAS', firma, None, VERSION_EXTRACTOR)
+    assert 0 < len(esquema.columnas_a_clasificar()) < max(len(fila) for fila in filas)
+    assert esquema.columna_principal('codigo') == 0
+    # Con otra hoja de estilos u otra versión del extractor el esquema es otro
+    assert esquemas_tabla.buscar_esquema('PRUEBA_ESQUEMAS', firma, 'otros estilos', VERSION_EXTRACTOR) is None
+    assert esquemas_tabla.buscar_esquema('PRUEBA_ESQUEMAS', firma, None, 'otra versión') is None
+
+
+def test_esquema_de_otra_tabla_con_el_mismo_encabezado_no_pierde_campos():
+    """Si la tabla trae un campo en una columna que el esquema no conoce se clasifica completa y se reaprende"""
+    encabezado = [['FERRETERIA PRUEBA S.A.', '', '', ''], ['CODIGO', 'DESCRIPCION', 'PRECIO', 'IVA']]
+    sin_iva = encabezado + [[f'{1000000 + i}', f'TORNILLO {i} MM', f'$ {i},50', ''] for i in range(1, 40)]
+    con_iva = encabezado + [[f'{1000000 + i}', f'TORNILLO {i} MM', f'$ {i},50', '21'] for i in range(1, 40)]
+    assert esquemas_tabla.firma_encabezado(sin_iva[:5]) == esquemas_tabla.firma_encabezado(con_iva[:5])
+    heuristica = extraer_productos_de_filas(con_iva)
+    assert heuristica and all(producto['iva'] == '21' for producto in heuristica if producto['codigo'])
+
+    # Esquema aprendido en la tabla sin IVA
+    assert extraer_productos_de_filas(sin_iva, proveedor='PRUEBA_ESQUEMAS') == extraer_productos_de_filas(sin_iva)
+    antes = esquemas_tabla.estadisticas_esquemas()
+    assert extraer_productos_de_filas(con_iva, proveedor='PRUEBA_ESQUEMAS') == heuristica
+    despues = esquemas_tabla.estadisticas_esquemas()
+    assert despues['esquemas_descartados'] == antes['esquemas_descartados'] + 1
+    assert despues['esquemas_aprendidos'] == antes['esquemas_aprendidos'] + 1
+
+    # El esquema vuelto a aprender tiene las columnas de las dos tablas y sirve para ambas
+    for filas in (sin_iva, con_iva):
+        assert extraer_productos_de_filas(filas, proveedor='PRUEBA_ESQUEMAS') == extraer_productos_de_filas(filas)
+    assert esquemas_tabla.estadisticas_esquemas()['esquemas_descartados'] == despues['esquemas_descartados']
+
+
+def test_esquema_se_verifica_en_todas_las_filas():
+    """Un campo fuera del esquema en una sola fila alcanza para clasificar la tabla completa"""
+    encabezado = [['FERRETERIA PRUEBA S.A.', '', '', ''], ['CODIGO', 'DESCRIPCION', 'PRECIO', 'IVA']]
+    sin_iva = encabezado + [[f'{1000000 + i}', f'TORNILLO {i} MM', f'$ {i},50', ''] for i in range(1000)]
+    una_con_iva = [list(fila) for fila in sin_iva]
+    una_con_iva[len(encabezado) + 2][3] = '21'
+    heuristica = extraer_productos_de_filas(una_con_iva)
+    assert [producto['iva'] for producto in heuristica if producto['iva']] == ['21']
+
+    extraer_productos_de_filas(sin_iva, proveedor='PRUEBA_ESQUEMAS')
+    assert extraer_productos_de_filas(una_con_iva, proveedor='PRUEBA_ESQUEMAS') == heuristica
+    assert list(extraer_productos_de_filas_por_lotes(iter(una_con_iva), proveedor='PRUEBA_ESQUEMAS',
+                                                     filas_por_lote=100)) == heuristica
+    assert esquemas_tabla.estadisticas_esquemas()['esquemas_descartados'] >= 1
+
+
+def test_precios_con_los_separadores_de_la_hoja():
+    """Los miles con punto ya no quedan como texto y cada columna da su máscara de precios válidos"""
+    separadores = separadores_de_hoja(os.path.join(DIRECTORIO_HTML, 'FERRETERIA 1', 'sheet003.htm'))
+    assert separadores == Separadores(',', '.')
+
+    precios, validos = convertir_precios(['$ 16.729,55', '1447,94', '2.200', '231.16', 12, '', 'CONSULTAR', '1.2.3'],
+                                         separadores)
+    assert validos.tolist() == [True, True, True, True, True, False, False, False]
+    assert precios[validos].tolist() == [16729.55, 1447.94, 2200.0, 231.16, 12.0]
+
+    precios, validos = convertir_precios(['1,234.5', '1.234,5'], Separadores('.', ','))
+    assert precios[0] == 1234.5 and not validos[1]
+
+    assert normalizar_precio_avanzado('$ 69.926,03') == 69926.03
+    assert normalizar_precio_avanzado('0,00') is None
+
+
+def test_clasificacion_vectorizada_igual_a_la_de_referencia():
+    """La clasificación con la matriz de la tabla da los mismos productos que celda por celda"""
+    from itertools import groupby
+
+    for libro in ('FERRETERIA 1', 'PLANILLA FERRETERIA 23.10_archivos', 'YAYI FULL - 3 FEBRERO_archivos'):
+        for hoja in cargar_manifiesto(os.path.join(DIRECTORIO_HTML, libro)).disponibles():
+            tipos_celdas = tipos_celdas_de_hoja(hoja.ruta)
+            filas = iterar_filas_tablas(leer_documento(hoja.ruta).bloques(), con_clases=tipos_celdas is not None,
+                                        podar=True)
+            for _, filas_tabla in groupby(filas, key=lambda item: item[0]):
+                filas_tabla = [item[1:] if tipos_celdas is not None else item[1] for item in filas_tabla]
+                referencia = extraer_productos_de_filas(filas_tabla, tipos_celdas, vectorizado=False)
+                assert extraer_productos_de_filas(filas_tabla, tipos_celdas) == referencia, hoja.ruta
+
+    # El lote respeta las mismas reglas, también con valores fuera de Latin-1 o con saltos de línea
+    clasificador = ClasificadorCeldas(normalizar_precio_avanzado)
+    valores = ['1234567', ' 21 ', '51', '12mm', '3/4', 'Gs  -', 'fecha', 'a\tb  c', 'UwU x', '', 'ab',
+               'Caño  ½"', 'ſtraße']
+    for lote in (valores, valores + ['dos\nlíneas']):
+        tipos, limpios = clasificador.clasificar_lote(lote)
+        assert [tipo and (tipo, limpio) for tipo, limpio in zip(tipos, limpios)] == \
+            [clasificador._clasificar(valor) for valor in lote]
+
+    # El lote se cuenta aparte: no suma consultas a la cache de celdas
+    clasificador = ClasificadorCeldas(normalizar_precio_avanzado)
+    clasificador.clasificar_lote(valores, celdas=40)
+    estadisticas = clasificador.estadisticas()
+    assert (estadisticas['consultas'], estadisticas['valores_en_lote'], estadisticas['celdas_en_lote']) == \
+        (0, len(valores), 40)
+
+
+def test_vista_previa_corta_el_parseo_en_los_primeros_productos():
+    """La vista previa detecta el proveedor y lee sólo el principio de las hojas grandes"""
+    ruta = os.path.join(DIRECTORIO_HTML, 'FERRETERIA 1', 'sheet009.htm')
+    vista = vista_previa_hoja(ruta, productos_por_hoja=5)
+    productos, proveedor = extraer_productos_de_archivo(ruta)
+    assert vista['estado'] == MUESTRA and vista['proveedor'] == proveedor
+    assert vista['productos'] == [dict(producto, proveedor=proveedor) for producto in productos[:5]]
+    assert vista['caracteres_leidos'] < os.path.getsize(ruta) / 10
+
+    # La hoja entera se lee en bloques iguales a los del documento completo
+    assert ''.join(leer_bloques(ruta, 1000)) == leer_documento(ruta).texto
+
+    libro = vista_previa_libro(os.path.join(DIRECTORIO_HTML, 'YAYI FULL - 3 FEBRERO_archivos'), presupuesto=30)
+    assert libro['proveedor'] == 'YAYI' and not libro['agotado']
+    assert all(0 < len(hoja['productos']) <= 10 for hoja in libro['hojas'])
+
+    # Sin presupuesto no se lee ninguna hoja
+    libro = vista_previa_libro(os.path.join(DIRECTORIO_HTML, 'YAYI FULL - 3 FEBRERO_archivos'), presupuesto=0)
+    assert libro['agotado'] and all(hoja['estado'] == SIN_TIEMPO and not hoja['productos'] for hoja in libro['hojas'])
+
+
+def test_progreso_informa_filas_y_eta_con_el_preescaneo(libro_prueba):
+    """El pre-escaneo estima las filas que lee el parser y el avance llega al total"""
+    libro = libro_prueba()
+    for ruta in libro.hojas:
+        filas = sum(1 for _ in iterar_filas_tablas(leer_bloques(ruta)))
+        assert abs(contar_filas(ruta) - filas) <= filas * 0.05
+
+    estados = []
+    resultado, _ = libro.extraer('salida.json', usar_cache=False, progreso=estados.append)
+
+    assert resultado['productos']
+    assert [estado['hojas_terminadas'] for estado in estados] == list(range(1, len(libro.hojas) + 1))
+    assert [estado['filas'] for estado in estados] == sorted(estado['filas'] for estado in estados)
+    assert estados[-1]['filas'] == estados[-1]['filas_totales'] > 0
+    assert estados[-1]['fraccion'] == 1 and estados[-1]['eta'] == 0
+    assert all(estado['filas_por_segundo'] > 0 for estado in estados)
+
+
+def test_reanudar_corrida_interrumpida_da_el_mismo_resultado(libro_prueba, tmp_path, capsys):
+    """Las hojas guardadas antes de la interrupción no se reextraen y la salida es la misma"""
+    libro = libro_prueba()
+    ejecucion = str(tmp_path / 'ejecucion')
+    completo, _ = libro.extraer('completo.json', usar_cache=False)
+
+    def interrumpir(estado):
+        if estado['hojas_terminadas'] == 2:
+            raise RuntimeError("proceso interrumpido")
+
+    interrumpido, _ = libro.extraer('reanudado.json', usar_cache=False, progreso=interrumpir, puntos_control=True,
+                                    directorio_ejecucion=ejecucion)
+    assert interrumpido is None
+    assert PuntosControl(ejecucion, reanudar=True).completadas() == ['sheet001.htm', 'sheet002.htm']
+
+    capsys.readouterr()
+    reanudado, archivo = libro.extraer('reanudado.json', usar_cache=False, reanudar=True,
+                                       directorio_ejecucion=ejecucion)
+    assert '2 hojas tomadas de los puntos de control' in capsys.readouterr().out
+    assert sin_fechas(reanudado) == sin_fechas(completo)
+    assert sin_fechas(cargar_resultado(archivo)) == sin_fechas(cargar_resultado(libro.ruta('completo.json')))
+    assert not os.path.exists(ejecucion)
+
+
+def test_memoria_acotada_respeta_el_limite_en_el_libro_mas_grande(tmp_path):
+    """Con --max-memory-mb el pico de RSS no pasa el límite y la salida es la misma que sin límite"""
+    libro = os.path.join(DIRECTORIO_HTML, 'PLANILLA FERRETERIA 23.10_archivos')
+    limite = 56  # Sin límite este libro llega a ~62 MB
+    acotado = str(tmp_path / 'acotado.json')
+    salida = subprocess.run(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extraer_datos.py'), libro,
+         '-o', acotado, '--no-cache', '--sin-puntos-control', '--sin-progreso', '--max-memory-mb', str(limite)],
+        capture_output=True, text=True, encoding='utf-8', check=True).stdout
+    pico = float(re.search(r'pico de RSS ([\d.]+) MB', salida).group(1))
+    assert pico <= limite
+
+    _, completo = extraer_datos_html(libro, str(tmp_path / 'completo.json'), usar_cache=False)
+    assert sin_fechas(cargar_resultado(acotado)) == sin_fechas(cargar_resultado(completo))
+
+    tabla = ProductosEnDisco()
+    productos = [{'codigo': '1', 'precios': {'lista': 1.5}}, {'codigo': '2', 'fila_completa': ['x']}]
+    tabla.extender(productos)
+    assert tabla.vista() == productos
+    assert list(tabla.vista(1).para_json(('fila_completa',))) == [{'codigo': '2'}]
+
+
+def test_vigilancia_reextrae_solo_la_hoja_cambiada(libro_prueba, tmp_path):
+    """Al cambiar una hoja sólo se reextrae esa y la salida consolidada es la de una extracción completa"""
+    for sondeo in (False, True):
+        raiz = str(tmp_path / f'vigilada_{sondeo}')
+        libro = libro_prueba(os.path.join(raiz, 'LIBRO_archivos'))
+        vigilante = VigilanteCarpeta(raiz, debounce=0.2, sondeo=sondeo, intervalo=0.1,
+                                     directorio_cache=str(tmp_path / f'cache_{sondeo}'))
+        try:
+            assert vigilante.libros() == [libro.directorio]
+            inicial = vigilante.extraer_libro(libro.directorio)
+            assert len(inicial['hojas_reextraidas']) == 4
+
+            time.sleep(0.05)  # Otra fecha de modificación para el sondeo
+            shutil.copy(libro.hojas[0], libro.ruta('sheet003.htm'))
+            registros = []
+            limite = time.monotonic() + 15
+            while not registros and time.monotonic() < limite:
+                registros = vigilante.procesar_eventos(timeout=0.5)
+        finally:
+            vigilante.cerrar()
+
+        assert [registro['hojas_reextraidas'] for registro in registros] == [['sheet003.htm']]
+        assert registros[0]['latencia_maxima'] < 5
+        completo, _ = extraer_datos_html(libro.directorio, os.path.join(raiz, 'completo.json'), usar_cache=False)
+        assert sin_fechas(cargar_resultado(registros[0]['salida'])) == sin_fechas(completo)
+
+
+def test_lote_extrae_cada_libro_y_falla_si_alguno_falla(libro_prueba, tmp_path):
+    """El lote guarda la salida de cada libro, resume productos y bytes/s y devuelve 1 si un libro falla"""
+    raiz, salidas = str(tmp_path / 'libros'), str(tmp_path / 'salidas')
+    libro = libro_prueba(os.path.join(raiz, 'A_archivos'))
+    otro = libro_prueba(os.path.join(raiz, 'B_archivos'))
+    os.makedirs(os.path.join(raiz, 'VACIO_archivos'))
+    assert lote_libros.expandir_libros([raiz]) == [libro.directorio, otro.directorio]
+
+    codigo = lote_libros.main([os.path.join(raiz, '*_archivos'), '-j', '2', '--cola', '0', '--no-cache',
+                               '--salida-dir', salidas])
+    assert codigo == 1
+    with open(os.path.join(salidas, lote_libros.ARCHIVO_RESUMEN), encoding='utf-8') as archivo:
+        resumen = json.load(archivo)
+    assert [fila['ok'] for fila in resumen['libros']] == [True, True, False]
+
+    completo, _ = extraer_datos_html(libro.directorio, os.path.join(raiz, 'completo.json'), usar_cache=False)
+    for fila in resumen['libros'][:2]:
+        assert sin_fechas(cargar_resultado(fila['salida']))['productos'] == completo['productos']
+        assert fila['bytes_por_segundo'] > 0
+    assert resumen['total_productos'] == 2 * completo['metadata']['total_productos']
+
+
+if __name__ == "__main__":
+    # Con pytest: las pruebas usan fixtures (capsys) y la cache temporal de conftest.py
+    import pytest
+
+    sys.exit(pytest.main([__file__, '-q']))
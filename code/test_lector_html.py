@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prueba del lector incremental de tablas
+Verifica que la extracción por streaming produzca los mismos productos
+que el recorrido del árbol completo de BeautifulSoup
+"""
+
+import os
+import sys
+
+from bs4 import BeautifulSoup
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from estilos_libro import tipos_celdas_de_hoja
+from extraer_datos import extraer_productos_de_tabla, identificar_columnas_precios, procesar_archivo_html_completo
+from grilla_tabla import filas_en_grilla
+from lector_html import FILAS_ENCABEZADO, estadisticas_poda, iterar_filas_tablas, leer_documento
+
+DIRECTORIO_HTML = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'html')
+
+HOJAS_PRUEBA = [
+    os.path.join('PLANILLA FERRETERIA 23.10_archivos', 'sheet004.htm'),
+    os.path.join('PLANILLA FERRETERIA 23.10_archivos', 'sheet008.htm'),
+    os.path.join('YAYI FULL - 3 FEBRERO_archivos', 'sheet004.htm'),
+    os.path.join('YAYI FULL - 3 FEBRERO_archivos', 'sheet006.htm'),
+]
+
+
+def productos_con_arbol_completo(ruta_archivo):
+    """Extrae productos construyendo el árbol DOM completo (implementación de referencia)"""
+    soup = BeautifulSoup(leer_documento(ruta_archivo).texto, 'html.parser')
+
+    tipos_celdas = tipos_celdas_de_hoja(ruta_archivo)
+    productos = []
+    for tabla in soup.find_all('table'):
+        productos.extend(extraer_productos_de_tabla(tabla, tipos_celdas))
+    return productos
+
+
+def test_streaming_equivale_a_arbol_completo():
+    """Los productos por streaming coinciden con los del árbol completo"""
+    for hoja in HOJAS_PRUEBA:
+        ruta = os.path.join(DIRECTORIO_HTML, hoja)
+        esperados = productos_con_arbol_completo(ruta)
+
+        resultado = procesar_archivo_html_completo(ruta, os.path.basename(ruta), 0)
+        obtenidos = resultado['productos'] if resultado else []
+        for producto in obtenidos:
+            producto.pop('proveedor', None)
+            producto.pop('hoja', None)
+
+        assert obtenidos == esperados, f"Diferencias en {hoja}"
+        print(f"✅ {hoja}: {len(obtenidos)} productos idénticos")
+
+
+def test_documento_respeta_charset_declarado():
+    """Las hojas de Excel declaran windows-1252 y se decodifican sin perder la Ñ"""
+    ruta = os.path.join(DIRECTORIO_HTML, 'YAYI FULL - 3 FEBRERO_archivos', 'sheet003.htm')
+    documento = leer_documento(ruta)
+
+    assert documento.codificacion == 'cp1252'
+    assert 'CAÑERIAS' in documento.texto
+    assert ''.join(documento.bloques(1024)) == documento.texto
+
+
+def test_poda_de_filas_y_columnas():
+    """La poda omite filas vacías u ocultas y celdas de columnas ocultas, salvo en el encabezado"""
+    encabezado = ''.join('<tr><td></td><td></td><td></td></tr>' for _ in range(FILAS_ENCABEZADO - 1))
+    html = (
+        "<table><col width=80><col width=0 style='display:none'><col width=60>"
+        f"<tr><td>CODIGO</td><td>OCULTO</td><td>PRECIO</td></tr>{encabezado}"
+        "<tr><td colspan=2>1234567</td><td>$ 10,00</td></tr>"
+        "<tr><td>&nbsp;</td><td></td><td> </td></tr>"
+        "<tr height=0 style='display:none'><td>x</td><td>y</td><td>z</td></tr>"
+        "<tr><td>7654321</td><td>no se ve</td><td>$ 20,00</td></tr>"
+        "</table>"
+    )
+
+    antes = estadisticas_poda()
+    filas = [fila for _, fila in iterar_filas_tablas([html], podar=True, prefiltrar=False)]
+    despues = estadisticas_poda()
+    poda = {clave: despues[clave] - antes[clave] for clave in despues}
+
+    # Las filas de encabezado llegan aunque estén vacías; el colspan cubre la columna oculta
+    assert filas[0] == ['CODIGO', '', 'PRECIO']
+    assert len(filas) == FILAS_ENCABEZADO + 2
+    assert filas[-2] == ['1234567', '', '$ 10,00']
+    assert filas[-1] == ['7654321', '', '$ 20,00']
+    assert poda == {'filas_ocultas': 1, 'filas_vacias': 1, 'celdas_ocultas': 4, 'celdas_vacias': 4,
+                    'filas_prefiltradas': 0, 'bytes_prefiltrados': 0}
+
+    # Sin poda se entregan todas las filas con todo su texto
+    assert len(list(iterar_filas_tablas([html]))) == FILAS_ENCABEZADO + 4
+
+
+def test_celdas_combinadas_en_su_columna():
+    """colspan y rowspan dejan cada celda en su columna: los precios se leen por índice en todas las filas"""
+    html = (
+        "<table><col width=80><col span=2 width=60><col width=60>"
+        "<tr><td>CODIGO</td><td>DESCRIPCION</td><td>BASE</td><td>PUBLICO</td></tr>"
+        "<tr><td rowspan=2>1234567</td><td>CAÑO 1/2</td><td>$ 10,00</td><td>$ 15,00</td></tr>"
+        "<tr><td>CAÑO 3/4</td><td>$ 20,00</td><td>$ 30,00</td></tr>"
+        "<tr><td colspan=3>TUBOS DE 40</td><td>$ 40,00</td></tr>"
+        "<tr><td>7654321</td></tr>"
+        "</table>"
+    )
+    filas = [fila for _, fila in iterar_filas_tablas([html])]
+
+    assert filas == [
+        ['CODIGO', 'DESCRIPCION', 'BASE', 'PUBLICO'],
+        ['1234567', 'CAÑO 1/2', '$ 10,00', '$ 15,00'],
+        ['', 'CAÑO 3/4', '$ 20,00', '$ 30,00'],
+        ['TUBOS DE 40', '', '', '$ 40,00'],
+        ['7654321', '', '', ''],
+    ]
+    columnas_precios = identificar_columnas_precios(filas)
+    assert [fila[columnas_precios['publico']] for fila in filas[1:4]] == ['$ 15,00', '$ 30,00', '$ 40,00']
+
+    # La misma grilla que arma el árbol completo
+    assert list(filas_en_grilla(BeautifulSoup(html, 'html.parser').table)) == filas
+
+
+def test_prefiltro_quita_filas_de_relleno_sin_cambiar_las_filas():
+    """Las filas de relleno se quitan antes del parser y las filas entregadas son las mismas"""
+    ruta = os.path.join(DIRECTORIO_HTML, 'YAYI FULL - 3 FEBRERO_archivos', 'sheet003.htm')
+    documento = leer_documento(ruta)
+    esperadas = list(iterar_filas_tablas(documento.bloques(), con_clases=True, podar=True, prefiltrar=False))
+
+    for tamano_bloque in (1024, 64 * 1024):
+        antes = estadisticas_poda()
+        filas = list(iterar_filas_tablas(documento.bloques(tamano_bloque), con_clases=True, podar=True))
+        despues = estadisticas_poda()
+        assert filas == esperadas
+        assert despues['filas_prefiltradas'] - antes['filas_prefiltradas'] > 6000
+        assert despues['bytes_prefiltrados'] - antes['bytes_prefiltrados'] > len(documento.texto) // 2
+
+    # Se dejan las filas de encabezado y las cubiertas por un rowspan
+    vacia = '<tr><td class=xl75></td><td>&nbsp;</td></tr>'
+    html = (f"<table>{vacia * FILAS_ENCABEZADO}<tr><td rowspan=3>A</td><td>1</td></tr>{vacia * 3}"
+            "<tr><td>B</td><td>2</td></tr></table>")
+    assert (list(iterar_filas_tablas([html], podar=True)) ==
+            list(iterar_filas_tablas([html], podar=True, prefiltrar=False)))
+
+
+if __name__ == "__main__":
+    test_streaming_equivale_a_arbol_completo()
+    test_documento_respeta_charset_declarado()
+    test_poda_de_filas_y_columnas()
+    test_celdas_combinadas_en_su_columna()
+    test_prefiltro_quita_filas_de_relleno_sin_cambiar_las_filas()
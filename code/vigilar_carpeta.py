@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modo vigilancia: reextracción incremental de una carpeta compartida
+Reextrae sólo las hojas que cambiaron y reemplaza la salida de cada libro
+"""
+
+import contextlib
+import ctypes
+import ctypes.util
+import io
+import json
+import os
+import select
+import struct
+import sys
+import time
+from datetime import datetime
+
+# Agregar el directorio actual al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from cache_extraccion import calcular_clave_archivo
+from extraer_datos import VERSION_EXTRACTOR, detectar_archivos_html, detectar_libro_xlsx, extraer_datos_html
+from lector_xlsx import es_libro_xlsx
+
+# Segundos sin eventos nuevos antes de reextraer un libro
+DEBOUNCE_SEGUNDOS = 0.5
+
+# Segundos máximos desde el primer evento de un libro hasta reextraerlo
+ESPERA_MAXIMA_SEGUNDOS = 3.0
+
+# Cada cuántos segundos se revisa la carpeta sin inotify
+INTERVALO_SONDEO = 1.0
+
+# Archivos de un libro cuyo cambio implica reextraerlo (hojas, estilos, manifiesto)
+EXTENSIONES_LIBRO = ('.htm', '.html', '.css', '.xml', '.xlsx')
+
+# Eventos de inotify (sys/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+MASCARA_INOTIFY = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+ENCABEZADO_EVENTO = struct.Struct('iIII')
+
+
+class ObservadorInotify:
+    """Cambios en la carpeta y sus subcarpetas (un nivel) con inotify"""
+
+    nombre = 'inotify'
+
+    def __init__(self, raiz):
+        self.raiz = raiz
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.directorios = {}  # descriptor del watch -> carpeta
+        self._vigilar(raiz)
+        for entrada in os.scandir(raiz):
+            if entrada.is_dir():
+                self._vigilar(entrada.path)
+
+    def _vigilar(self, directorio):
+        descriptor = self.libc.inotify_add_watch(self.fd, os.fsencode(directorio), MASCARA_INOTIFY)
+        if descriptor < 0:
+            error = ctypes.get_errno()
+            if directorio == self.raiz:
+                os.close(self.fd)
+                raise OSError(error, f"inotify_add_watch {directorio}")
+            print(f"⚠️ No se puede vigilar {directorio}: {os.strerror(error)}")
+            return
+        self.directorios[descriptor] = directorio
+
+    def esperar(self, timeout=None):
+        """Rutas con cambios que lleguen en a lo sumo timeout segundos (la raíz si se perdieron eventos)"""
+        listos, _, _ = select.select([self.fd], [], [], timeout)
+        if not listos:
+            return []
+        try:
+            datos = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        rutas = []
+        posicion = 0
+        while posicion < len(datos):
+            descriptor, mascara, _, longitud = ENCABEZADO_EVENTO.unpack_from(datos, posicion)
+            nombre = datos[posicion + ENCABEZADO_EVENTO.size:posicion + ENCABEZADO_EVENTO.size + longitud]
+            posicion += ENCABEZADO_EVENTO.size + longitud
+            if mascara & IN_Q_OVERFLOW:
+                rutas.append(self.raiz)
+                continue
+            directorio = self.directorios.get(descriptor)
+            if directorio is None:
+                continue
+            if mascara & IN_IGNORED:
+                del self.directorios[descriptor]
+                continue
+            ruta = os.path.join(directorio, os.fsdecode(nombre.rstrip(b'\0'))) if longitud else directorio
+            if mascara & IN_ISDIR and mascara & (IN_CREATE | IN_MOVED_TO) and directorio == self.raiz:
+                self._vigilar(ruta)
+            rutas.append(ruta)
+        return rutas
+
+    def cerrar(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class ObservadorSondeo:
+    """Cambios en la carpeta y sus subcarpetas (un nivel) comparando fecha y tamaño de los archivos"""
+
+    nombre = 'sondeo'
+
+    def __init__(self, raiz, intervalo=INTERVALO_SONDEO):
+        self.raiz = raiz
+        self.intervalo = intervalo
+        self.estado = self._escanear()
+
+    def _escanear(self):
+        estado = {}
+        directorios = [self.raiz]
+        with contextlib.suppress(OSError):
+            directorios.extend(entrada.path for entrada in os.scandir(self.raiz) if entrada.is_dir())
+        for directorio in directorios:
+            estado[directorio] = None
+            try:
+                for entrada in os.scandir(directorio):
+                    if entrada.is_file():
+                        informacion = entrada.stat()
+                        estado[entrada.path] = (informacion.st_mtime_ns, informacion.st_size)
+            except OSError:
+                continue
+        return estado
+
+    def esperar(self, timeout=None):
+        """Rutas que cambiaron desde la revisión anterior (revisa a lo sumo cada intervalo segundos)"""
+        time.sleep(self.intervalo if timeout is None else min(timeout, self.intervalo))
+        estado = self._escanear()
+        rutas = [ruta for ruta in estado.keys() | self.estado.keys() if estado.get(ruta) != self.estado.get(ruta)]
+        self.estado = estado
+        return rutas
+
+    def cerrar(self):
+        pass
+
+
+def crear_observador(raiz, sondeo=False, intervalo=INTERVALO_SONDEO):
+    """inotify si está disponible (Linux), si no (o con sondeo) revisión periódica"""
+    if not sondeo and sys.platform.startswith('linux'):
+        try:
+            return ObservadorInotify(raiz)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️ inotify no disponible ({e}), se revisa la carpeta cada {intervalo} s")
+    return ObservadorSondeo(raiz, intervalo)
+
+
+def nombre_libro(libro):
+    """Nombre del libro para la salida: sin la extensión ni el sufijo _archivos de la exportación"""
+    nombre = os.path.basename(os.path.normpath(libro))
+    if os.path.isfile(libro):
+        nombre = os.path.splitext(nombre)[0]
+    return nombre.replace('_archivos', '').replace('_files', '') or 'ANALISIS_HTML'
+
+
+def tiene_hojas(ruta):
+    """Indica si la ruta es un libro: un .xlsx o una carpeta con hojas HTML o un .xlsx"""
+    if os.path.isfile(ruta):
+        return es_libro_xlsx(ruta)
+    if not os.path.isdir(ruta):
+        return False
+    with contextlib.redirect_stdout(io.StringIO()):
+        return bool(detectar_archivos_html(ruta) or detectar_libro_xlsx(ruta))
+
+
+def libros_de_carpeta(raiz):
+    """Libros de una carpeta (ver el docstring del módulo)"""
+    try:
+        entradas = sorted(os.scandir(raiz), key=lambda entrada: entrada.name)
+    except OSError:
+        return []
+    libros = [entrada.path for entrada in entradas
+              if (entrada.is_dir() or es_libro_xlsx(entrada.name)) and tiene_hojas(entrada.path)]
+    if not libros and tiene_hojas(raiz):
+        return [raiz]
+    return libros
+
+
+class VigilanteCarpeta:
+    """Reextrae los libros de una carpeta a medida que cambian sus hojas"""
+
+    def __init__(self, raiz, directorio_salida=None, debounce=DEBOUNCE_SEGUNDOS,
+                 espera_maxima=ESPERA_MAXIMA_SEGUNDOS, sondeo=False, intervalo=INTERVALO_SONDEO, workers=1,
+                 compacto=False, directorio_cache=None, registro_latencias=None, detallado=False):
+        self.raiz = os.path.abspath(raiz)
+        self.directorio_salida = os.path.abspath(directorio_salida or self.raiz)
+        self.debounce = debounce
+        self.espera_maxima = espera_maxima
+        self.workers = workers
+        self.compacto = compacto
+        self.directorio_cache = directorio_cache
+        self.registro_latencias = registro_latencias
+        self.detallado = detallado
+        self.pendientes = {}  # libro -> instantes (time.monotonic) de sus eventos
+        self.claves_hojas = {}  # libro -> {hoja: hash del contenido}
+        self.observador = crear_observador(self.raiz, sondeo, intervalo)
+
+    def libros(self):
+        """Libros de la carpeta vigilada"""
+        return libros_de_carpeta(self.raiz)
+
+    def libros_de(self, ruta):
+        """Libros afectados por un cambio en la ruta"""
+        if ruta == self.raiz:
+            return self.libros()
+        partes = os.path.relpath(ruta, self.raiz).split(os.sep)
+        primera = os.path.join(self.raiz, partes[0])
+        relevante = ruta.lower().endswith(EXTENSIONES_LIBRO)
+
+        if len(partes) > 1:
+            return [primera] if relevante else []
+        if os.path.isdir(ruta) or (not relevante and ruta in self.claves_hojas):
+            return [ruta]
+        if es_libro_xlsx(ruta):
+            return [ruta]
+        if not relevante:
+            return []
+        if self.raiz in self.claves_hojas:
+            return [self.raiz]
+        # Frameset de una exportación ("LIBRO.htm"): sus hojas están en LIBRO_archivos
+        base = os.path.splitext(ruta)[0]
+        return [carpeta for carpeta in (f'{base}_archivos', f'{base}_files') if os.path.isdir(carpeta)]
+
+    def salida_de(self, libro):
+        return os.path.join(self.directorio_salida, f"datos_estructurados_{nombre_libro(libro)}.json")
+
+    def _hojas_cambiadas(self, libro):
+        """Hojas del libro cuyo contenido cambió desde la extracción anterior"""
+        if os.path.isfile(libro):
+            rutas = {os.path.basename(libro): libro}
+        else:
+            with contextlib.redirect_stdout(io.StringIO()):
+                rutas = {archivo: os.path.join(libro, archivo) for archivo in detectar_archivos_html(libro)}
+                libro_xlsx = None if rutas else detectar_libro_xlsx(libro)
+            if libro_xlsx:
+                rutas = {os.path.basename(libro_xlsx): libro_xlsx}
+
+        claves = {}
+        for archivo, ruta in rutas.items():
+            with contextlib.suppress(OSError):
+                claves[archivo] = calcular_clave_archivo(VERSION_EXTRACTOR, ruta)
+        anteriores = self.claves_hojas.get(libro, {})
+        self.claves_hojas[libro] = claves
+        return [archivo for archivo, clave in claves.items() if anteriores.get(archivo) != clave]
+
+    def extraer_libro(self, libro, eventos=()):
+        """
+        Reextrae un libro y reemplaza su salida consolidada. eventos son los
+        instantes (time.monotonic) de los cambios que la motivaron; devuelve
+        el registro de la reextracción con la latencia de cada evento (None
+        si el libro ya no tiene hojas o la extracción falló).
+        """
+        nombre = nombre_libro(libro)
+        inicio = time.monotonic()
+        if not tiene_hojas(libro):
+            self.claves_hojas.pop(libro, None)
+            print(f"⚠️ {nombre}: sin hojas para extraer (la salida anterior se conserva)")
+            return None
+
+        hojas_cambiadas = self._hojas_cambiadas(libro)
+        salida = self.salida_de(libro)
+        temporal = f"{salida}.{os.getpid()}.tmp"
+        consola = contextlib.nullcontext() if self.detallado else contextlib.redirect_stdout(io.StringIO())
+        try:
+            with consola:
+                resultado, _ = extraer_datos_html(libro, temporal, workers=self.workers, compacto=self.compacto,
+                                                  directorio_cache=self.directorio_cache, formato='json')
+            if resultado is None:
+                print(f"❌ {nombre}: la extracción falló (la salida anterior se conserva)")
+                self.claves_hojas.pop(libro, None)
+                return None
+            os.replace(temporal, salida)
+        finally:
+            with contextlib.suppress(OSError):
+                os.remove(temporal)
+
+        fin = time.monotonic()
+        latencias = [round(fin - instante, 3) for instante in eventos]
+        registro = {
+            'fecha': datetime.now().isoformat(),
+            'libro': nombre,
+            'salida': salida,
+            'eventos': len(eventos),
+            'latencias': latencias,
+            'latencia_maxima': max(latencias, default=None),
+            'latencia_minima': min(latencias, default=None),
+            'hojas_reextraidas': hojas_cambiadas,
+            'productos': resultado['metadata']['total_productos'],
+            'extraccion': round(fin - inicio, 3),
+        }
+
+        if eventos:
+            print(f"⏱️ {nombre}: {len(hojas_cambiadas)} hojas reextraídas, {registro['productos']} productos · "
+                  f"{len(eventos)} eventos · latencia {registro['latencia_maxima']:.2f} s (primer evento) / "
+                  f"{registro['latencia_minima']:.2f} s (último) · extracción {registro['extraccion']:.2f} s")
+        else:
+            print(f"📦 {nombre}: {registro['productos']} productos en {registro['extraccion']:.2f} s -> {salida}")
+        if self.registro_latencias:
+            try:
+                with open(self.registro_latencias, 'a', encoding='utf-8') as archivo:
+                    archivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+            except OSError as e:
+                print(f"⚠️ No se pudo escribir el registro de latencias: {e}")
+        return registro
+
+    def _vencimiento(self, libro):
+        eventos = self.pendientes[libro]
+        return min(eventos[-1] + self.debounce, eventos[0] + self.espera_maxima)
+
+    def procesar_eventos(self, timeout=None):
+        """
+        Espera cambios (a lo sumo timeout segundos, o hasta que venza el
+        debounce de un libro pendiente) y reextrae los libros cuyo debounce
+        venció. Devuelve los registros de las reextracciones.
+        """
+        espera = timeout
+        if self.pendientes:
+            restante = max(min(self._vencimiento(libro) for libro in self.pendientes) - time.monotonic(), 0)
+            espera = restante if timeout is None else min(restante, timeout)
+
+        rutas = self.observador.esperar(espera)
+        instante = time.monotonic()
+        for ruta in rutas:
+            for libro in self.libros_de(ruta):
+                self.pendientes.setdefault(libro, []).append(instante)
+
+        vencidos = [libro for libro in self.pendientes if self._vencimiento(libro) <= time.monotonic()]
+        registros = []
+        for libro in vencidos:
+            registro = self.extraer_libro(libro, self.pendientes.pop(libro))
+            if registro:
+                registros.append(registro)
+        return registros
+
+    def ejecutar(self):
+        """Extrae todos los libros y después los reextrae a medida que cambian (hasta Ctrl+C)"""
+        print(f"👀 Vigilando {self.raiz} ({self.observador.nombre}, debounce {self.debounce} s, "
+              f"espera máxima {self.espera_maxima} s)")
+        print(f"💾 Salidas en: {self.directorio_salida}")
+        try:
+            for libro in self.libros():
+                self.extraer_libro(libro)
+            while True:
+                self.procesar_eventos()
+        except KeyboardInterrupt:
+            print("👋 Vigilancia detenida")
+        finally:
+            self.cerrar()
+
+    def cerrar(self):
+        self.observador.cerrar()
+
+
+def crear_parser_argumentos():
+    """Crea el parser de argumentos de la línea de comandos"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Vigila una carpeta y reextrae los libros cuyas hojas cambian")
+    parser.add_argument('carpeta', help="Carpeta a vigilar (un libro o una carpeta con libros)")
+    parser.add_argument('--salida-dir', default=None,
+                        help="Directorio de las salidas consolidadas (por defecto, la carpeta vigilada)")
+    parser.add_argument('--sondeo', action='store_true',
+                        help="Revisar la carpeta periódicamente en lugar de usar inotify")
+    parser.add_argument('--intervalo', type=float, default=INTERVALO_SONDEO,
+                        help="Segundos entre revisiones sin inotify")
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE_SEGUNDOS,
+                        help="Segundos sin eventos nuevos antes de reextraer un libro")
+    parser.add_argument('--espera-maxima', type=float, default=ESPERA_MAXIMA_SEGUNDOS,
+                        help="Segundos máximos desde el primer evento hasta reextraer un libro")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="Procesos para procesar hojas en paralelo (1 = secuencial)")
+    parser.add_argument('--compacto', action='store_true',
+                        help="Omitir fila_completa y la copia de los productos dentro de cada hoja")
+    parser.add_argument('--log-latencias', default=None,
+                        help="Agregar el registro de cada reextracción (JSON lines) a este archivo")
+    parser.add_argument('--detallado', action='store_true',
+                        help="Mostrar la salida completa del extractor en cada reextracción")
+    return parser
+
+
+def main(argv=None):
+    """Función principal"""
+    args = crear_parser_argumentos().parse_args(argv)
+    if not os.path.isdir(args.carpeta):
+        print(f"❌ No existe la carpeta: {args.carpeta}")
+        return 1
+    if args.salida_dir:
+        os.makedirs(args.salida_dir, exist_ok=True)
+    VigilanteCarpeta(args.carpeta, args.salida_dir, debounce=args.debounce, espera_maxima=args.espera_maxima,
+                     sondeo=args.sondeo, intervalo=args.intervalo, workers=args.workers, compacto=args.compacto,
+                     registro_latencias=args.log_latencias, detallado=args.detallado).ejecutar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vista previa rápida de un libro
+Proveedor y primeros productos de cada hoja, dentro de un presupuesto de tiempo fijo
+"""
+
+import time
+from contextlib import closing
+from itertools import groupby
+
+from conversion_precios import separadores_de_hoja
+from detector_proveedores import DETECTOR
+from estilos_libro import tipos_celdas_de_hoja
+from extraer_datos import elegir_proveedor_principal, extraer_productos_de_filas
+from lector_html import iterar_filas_tablas, leer_bloques
+from manifiesto_libro import cargar_manifiesto
+
+# Productos de muestra por hoja
+PRODUCTOS_POR_HOJA = 10
+
+# Presupuesto de todo el libro, en segundos
+PRESUPUESTO_SEGUNDOS = 0.8
+
+# Filas del primer tramo de cada tabla (los siguientes duplican el anterior)
+FILAS_INICIALES = 64
+
+# Cada cuántas filas se mira el reloj
+FILAS_POR_CONTROL = 32
+
+# Estado de cada hoja en la vista previa
+COMPLETA = 'completa'      # Se leyó la hoja entera (tiene menos de N productos)
+MUESTRA = 'muestra'        # Se cortó al llegar a N productos
+SIN_TIEMPO = 'sin_tiempo'  # Se cortó (o no se empezó) por el presupuesto
+
+
+class _LectorContado:
+    """Bloques de una hoja que, al pasar, suman las apariciones de cada proveedor"""
+
+    def __init__(self, ruta_archivo):
+        self.bloques = leer_bloques(ruta_archivo)
+        self.conteo = {}
+        self.caracteres = 0
+
+    def __iter__(self):
+        for bloque in self.bloques:
+            self.caracteres += len(bloque)
+            for proveedor, cantidad in DETECTOR.contar(bloque).items():
+                self.conteo[proveedor] = self.conteo.get(proveedor, 0) + cantidad
+            yield bloque
+
+    def close(self):
+        self.bloques.close()
+
+
+def _productos_de_tramo(filas_tabla, tipos_celdas, separadores):
+    filas = filas_tabla if tipos_celdas is not None else [fila_datos for fila_datos, _ in filas_tabla]
+    return extraer_productos_de_filas(filas, tipos_celdas, separadores=separadores)
+
+
+def vista_previa_hoja(ruta_archivo, productos_por_hoja=PRODUCTOS_POR_HOJA, limite=None):
+    """
+    Primeros productos de una hoja HTML, cortando el parseo apenas se
+    tienen productos_por_hoja. limite es el instante (time.perf_counter)
+    en que se corta la lectura aunque falten productos.
+
+    Devuelve {'productos', 'proveedor', 'estado', 'filas_leidas',
+    'caracteres_leidos', 'detecciones'} (detecciones: apariciones de cada
+    proveedor en el texto leído).
+    """
+    tipos_celdas = tipos_celdas_de_hoja(ruta_archivo)
+    separadores = separadores_de_hoja(ruta_archivo)
+    con_clases = tipos_celdas is not None
+
+    productos = []
+    filas_leidas = 0
+    estado = COMPLETA
+
+    with closing(_LectorContado(ruta_archivo)) as lector:
+        filas = iterar_filas_tablas(lector, con_clases=con_clases, podar=True)
+        for _, filas_tabla in groupby(filas, key=lambda item: item[0]):
+            faltan = productos_por_hoja - len(productos)
+            tramo = []
+            umbral = FILAS_INICIALES
+            productos_tabla = None
+            for item in filas_tabla:
+                tramo.append((item[1], item[2] if con_clases else None))
+                filas_leidas += 1
+                if len(tramo) >= umbral:
+                    productos_tabla = _productos_de_tramo(tramo, tipos_celdas, separadores)
+                    if len(productos_tabla) >= faltan:
+                        estado = MUESTRA
+                        break
+                    productos_tabla = None
+                    umbral *= 2
+                if limite is not None and filas_leidas % FILAS_POR_CONTROL == 0 and time.perf_counter() >= limite:
+                    estado = SIN_TIEMPO
+                    break
+
+            if productos_tabla is None:
+                productos_tabla = _productos_de_tramo(tramo, tipos_celdas, separadores)
+            productos.extend(productos_tabla[:faltan])
+            if len(productos) >= productos_por_hoja:
+                estado = MUESTRA
+            if estado != COMPLETA:
+                break
+            if limite is not None and time.perf_counter() >= limite:
+                estado = SIN_TIEMPO
+                break
+
+        detecciones = lector.conteo
+        caracteres_leidos = lector.caracteres
+
+    proveedor = elegir_proveedor_principal(detecciones)
+
+    for producto in productos:
+        producto['proveedor'] = proveedor
+
+    return {
+        'productos': productos,
+        'proveedor': proveedor,
+        'estado': estado,
+        'filas_leidas': filas_leidas,
+        'caracteres_leidos': caracteres_leidos,
+        'detecciones': detecciones,
+    }
+
+
+def vista_previa_libro(directorio, productos_por_hoja=PRODUCTOS_POR_HOJA, presupuesto=PRESUPUESTO_SEGUNDOS,
+                       hojas=None):
+    """
+    Vista previa de las hojas de un libro (todas o las de hojas, por nombre
+    de pestaña o de archivo) en a lo sumo presupuesto segundos.
+
+    Devuelve {'libro', 'proveedor', 'hojas': [{'nombre', 'archivo',
+    'productos', 'proveedor', 'estado', ...}], 'tiempo', 'agotado'}; el
+    proveedor del libro es el más nombrado en el texto leído de todas las
+    hojas.
+    """
+    inicio = time.perf_counter()
+    limite = inicio + presupuesto
+    manifiesto = cargar_manifiesto(directorio)
+    seleccionadas = manifiesto.seleccionar(hojas) if hojas else manifiesto.disponibles()
+
+    resultado_hojas = []
+    conteo = {}
+    for hoja in seleccionadas:
+        vista = None
+        if time.perf_counter() < limite:
+            try:
+                vista = vista_previa_hoja(hoja.ruta, productos_por_hoja, limite)
+            except Exception as e:
+                print(f"⚠️ Vista previa de {hoja.archivo}: {e}")
+        if vista is None:
+            vista = {'productos': [], 'proveedor': None, 'estado': SIN_TIEMPO, 'filas_leidas': 0,
+                     'caracteres_leidos': 0, 'detecciones': {}}
+        for proveedor, cantidad in vista['detecciones'].items():
+            conteo[proveedor] = conteo.get(proveedor, 0) + cantidad
+        resultado_hojas.append({'nombre': hoja.nombre, 'archivo': hoja.archivo, **vista})
+
+    return {
+        'libro': manifiesto.nombre,
+        'proveedor': elegir_proveedor_principal(conteo),
+        'hojas': resultado_hojas,
+        'tiempo': time.perf_counter() - inicio,
+        'agotado': any(vista['estado'] == SIN_TIEMPO for vista in resultado_hojas),
+    }